@@ -34,6 +34,9 @@ except Exception:
 
 GLOBAL_DIR = DATA_DIR.joinpath("merged")
 GLOBAL_CSV = GLOBAL_DIR.joinpath("global.csv")
+# Jeu fusionné matérialisé (binaire colonnaire, suffixe selon le backend de stockage)
+MERGED_STORE = GLOBAL_DIR.joinpath("merged_data")
+ROLLUP_DIR = GLOBAL_DIR.joinpath("rollups")
 
 # ---------------------------------------------------------------
 # ⚙️ Paramètres d'application
@@ -43,6 +46,11 @@ APP_TITLE = "Suivi consommation / production électrique"
 DATE_FORMAT = "%Y-%m-%d %H:%M"
 PLOT_THEME = "plotly_white"
 
+# Réduction des courbes : nombre maximal de points par courbe (~ largeur en pixels)
+# et méthode ("lttb" ou "minmax")
+PLOT_MAX_POINTS = 2000
+PLOT_DOWNSAMPLING = "lttb"
+
 # ---------------------------------------------------------------
 # 🔑 Variables de sécurité (API, tokens, etc.)
 # ---------------------------------------------------------------
@@ -57,8 +65,12 @@ APP_CONFIG = {
     "ARCHIVE_CONSO": CONSO_ZIP,
     "GLOBAL_DIR": GLOBAL_DIR,
     "GLOBAL_CSV": GLOBAL_CSV,
+    "MERGED_STORE": MERGED_STORE,
+    "ROLLUP_DIR": ROLLUP_DIR,
     "APP_TITLE" : APP_TITLE,
     "DATE_FORMAT": DATE_FORMAT,
     "PLOT_THEME": PLOT_THEME,
+    "PLOT_MAX_POINTS": PLOT_MAX_POINTS,
+    "PLOT_DOWNSAMPLING": PLOT_DOWNSAMPLING,
     "ENV_FILE": ENV_FILE
 }
\ No newline at end of file
@@ -2,25 +2,251 @@
 """
 Gestion centralisée du chargement, nettoyage et fusion des données
 de consommation et de production électrique.
+
+Le DataFrame fusionné est un artefact matérialisé (data/merged/merged_data/,
+partitions mensuelles au format binaire colonnaire du backend de stockage),
+mis à jour de façon incrémentale par app.core.merged_store lorsque l'un des
+fichiers sources (consommation 30 min, production 30 min, prix) change, et
+conservé en mémoire entre deux reruns Streamlit. Le cube d'agrégats
+(app.core.rollups), l'index de sommes cumulées (app.core.range_index) et
+les options des sélecteurs de période (app.core.periods) suivent le même
+cycle de vie.
 """
 
-from common.file_utils import load_clean_data
-from common.data_tools import load_price_data, merge_conso_prod_data
-from conso_api_tools.config import CSV_30MIN as conso_csv
-from prod_api_tools.config import CSV_30MIN as prod_csv
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import GLOBAL_CSV, MERGED_STORE
+from app.core.merged_store import update_merged_store
+from app.core.periods import compute_period_options
+from app.core.range_index import RangeSumIndex
+from app.core.rollups import refresh_rollups
+from common.data_tools import DEFAULT_PRICE_DATA_PATH, interval_step, to_interval_start
+from common.storage import read_series
+from common.tariffs import DEFAULT_TARIFF_PATH, load_tariff_contract
+from conso_api_tools.config import CSV_30MIN as conso_csv, CSV_1H as conso_csv_1h, TIMESTAMP_LABEL as CONSO_LABEL
+from prod_api_tools.config import CSV_30MIN as prod_csv, CSV_1H as prod_csv_1h
+
+
+# ---------------------------------------------------------------
+# 🗃️ Cache du jeu de données fusionné
+# ---------------------------------------------------------------
+
+# Dernière empreinte des fichiers sources et DataFrame fusionné associé
+_MERGED_CACHE: dict = {
+    "fingerprint": None,
+    "df": None,
+    "rollups": None,
+    "range_index": None,
+    "period_options": None,
+    "changed_since": None,
+    "tariff": None,
+}
+
+
+def _file_fingerprint(path: Path) -> tuple:
+    """
+    Calcule l'empreinte légère d'un fichier (date de modification et taille).
+
+    Paramètre :
+        path (Path) : chemin du fichier
+
+    Retour :
+        tuple : (chemin, mtime en ns, taille en octets), ou (chemin, None, None)
+                si le fichier n'existe pas
+    """
+    path = Path(path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return (str(path), None, None)
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def sources_fingerprint() -> tuple:
+    """
+    Renvoie l'empreinte combinée des fichiers sources du jeu fusionné.
+
+    Retour :
+        tuple : empreintes des CSV de consommation, de production, du fichier de prix
+                et du contrat tarifaire
+    """
+    return (
+        _file_fingerprint(conso_csv),
+        _file_fingerprint(prod_csv),
+        _file_fingerprint(DEFAULT_PRICE_DATA_PATH),
+        _file_fingerprint(DEFAULT_TARIFF_PATH),
+    )
+
+
+def clear_merged_cache() -> None:
+    """Vide le cache du jeu de données fusionné (rechargement forcé au prochain appel)."""
+    _MERGED_CACHE["fingerprint"] = None
+    _MERGED_CACHE["df"] = None
+    _MERGED_CACHE["rollups"] = None
+    _MERGED_CACHE["range_index"] = None
+    _MERGED_CACHE["period_options"] = None
+    _MERGED_CACHE["changed_since"] = None
+    _MERGED_CACHE["tariff"] = None
 
 
 def load_merged_data():
     """
-    Charge et fusionne les données de consommation et de production.
+    Charge les données fusionnées de consommation et de production.
+
+    Le résultat est mis en cache en mémoire et réutilisé tant que l'empreinte
+    des fichiers sources (mtime / taille) reste inchangée. Sinon, le jeu
+    matérialisé sur disque est relu et seule la plage modifiée des sources
+    est refusionnée (app.core.merged_store). Le DataFrame renvoyé est partagé
+    entre les appels : il ne doit pas être modifié en place.
 
     Retour :
         pandas.DataFrame : données fusionnées et prêtes à l'analyse
     """
-    conso_df = load_clean_data(conso_csv)
-    prod_df = load_clean_data(prod_csv)
-    price_df = load_price_data()
-    return merge_conso_prod_data(conso_df, prod_df, price_df=price_df)
+    fingerprint = sources_fingerprint()
+    if _MERGED_CACHE["df"] is not None and _MERGED_CACHE["fingerprint"] == fingerprint:
+        return _MERGED_CACHE["df"]
+
+    # Contrat lu une seule fois : utilisé pour la fusion puis conservé pour les statistiques
+    tariff = load_tariff_contract(DEFAULT_TARIFF_PATH)
+    merged_df, last_change = update_merged_store(
+        conso_csv = conso_csv,
+        prod_csv = prod_csv,
+        price_path = DEFAULT_PRICE_DATA_PATH,
+        store = MERGED_STORE,
+        tariff_path = DEFAULT_TARIFF_PATH,
+        tariff = tariff)
+
+    _MERGED_CACHE["fingerprint"] = fingerprint
+    _MERGED_CACHE["tariff"] = tariff
+    _MERGED_CACHE["changed_since"] = last_change["since"]
+    _MERGED_CACHE["df"] = merged_df
+    _MERGED_CACHE["rollups"] = None
+    _MERGED_CACHE["range_index"] = None
+    _MERGED_CACHE["period_options"] = None
+    return merged_df
+
+
+def export_merged_csv(output_path: Path = GLOBAL_CSV) -> Path:
+    """
+    Exporte le jeu fusionné courant en CSV (séparateur ';').
+
+    Paramètres :
+        output_path (Path) : fichier CSV de sortie
+
+    Retour :
+        Path : chemin du fichier écrit
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(
+        parents = True,
+        exist_ok = True)
+    load_merged_data().to_csv(
+        path_or_buf = output_path,
+        sep = ";",
+        index = False)
+    return output_path
+
+
+def load_tariff() -> dict | None:
+    """
+    Renvoie le contrat tarifaire compilé utilisé pour le jeu fusionné courant.
+
+    Retour :
+        dict | None : contrat (common.tariffs), ou None si aucun contrat n'est configuré
+    """
+    load_merged_data()
+    return _MERGED_CACHE["tariff"]
+
+
+def load_rollup_cube() -> dict:
+    """
+    Renvoie le cube d'agrégats (jour / semaine / mois) du jeu fusionné courant.
+
+    Le cube persisté n'est rafraîchi (de façon incrémentale) qu'après une
+    mise à jour du jeu fusionné : seuls les jours dont l'empreinte du contenu
+    a changé sont recalculés.
+
+    Retour :
+        dict : {'day' | 'week' | 'month': DataFrame d'agrégats}
+    """
+    merged_df = load_merged_data()
+    if _MERGED_CACHE["rollups"] is None:
+        _MERGED_CACHE["rollups"] = refresh_rollups(
+            df = merged_df,
+            since = _MERGED_CACHE["changed_since"])
+    return _MERGED_CACHE["rollups"]
+
+
+def load_range_index() -> RangeSumIndex:
+    """
+    Renvoie l'index de sommes cumulées du jeu fusionné courant
+    (totaux de n'importe quelle plage en O(1)).
+
+    Retour :
+        RangeSumIndex : index construit une fois par version du jeu fusionné
+    """
+    merged_df = load_merged_data()
+    if _MERGED_CACHE["range_index"] is None:
+        _MERGED_CACHE["range_index"] = RangeSumIndex(merged_df)
+    return _MERGED_CACHE["range_index"]
+
+
+def load_period_options(df: pd.DataFrame | None = None) -> dict:
+    """
+    Renvoie les bornes de dates et les listes de semaines / mois disponibles
+    (voir periods.compute_period_options), calculées une fois par version du
+    jeu fusionné.
+
+    Paramètres :
+        df (pandas.DataFrame | None) : données concernées ; le cache n'est utilisé
+                                       que pour le jeu fusionné courant (ou None),
+                                       tout autre DataFrame est traité directement
+
+    Retour :
+        dict : {'min', 'max', 'W', 'M'}
+    """
+    if df is not None and df is not _MERGED_CACHE["df"]:
+        return compute_period_options(df)
+    merged_df = load_merged_data() if df is None else df
+    if _MERGED_CACHE["period_options"] is None:
+        _MERGED_CACHE["period_options"] = compute_period_options(merged_df)
+    return _MERGED_CACHE["period_options"]
+
+
+def load_window(start, end, resolution: str = "30min") -> pd.DataFrame:
+    """
+    Charge uniquement la fenêtre [start, end] à la résolution demandée.
+
+    - '30min' : tranche du jeu fusionné (index de sommes cumulées, sans masque)
+    - '1h'    : séries horaires stockées, seules les partitions mensuelles
+                recouvrant la fenêtre sont lues ; la consommation (horodatée en
+                fin d'heure) est ramenée au début de son heure avant la jointure
+
+    Paramètres :
+        start, end : bornes de la fenêtre
+        resolution (str) : '30min' ou '1h'
+
+    Retour :
+        pandas.DataFrame : colonnes 'datetime', 'consommation', 'production', 'total'
+    """
+    if resolution == "30min":
+        return load_range_index().slice(start, end)
+    if resolution != "1h":
+        raise ValueError(f"Résolution non supportée : {resolution} ('30min' ou '1h')")
+
+    end_exclusive = pd.Timestamp(end) + np.timedelta64(1, "us")
+    # Consommation horodatée en fin d'heure : l'heure commençant à `start` porte start + 1 h
+    shift = interval_step("1h") if CONSO_LABEL == "end" else np.timedelta64(0, "ns")
+    conso = read_series(conso_csv_1h, start = pd.Timestamp(start) + shift, end = end_exclusive + shift)
+    conso.index = to_interval_start(conso.index, CONSO_LABEL, "1h")
+    prod = read_series(prod_csv_1h, start = start, end = end_exclusive)
+    window = conso[["consommation"]].join(prod[["production"]], how = "inner").astype("float64")
+    window["total"] = window["consommation"] + window["production"]
+    return window.reset_index()
 
 
 def get_period_limits(df):
@@ -34,3 +260,38 @@ def get_period_limits(df):
         tuple(datetime, datetime) : bornes temporelles disponibles
     """
     return df["datetime"].min(), df["datetime"].max()
+
+
+# ---------------------------------------------------------------
+# 🖥️ Ligne de commande
+# ---------------------------------------------------------------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Jeu de données fusionné consommation / production")
+    parser.add_argument("--rebuild", action="store_true", help="Refusionne les sources et réécrit le jeu matérialisé")
+    parser.add_argument("--export-csv", nargs="?", const=str(GLOBAL_CSV), default=None, metavar="CHEMIN",
+                        help=f"Exporte le jeu fusionné en CSV (défaut : {GLOBAL_CSV})")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.rebuild:
+        merged_df, _ = update_merged_store(
+            conso_csv = conso_csv,
+            prod_csv = prod_csv,
+            price_path = DEFAULT_PRICE_DATA_PATH,
+            store = MERGED_STORE,
+            tariff_path = DEFAULT_TARIFF_PATH,
+            full = True)
+        cube = refresh_rollups(
+            df = merged_df,
+            full = True)
+        print(f"🧩 Jeu fusionné reconstruit : {len(merged_df)} lignes, cube de {len(cube['day'])} jours")
+    if args.export_csv:
+        path = export_merged_csv(args.export_csv)
+        print(f"📄 Jeu fusionné exporté : {path}")
+
+
+if __name__ == "__main__":
+    main()
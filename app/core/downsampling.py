@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+app/core/downsampling.py
+
+Réduction du nombre de points des séries temporelles avant tracé.
+
+Deux méthodes, qui renvoient les positions des points conservés (points
+réels de la série, premier et dernier inclus) :
+- LTTB (Largest-Triangle-Three-Buckets) : conserve la forme visuelle de la courbe
+- min/max par intervalle : conserve exactement les extrêmes de chaque intervalle
+
+downsample_frame applique la réduction à plusieurs colonnes d'un DataFrame et
+garde l'union des points retenus pour chacune : chaque courbe conserve ainsi
+ses propres pics, et le volume envoyé au navigateur reste borné quelle que
+soit la largeur de la plage affichée.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+DOWNSAMPLING_METHODS = ("lttb", "minmax")
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Sélectionne n_out points par l'algorithme Largest-Triangle-Three-Buckets.
+
+    Paramètres :
+        x (np.ndarray) : abscisses croissantes (numériques)
+        y (np.ndarray) : ordonnées
+        n_out (int) : nombre de points à conserver (>= 3)
+
+    Retour :
+        np.ndarray : positions des points conservés, triées
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype = "float64")
+    y = np.nan_to_num(np.asarray(y, dtype = "float64"))
+
+    # Intervalles intermédiaires : le premier et le dernier point sont toujours gardés
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype = np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Moyenne de l'intervalle suivant (ou dernier point)
+        nlo, nhi = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Conserve le minimum et le maximum de chaque intervalle (n_out // 2 intervalles).
+
+    Paramètres :
+        y (np.ndarray) : ordonnées
+        n_out (int) : nombre maximal de points à conserver
+
+    Retour :
+        np.ndarray : positions des points conservés, triées
+    """
+    n = len(y)
+    n_buckets = max(1, n_out // 2)
+    if n <= n_out:
+        return np.arange(n)
+
+    y = np.nan_to_num(np.asarray(y, dtype = "float64"))
+    buckets = (np.arange(n) * n_buckets) // n
+    order = np.lexsort((y, buckets))
+    starts = np.searchsorted(buckets[order], np.arange(n_buckets), side = "left")
+    ends = np.append(starts[1:], n) - 1
+    kept = np.union1d(order[starts], order[ends])
+    return np.union1d(kept, [0, n - 1])
+
+
+def downsample_frame(df: pd.DataFrame,
+                     columns: list[str],
+                     max_points: int,
+                     method: str = "lttb",
+                     x_col: str = "datetime") -> tuple[pd.DataFrame, dict]:
+    """
+    Réduit un DataFrame trié à au plus max_points points par colonne tracée.
+
+    Paramètres :
+        df (pd.DataFrame) : données triées par x_col
+        columns (list[str]) : colonnes tracées (les absentes sont ignorées)
+        max_points (int) : budget de points par courbe (~ largeur du graphique en pixels)
+        method (str) : 'lttb' ou 'minmax'
+        x_col (str) : colonne des abscisses
+
+    Retour :
+        tuple(pd.DataFrame, dict) : lignes conservées et statistiques
+                                    {'method', 'max_points', 'points_in', 'points_out', 'ratio'}
+    """
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"Méthode de réduction inconnue : {method} ({DOWNSAMPLING_METHODS})")
+
+    n = len(df)
+    columns = [c for c in columns if c in df.columns]
+    if n <= max_points or not columns:
+        kept = np.arange(n)
+    else:
+        x = pd.to_datetime(df[x_col]).to_numpy(dtype = "datetime64[ns]").astype(np.int64)
+        kept = np.array([], dtype = np.int64)
+        for col in columns:
+            y = df[col].to_numpy(dtype = "float64", na_value = np.nan)
+            idx = lttb_indices(x, y, max_points) if method == "lttb" else minmax_indices(y, max_points)
+            kept = np.union1d(kept, idx)
+
+    stats = {
+        "method": method,
+        "max_points": int(max_points),
+        "points_in": int(n),
+        "points_out": int(len(kept)),
+        "ratio": round(len(kept) / n, 4) if n else 1.0,
+    }
+    return df.iloc[kept], stats
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+app/core/merged_store.py
+
+Jeu fusionné consommation / production / prix matérialisé et mis à jour
+de façon incrémentale.
+
+Le jeu est stocké en partitions mensuelles (data/merged/merged_data/YYYY-MM.parquet)
+décrites par un manifest.json qui conserve, pour chaque source, l'état
+observé lors de la dernière fusion :
+- séries consommation / production : signature de chaque partition mensuelle
+  (lignes, dernier horodatage, mtime, taille) ;
+- prix : dernier horodatage et empreinte du contenu ;
+- contrat tarifaire (common.tariffs) : empreinte (toute modification refusionne tout).
+
+Lorsqu'une source change, seules ses partitions réécrites sont relues et
+comparées au jeu stocké pour trouver le premier horodatage modifié ; la
+jointure et les colonnes dérivées (total, bilan énergétique, coûts) ne sont recalculées qu'à
+partir de cet instant, et seules les partitions du jeu fusionné concernées
+sont réécrites. Une mise à jour quotidienne ne refusionne donc qu'une journée.
+
+update_merged_store renvoie aussi le premier instant modifié ('last_change'),
+que l'appelant peut transmettre au cube d'agrégats (argument `since`) ; le cube
+détecte de toute façon les jours modifiés par empreinte de contenu, y compris
+d'un processus à l'autre.
+
+La consommation Enedis est horodatée en fin de pas : elle est ramenée au début
+de son pas avant la fusion (voir merge_conso_prod_data), et le jeu fusionné est
+indexé sur le début de chaque pas de 30 minutes.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import MERGED_STORE
+from common.data_tools import interval_step, load_price_data, merge_conso_prod_data, to_interval_start
+from common.storage import get_backend, partition_signatures, read_series
+from common.tariffs import load_tariff_contract
+from conso_api_tools.config import TIMESTAMP_LABEL as CONSO_LABEL
+
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 4
+
+# Colonne du jeu fusionné portée par chaque série source
+SERIES_COLUMNS = {
+    "consommation": "consommation",
+    "production": "production",
+}
+
+# Convention d'horodatage de chaque série source ('end' : fin du pas)
+SERIES_LABELS = {
+    "consommation": CONSO_LABEL,
+    "production": "start",
+}
+
+
+# ---------------------------------------------------------------
+# 💾 Lecture / écriture des partitions
+# ---------------------------------------------------------------
+
+def load_store_manifest(store: Path | None = None) -> dict | None:
+    """
+    Charge le manifeste du jeu fusionné.
+
+    Paramètres :
+        store (Path | None) : dossier du jeu matérialisé (défaut : MERGED_STORE)
+
+    Retour :
+        dict | None : manifeste, ou None s'il est absent ou d'un format antérieur
+    """
+    manifest_path = Path(store or MERGED_STORE) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    with open(
+        file = manifest_path,
+        mode = "r",
+        encoding = "utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION or manifest.get("backend") != get_backend().name:
+        return None
+    return manifest
+
+
+def read_store(manifest: dict, store: Path | None = None) -> pd.DataFrame:
+    """Relit toutes les partitions du jeu fusionné (colonne 'datetime', triée)."""
+    backend = get_backend()
+    folder = Path(store or MERGED_STORE)
+    parts = [backend.read(folder / manifest["partitions"][key]["file"]).reset_index()
+             for key in sorted(manifest["partitions"])]
+    if not parts:
+        return pd.DataFrame(columns = ["datetime"])
+    return pd.concat(
+        objs = parts,
+        ignore_index = True)
+
+
+def _save_store_manifest(manifest: dict, store: Path) -> None:
+    """Écrit le manifeste du jeu fusionné de façon atomique."""
+    manifest_path = store / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(
+        file = tmp_path,
+        mode = "w",
+        encoding = "utf-8") as f:
+        json.dump(
+            obj = manifest,
+            fp = f,
+            indent = 2,
+            sort_keys = True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _write_partitions(df: pd.DataFrame, since, manifest: dict, store: Path) -> None:
+    """
+    Réécrit les partitions mensuelles du jeu fusionné à partir du mois de `since`
+    (toutes si since vaut None) et met à jour le manifeste en mémoire.
+    """
+    backend = get_backend()
+    store.mkdir(
+        parents = True,
+        exist_ok = True)
+
+    keys = pd.to_datetime(df["datetime"]).dt.strftime("%Y-%m")
+    first_key = None if since is None else pd.Timestamp(since).strftime("%Y-%m")
+    old_partitions = manifest.get("partitions", {})
+    partitions = {k: v for k, v in old_partitions.items() if first_key is not None and k < first_key}
+    for key, part in df.groupby(keys, sort = True):
+        if first_key is not None and key < first_key:
+            continue
+        file_name = f"{key}{backend.suffix}"
+        tmp_path = store / f"{key}.tmp{backend.suffix}"
+        backend.write(part.set_index("datetime"), tmp_path)
+        os.replace(tmp_path, store / file_name)
+        partitions[key] = {"file": file_name, "rows": int(len(part))}
+
+    # Partitions disparues (données supprimées dans les sources)
+    for key, meta in old_partitions.items():
+        if key not in partitions:
+            (store / meta["file"]).unlink(missing_ok = True)
+
+    manifest["partitions"] = partitions
+    manifest["rows"] = int(len(df))
+
+
+# ---------------------------------------------------------------
+# 🔍 Détection des plages modifiées
+# ---------------------------------------------------------------
+
+def _price_state(price_df: pd.DataFrame | None, until=None) -> dict | None:
+    """Dernier horodatage et empreinte du contenu des prix (jusqu'à `until` inclus)."""
+    if price_df is None:
+        return None
+    if until is not None:
+        price_df = price_df[price_df["datetime"] <= pd.Timestamp(until)]
+    digest = hashlib.sha1(pd.util.hash_pandas_object(price_df, index = False).to_numpy().tobytes())
+    return {
+        "end": price_df["datetime"].max().isoformat() if len(price_df) else None,
+        "hash": digest.hexdigest(),
+    }
+
+
+def _first_difference(new: pd.Series, old: pd.Series):
+    """Premier horodatage où deux séries diffèrent (valeur, ajout ou suppression), sinon None."""
+    index = new.index.union(old.index)
+    a = new.reindex(index).to_numpy(dtype = "float64", na_value = np.nan)
+    b = old.reindex(index).to_numpy(dtype = "float64", na_value = np.nan)
+    differs = ~((a == b) | (np.isnan(a) & np.isnan(b)))
+    return index[differs].min() if differs.any() else None
+
+
+def _series_change(csv_path: Path, column: str, signatures: dict, old_signatures: dict, stored: pd.DataFrame,
+                   label: str = "start"):
+    """
+    Premier horodatage modifié d'une série source depuis la dernière fusion.
+
+    Seules les partitions dont la signature a changé sont relues et comparées
+    aux valeurs du jeu fusionné stocké, après conversion au début de pas.
+    """
+    changed = sorted(k for k in set(signatures) | set(old_signatures)
+                     if signatures.get(k) != old_signatures.get(k))
+    if not changed:
+        return None
+
+    start = pd.Period(changed[0], freq = "M").start_time
+    new = read_series(csv_path, start = start)[column]
+    new.index = to_interval_start(new.index, label)
+    new = new[new.index >= start]
+    old = stored.loc[stored["datetime"] >= start].set_index("datetime")[column]
+    return _first_difference(new, old)
+
+
+def _price_change(price_df: pd.DataFrame | None, old_state: dict | None):
+    """
+    Premier horodatage fusionné impacté par une modification des prix.
+
+    Retour :
+        (bool, Timestamp | None) : (reconstruction complète nécessaire, début de la plage impactée)
+    """
+    new_state = _price_state(price_df)
+    if new_state == old_state:
+        return False, None
+    if old_state is None or new_state is None or old_state["end"] is None:
+        return True, None
+    # Prix antérieurs inchangés : seule la plage prolongée depuis le dernier prix connu est impactée
+    if _price_state(price_df, until = old_state["end"]) != old_state:
+        return True, None
+    return False, pd.Timestamp(old_state["end"])
+
+
+# ---------------------------------------------------------------
+# 🔄 Mise à jour incrémentale
+# ---------------------------------------------------------------
+
+def _merge_from(since, conso_csv: Path, prod_csv: Path, price_df: pd.DataFrame | None, tariff: dict | None) -> pd.DataFrame:
+    """Fusionne les sources à partir du début de pas `since` (toutes les données si None)."""
+    conso_since = since
+    if since is not None and CONSO_LABEL == "end":
+        # Le pas commençant à `since` porte l'horodatage de sa fin dans la série Enedis
+        conso_since = pd.Timestamp(since) + interval_step()
+    conso_df = read_series(conso_csv, start = conso_since).reset_index()
+    prod_df = read_series(prod_csv, start = since).reset_index()
+    if price_df is not None and since is not None:
+        # Dernier prix connu avant `since` conservé pour le report (ffill)
+        before = price_df["datetime"] <= pd.Timestamp(since)
+        first = price_df.loc[before, "datetime"].max() if before.any() else price_df["datetime"].min()
+        price_df = price_df[price_df["datetime"] >= first]
+    return merge_conso_prod_data(conso_df, prod_df, price_df = price_df, tariff = tariff, conso_label = CONSO_LABEL)
+
+
+def update_merged_store(conso_csv: Path,
+                        prod_csv: Path,
+                        price_path: Path | None = None,
+                        store: Path | None = None,
+                        tariff_path: Path | None = None,
+                        full: bool = False,
+                        tariff: dict | None = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Met à jour le jeu fusionné matérialisé et le renvoie.
+
+    Paramètres :
+        conso_csv (Path) : CSV 30 min de consommation
+        prod_csv (Path) : CSV 30 min de production
+        price_path (Path | None) : fichier de prix (défaut : chemin de load_price_data)
+        store (Path | None) : dossier du jeu matérialisé (défaut : MERGED_STORE)
+        tariff_path (Path | None) : contrat tarifaire (défaut : chemin de load_tariff_contract)
+        full (bool) : force une fusion complète
+        tariff (dict | None) : contrat déjà chargé par l'appelant (sinon lu depuis tariff_path)
+
+    Retour :
+        tuple(pd.DataFrame, dict) : jeu fusionné et dernière modification
+                                    {'since': début de la plage refusionnée (None = aucune),
+                                     'full': fusion complète}
+    """
+    store = Path(store or MERGED_STORE)
+    price_df = load_price_data(price_path)
+    if tariff is None:
+        tariff = load_tariff_contract(tariff_path)
+    backend = get_backend()
+    sources = {
+        "consommation": {"signatures": partition_signatures(conso_csv)},
+        "production": {"signatures": partition_signatures(prod_csv)},
+        "prices": _price_state(price_df),
+        "tariff": tariff["fingerprint"] if tariff is not None else None,
+    }
+
+    previous = load_store_manifest(store)
+    manifest = None if full else previous
+    stored = read_store(manifest, store) if manifest is not None and manifest.get("rows") else None
+
+    since = None
+    if stored is not None:
+        changes = []
+        for name, csv_path in (("consommation", conso_csv), ("production", prod_csv)):
+            changes.append(_series_change(
+                csv_path = csv_path,
+                column = SERIES_COLUMNS[name],
+                signatures = sources[name]["signatures"],
+                old_signatures = manifest["sources"][name]["signatures"],
+                stored = stored,
+                label = SERIES_LABELS[name]))
+        price_full, price_since = _price_change(price_df, manifest["sources"]["prices"])
+        full = full or price_full or manifest["sources"].get("tariff") != sources["tariff"]
+        changes.append(price_since)
+        changes = [c for c in changes if c is not None]
+        since = min(changes) if changes else None
+    full = full or stored is None
+
+    if full:
+        merged_df = _merge_from(None, conso_csv, prod_csv, price_df, tariff)
+        since = merged_df["datetime"].min() if len(merged_df) else None
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "backend": backend.name,
+            "partitions": (previous or {}).get("partitions", {}),
+        }
+    elif since is not None:
+        tail = _merge_from(since, conso_csv, prod_csv, price_df, tariff)
+        merged_df = pd.concat(
+            objs = [stored.loc[stored["datetime"] < since], tail],
+            ignore_index = True)
+    else:
+        merged_df = stored
+
+    last_change = {
+        "since": since.isoformat() if since is not None else None,
+        "full": bool(full),
+    }
+    sources_changed = manifest.get("sources") != json.loads(json.dumps(sources))
+    manifest["sources"] = sources
+    if backend.name != "csv" and (full or since is not None or sources_changed):
+        try:
+            if full or since is not None:
+                _write_partitions(merged_df, None if full else since, manifest, store)
+            _save_store_manifest(manifest, store)
+        except OSError as e:
+            print(f"⚠️ Jeu fusionné non matérialisé dans {store} ({e}) — conservé en mémoire uniquement.")
+    return merged_df, last_change
@@ -1,10 +1,106 @@
+"""
+Découpage des données en périodes hebdomadaires ou mensuelles.
+
+Le début de période est calculé de façon vectorisée en arithmétique
+datetime64 (semaine commençant le lundi, comme to_period("W")), sans appel
+Python par ligne ; seuls les débuts de période uniques sont ensuite
+formatés, et les libellés Babel sont mis en cache par (période, locale).
+Pour des données triées, les bornes de chaque période sont obtenues par
+searchsorted, ce qui permet de découper le DataFrame sans le filtrer.
+"""
+
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 from babel.dates import format_date
 
-def extract_periods(df: pd.DataFrame, freq: str):
+
+# Le 1970-01-01 (origine datetime64) est un jeudi : décalage pour que les semaines commencent le lundi
+_EPOCH_WEEKDAY = 3
+
+
+def floor_periods(datetimes, freq: str) -> np.ndarray:
+    """
+    Ramène chaque horodatage au début de sa période, sans boucle Python.
+
+    Paramètres
+    ----------
+    datetimes : array-like de datetime
+        Horodatages à ramener.
+    freq : str
+        Fréquence : "W" pour hebdo (début le lundi), "M" pour mensuel.
+
+    Retour
+    ------
+    np.ndarray
+        Débuts de période (datetime64[ns]), un par horodatage.
+    """
+    values = pd.to_datetime(datetimes).to_numpy(dtype = "datetime64[ns]")
+    if freq == "W":
+        days = values.astype("datetime64[D]")
+        weekday = (days.astype(np.int64) + _EPOCH_WEEKDAY) % 7
+        return (days - weekday.astype("timedelta64[D]")).astype("datetime64[ns]")
+    if freq == "M":
+        return values.astype("datetime64[M]").astype("datetime64[ns]")
+    raise ValueError("Fréquence non supportée (W ou M uniquement).")
+
+
+@lru_cache(maxsize = 4096)
+def period_label(start: pd.Timestamp, freq: str, locale: str = "fr_FR") -> str:
+    """
+    Libellé textuel d'une période (mis en cache par période, fréquence et locale).
+
+    Paramètres
+    ----------
+    start : pd.Timestamp
+        Début de la période.
+    freq : str
+        Fréquence : "W" ou "M".
+    locale : str
+        Locale Babel utilisée pour le formatage.
+
+    Retour
+    ------
+    str
+        "Semaine du 24 mars au 30 mars 2025" ou "Mois de mars 2025".
+    """
+    if freq == "W":
+        return (f"Semaine du {format_date(date = start, format = 'd MMMM', locale = locale)} au "
+                f"{format_date(date = start + pd.offsets.Day(n = 6), format = 'd MMMM y', locale = locale)}")
+    if freq == "M":
+        return f"Mois de {format_date(date = start, format = 'LLLL y', locale = locale)}"
+    raise ValueError("Fréquence non supportée (W ou M uniquement).")
+
+
+def period_bounds(df: pd.DataFrame, freq: str) -> tuple[pd.DatetimeIndex, np.ndarray, np.ndarray]:
+    """
+    Débuts de période et bornes de lignes de chaque période d'un DataFrame trié.
+
+    Paramètres
+    ----------
+    df : pd.DataFrame
+        DataFrame trié par 'datetime'.
+    freq : str
+        Fréquence : "W" ou "M".
+
+    Retour
+    ------
+    tuple (starts, lo, hi)
+        - starts : débuts de période uniques, croissants
+        - lo, hi : positions [lo, hi[ des lignes de chaque période (df.iloc[lo:hi])
+    """
+    floored = floor_periods(df["datetime"], freq)
+    starts = np.unique(floored)
+    lo = np.searchsorted(floored, starts, side = "left")
+    hi = np.searchsorted(floored, starts, side = "right")
+    return pd.DatetimeIndex(starts), lo, hi
+
+
+def extract_periods(df: pd.DataFrame, freq: str, locale: str = "fr_FR"):
     """
     Extrait les périodes hebdomadaires ou mensuelles et génère des labels
-    formatés en français pour l'affichage.
+    formatés en français pour l'affichage (le DataFrame n'est pas modifié).
 
     Paramètres
     ----------
@@ -12,6 +108,8 @@ def extract_periods(df: pd.DataFrame, freq: str):
         DataFrame contenant une colonne 'datetime'.
     freq : str
         Fréquence : "W" pour hebdo, "M" pour mensuel.
+    locale : str
+        Locale Babel utilisée pour les libellés.
 
     Retour
     ------
@@ -19,37 +117,31 @@ def extract_periods(df: pd.DataFrame, freq: str):
         - period_list : dates représentant le début de chaque période
         - labels : libellés textuels en français
     """
+    starts = np.unique(floor_periods(df["datetime"], freq))
+    period_list = pd.Series(starts, name = "period")
+    labels = [period_label(pd.Timestamp(p), freq, locale) for p in starts]
+    return period_list, labels
 
-    if freq == "W":
-        # Extraction du début de la semaine
-        df["period"] = df["datetime"].dt.to_period(
-            freq = "W").apply(lambda r: r.start_time)
-        period_list = df["period"].drop_duplicates().sort_values()
-
-        # Labels : "Semaine du 12 mars au 18 mars 2025"
-        labels = [
-            f"Semaine du {format_date(
-                date = p, 
-                format = 'd MMMM', 
-                locale = 'fr_FR')} au "
-            f"{format_date(
-                date = p + pd.offsets.Day(n = 6), 
-                format = 'd MMMM y', 
-                locale='fr_FR')}"
-            for p in period_list
-        ]
-
-    elif freq == "M":
-        # Extraction du premier jour du mois
-        df["period"] = df["datetime"].dt.to_period(
-            freq = "M").apply(lambda r: r.start_time)
-        period_list = df["period"].drop_duplicates().sort_values()
-        labels = [f"Mois de {format_date(
-            date = p, 
-            format = 'LLLL y', 
-            locale = 'fr_FR')}" for p in period_list]
-
-    else:
-        raise ValueError("Fréquence non supportée (W ou M uniquement).")
 
-    return period_list, labels
+def compute_period_options(df: pd.DataFrame) -> dict:
+    """
+    Calcule les bornes de dates et les listes de semaines / mois disponibles,
+    utilisées comme options des sélecteurs de période.
+
+    Paramètres
+    ----------
+    df : pd.DataFrame
+        DataFrame contenant une colonne 'datetime'.
+
+    Retour
+    ------
+    dict
+        {'min': premier horodatage, 'max': dernier horodatage,
+         'W': semaines (pd.Period) croissantes, 'M': mois (pd.Period) croissants}
+    """
+    datetimes = pd.to_datetime(df["datetime"])
+    options = {"min": datetimes.min(), "max": datetimes.max()}
+    for freq in ("W", "M"):
+        starts = np.unique(floor_periods(datetimes, freq))
+        options[freq] = list(pd.DatetimeIndex(starts).to_period(freq))
+    return options
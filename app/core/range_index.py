@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+app/core/range_index.py
+
+Index de requêtes par plage sur le jeu fusionné.
+
+Les horodatages triés sont conservés dans un tableau datetime64 et chaque
+mesure sommable dans un tableau de sommes cumulées (float64, précédé d'un 0).
+Le total d'une mesure sur [start, end] vaut alors :
+
+    cumsum[hi] - cumsum[lo]     avec lo, hi obtenus par deux searchsorted
+
+soit un coût indépendant de la longueur de la plage (un jour ou cinq ans).
+"""
+
+import numpy as np
+import pandas as pd
+
+from common.data_tools import BALANCE_COLUMNS, energy_balance
+
+
+# Mesures sommables indexées par défaut
+RANGE_COLUMNS = ["consommation", "production", "total", "consumption_cost_eur", "production_savings_eur",
+                 *BALANCE_COLUMNS]
+
+
+class RangeSumIndex:
+    """
+    Sommes cumulées d'un DataFrame trié par 'datetime'.
+
+    Paramètres :
+        df (pd.DataFrame) : données fusionnées avec une colonne 'datetime'
+        columns (list[str]) : mesures à indexer (les colonnes absentes valent 0, sauf
+                              celles du bilan énergétique, recalculées depuis
+                              'consommation' / 'production')
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: list[str] = RANGE_COLUMNS):
+        times = pd.to_datetime(df["datetime"]).to_numpy(dtype = "datetime64[ns]")
+        if len(times) > 1 and not (times[1:] >= times[:-1]).all():
+            order = np.argsort(times, kind = "stable")
+            df = df.iloc[order]
+            times = times[order]
+
+        self.df = df
+        self.times = times
+        balance = {}
+        if any(col in columns and col not in df.columns for col in BALANCE_COLUMNS):
+            balance = dict(zip(BALANCE_COLUMNS, energy_balance(df["consommation"], df["production"])))
+
+        self.cumsums = {}
+        for col in columns:
+            if col in df.columns:
+                values = df[col].to_numpy(dtype = "float64", na_value = 0.0)
+            else:
+                values = np.nan_to_num(balance[col]) if col in balance else np.zeros(len(df))
+            self.cumsums[col] = np.concatenate(([0.0], np.cumsum(values)))
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def bounds(self, start=None, end=None) -> tuple[int, int]:
+        """
+        Positions [lo, hi[ des lignes comprises dans [start, end] (bornes incluses).
+
+        Paramètres :
+            start, end : bornes de la plage (None = sans borne)
+
+        Retour :
+            tuple(int, int) : positions de début (incluse) et de fin (exclue)
+        """
+        lo = 0 if start is None else int(np.searchsorted(self.times, np.datetime64(pd.Timestamp(start), "ns"), side = "left"))
+        hi = len(self.times) if end is None else int(np.searchsorted(self.times, np.datetime64(pd.Timestamp(end), "ns"), side = "right"))
+        return lo, max(lo, hi)
+
+    def totals(self, start=None, end=None) -> dict:
+        """
+        Totaux des mesures indexées sur [start, end].
+
+        Retour :
+            dict : {mesure: somme, ..., 'rows': nombre de lignes,
+                    'first': premier horodatage, 'last': dernier horodatage (ou None)}
+        """
+        lo, hi = self.bounds(start, end)
+        totals = {col: float(cum[hi] - cum[lo]) for col, cum in self.cumsums.items()}
+        totals["rows"] = hi - lo
+        totals["first"] = pd.Timestamp(self.times[lo]) if hi > lo else None
+        totals["last"] = pd.Timestamp(self.times[hi - 1]) if hi > lo else None
+        return totals
+
+    def slice(self, start=None, end=None) -> pd.DataFrame:
+        """Lignes du DataFrame comprises dans [start, end], sans masque booléen sur toute la colonne."""
+        lo, hi = self.bounds(start, end)
+        return self.df.iloc[lo:hi]
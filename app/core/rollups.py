@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+app/core/rollups.py
+
+Cube d'agrégats pré-calculés (jour, semaine ISO, mois) du jeu fusionné.
+
+Pour chaque grain, une ligne par période contient :
+- les sommes de consommation, production, total, coût et économies
+- les sommes du bilan énergétique par pas : autoconsommation, injection, soutirage
+- les maxima de consommation et de production
+- le nombre de pas de 30 min agrégés (pour les moyennes)
+
+Le grain journalier est calculé depuis les données 30 min ; les grains
+semaine et mois sont dérivés des lignes journalières. Le cube est persisté
+(data/merged/rollups/) et rafraîchi de façon incrémentale : chaque jour porte
+une empreinte de son contenu ('digest', hachage vectorisé des lignes), si bien
+que seuls les jours dont les valeurs ont changé (ajout de données, changement
+de prix ou de contrat, source corrigée) et les jours postérieurs à `since` sont
+recalculés, ainsi que les semaines / mois qui les contiennent.
+
+Les modes Hebdomadaire / Mensuel et le tableau de statistiques lisent
+ainsi quelques centaines de lignes au lieu de dizaines de milliers de points.
+
+🧩 Exemple d'utilisation :
+    python -m app.core.rollups --refresh
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from app.core.config import ROLLUP_DIR
+from common.data_tools import BALANCE_COLUMNS, add_energy_balance
+from common.storage import get_backend
+
+
+# Colonnes sommées et colonnes dont on conserve le maximum
+SUM_COLUMNS = ["consommation", "production", "total", "consumption_cost_eur", "production_savings_eur",
+               *BALANCE_COLUMNS]
+PEAK_COLUMNS = ["consommation", "production"]
+
+# Colonne d'empreinte du contenu d'une journée (grain journalier uniquement)
+DIGEST_COLUMN = "digest"
+
+# Grains du cube : nom → fréquence pandas des périodes (semaine ISO : lundi → dimanche)
+GRAINS = {
+    "day": "D",
+    "week": "W",
+    "month": "M",
+}
+
+
+# ---------------------------------------------------------------
+# 🧮 Calcul des agrégats
+# ---------------------------------------------------------------
+
+def day_digests(df: pd.DataFrame) -> pd.Series:
+    """
+    Empreinte du contenu de chaque journée d'un jeu fusionné.
+
+    Chaque ligne (horodatage et mesures sommées) est hachée, puis les empreintes
+    des lignes d'une journée sont additionnées : toute valeur modifiée, ajoutée
+    ou supprimée change l'empreinte du jour. Les empreintes sont ramenées à
+    52 bits pour rester exactes une fois stockées en float64.
+
+    Paramètres :
+        df (pd.DataFrame) : données fusionnées avec une colonne 'datetime'
+
+    Retour :
+        pd.Series : empreinte (float64) par jour, indexée par minuit
+    """
+    datetimes = pd.to_datetime(df["datetime"])
+    content = df.reindex(columns = SUM_COLUMNS).astype("float64")
+    content.insert(0, "datetime", datetimes.to_numpy())
+    row_hashes = (pd.util.hash_pandas_object(content, index = False).to_numpy() >> 12).astype("int64")
+    days = pd.DatetimeIndex(datetimes.dt.normalize(), name = "datetime")
+    sums = pd.Series(row_hashes, index = days).groupby(level = 0).sum()
+    return (sums % (1 << 52)).astype("float64")
+
+
+def compute_day_rollup(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrège des données 30 min au grain journalier.
+
+    Paramètres :
+        df (pd.DataFrame) : données fusionnées avec une colonne 'datetime'
+
+    Retour :
+        pd.DataFrame : une ligne par jour (index 'datetime' = minuit), colonnes
+                       '<mesure>_sum', '<mesure>_max', 'rows', 'digest'
+    """
+    data = df.set_index("datetime")
+    if not all(col in data.columns for col in BALANCE_COLUMNS):
+        data = add_energy_balance(data.copy())
+    days = pd.DatetimeIndex(data.index.normalize(), name = "datetime")
+
+    sums = data.reindex(columns = SUM_COLUMNS).astype("float64").groupby(days).sum()
+    sums.columns = [f"{c}_sum" for c in sums.columns]
+    peaks = data.reindex(columns = PEAK_COLUMNS).astype("float64").groupby(days).max()
+    peaks.columns = [f"{c}_max" for c in peaks.columns]
+
+    day = pd.concat(objs = [sums, peaks], axis = 1)
+    day["rows"] = data.groupby(days).size().astype("float64")
+    day[DIGEST_COLUMN] = day_digests(df) if len(df) else pd.Series(dtype = "float64")
+    return day
+
+
+def derive_rollup(day: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """
+    Dérive un grain plus large (semaine, mois) à partir des lignes journalières.
+
+    Paramètres :
+        day (pd.DataFrame) : agrégats journaliers
+        freq (str) : 'W' ou 'M'
+
+    Retour :
+        pd.DataFrame : une ligne par période, indexée par son premier jour
+    """
+    periods = pd.DatetimeIndex(day.index.to_period(freq).start_time, name = "datetime")
+    aggregations = {c: ("max" if c.endswith("_max") else "sum") for c in day.columns if c != DIGEST_COLUMN}
+    return day.groupby(periods).agg(aggregations)
+
+
+def _periods_of(days: pd.DatetimeIndex, freq: str) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(days.to_period(freq).start_time).unique()
+
+
+# ---------------------------------------------------------------
+# 💾 Persistance et rafraîchissement incrémental
+# ---------------------------------------------------------------
+
+def load_rollups(rollup_dir: Path = ROLLUP_DIR) -> dict | None:
+    """
+    Charge le cube persisté.
+
+    Retour :
+        dict | None : {grain: DataFrame}, ou None si le cube est absent, incomplet
+                      ou antérieur aux colonnes actuelles (recalcul complet)
+    """
+    backend = get_backend()
+    expected = [f"{c}_sum" for c in SUM_COLUMNS] + [f"{c}_max" for c in PEAK_COLUMNS] + ["rows"]
+    cube = {}
+    for grain in GRAINS:
+        path = Path(rollup_dir) / f"{grain}{backend.suffix}"
+        if not path.exists():
+            return None
+        cube[grain] = backend.read(path).astype("float64")
+        if not set(expected + ([DIGEST_COLUMN] if grain == "day" else [])).issubset(cube[grain].columns):
+            return None
+    return cube
+
+
+def _save_rollups(cube: dict, rollup_dir: Path) -> None:
+    """Écrit chaque grain du cube de façon atomique."""
+    backend = get_backend()
+    rollup_dir = Path(rollup_dir)
+    rollup_dir.mkdir(
+        parents = True,
+        exist_ok = True)
+    for grain, table in cube.items():
+        path = rollup_dir / f"{grain}{backend.suffix}"
+        tmp_path = rollup_dir / f"{grain}.tmp{backend.suffix}"
+        backend.write(table, tmp_path)
+        os.replace(tmp_path, path)
+
+
+def refresh_rollups(df: pd.DataFrame,
+                    rollup_dir: Path = ROLLUP_DIR,
+                    since=None,
+                    full: bool = False) -> dict:
+    """
+    Met à jour le cube d'agrégats pour un jeu fusionné et le persiste.
+
+    Paramètres :
+        df (pd.DataFrame) : données fusionnées (30 min) avec une colonne 'datetime'
+        rollup_dir (Path) : dossier de persistance du cube
+        since : force le recalcul des jours à partir de cette date
+                (ex. correction de données passées) ; None = détection par empreinte
+        full (bool) : ignore le cube persisté et recalcule tous les jours
+
+    Retour :
+        dict : {'day' | 'week' | 'month': DataFrame d'agrégats indexé par période}
+    """
+    if df.empty:
+        return {grain: compute_day_rollup(df) for grain in GRAINS}
+
+    stored = None if full else load_rollups(rollup_dir)
+    days = pd.DatetimeIndex(pd.to_datetime(df["datetime"]).dt.normalize())
+    digests = day_digests(df)
+
+    if stored is None or stored["day"].empty:
+        dirty = digests.index
+        old_day = None
+    else:
+        old_day = stored["day"]
+        old_digests = old_day[DIGEST_COLUMN].reindex(digests.index)
+        dirty_mask = old_digests.ne(digests) | old_digests.isna()
+        if since is not None:
+            dirty_mask |= digests.index >= pd.Timestamp(since).normalize()
+        dirty = digests.index[dirty_mask]
+        removed = old_day.index.difference(digests.index)
+        if dirty.empty and removed.empty:
+            return stored
+        dirty = dirty.union(removed)
+
+    # 1) Grain journalier : seuls les jours modifiés sont recalculés
+    fresh_day = compute_day_rollup(df.loc[days.isin(dirty)])
+    if old_day is None:
+        day = fresh_day
+    else:
+        day = pd.concat(objs = [old_day.drop(index = dirty, errors = "ignore"), fresh_day]).sort_index()
+
+    # 2) Semaines / mois : seules les périodes contenant un jour modifié sont dérivées à nouveau
+    cube = {"day": day}
+    for grain, freq in GRAINS.items():
+        if grain == "day":
+            continue
+        touched = _periods_of(dirty, freq)
+        day_periods = pd.DatetimeIndex(day.index.to_period(freq).start_time)
+        fresh = derive_rollup(day.loc[day_periods.isin(touched)], freq)
+        if old_day is None:
+            cube[grain] = fresh
+        else:
+            cube[grain] = pd.concat(objs = [stored[grain].drop(index = touched, errors = "ignore"),
+                                            fresh]).sort_index()
+
+    try:
+        _save_rollups(cube, rollup_dir)
+    except OSError as e:
+        print(f"⚠️ Impossible d'écrire le cube d'agrégats dans {rollup_dir} : {e}")
+    return cube
+
+
+# ---------------------------------------------------------------
+# 🔎 Lecture du cube
+# ---------------------------------------------------------------
+
+def rollup_view(cube: dict, grain: str, start=None, end=None) -> pd.DataFrame:
+    """
+    Renvoie un grain du cube sous la forme attendue par les fonctions de tracé.
+
+    Les périodes retenues sont celles qui recoupent [start, end].
+
+    Paramètres :
+        cube (dict) : cube renvoyé par refresh_rollups / load_rollups
+        grain (str) : 'day', 'week' ou 'month'
+        start, end : bornes de la sélection (None = sans borne)
+
+    Retour :
+        pd.DataFrame : colonnes 'datetime' (début de période), sommes des mesures
+                       ('consommation', 'production', 'total', ...), '<mesure>_mean',
+                       '<mesure>_max' et 'rows'
+    """
+    table = cube[grain]
+    if start is not None:
+        start = pd.Timestamp(start)
+        start = start.normalize() if grain == "day" else start.to_period(GRAINS[grain]).start_time
+        table = table.loc[table.index >= start]
+    if end is not None:
+        table = table.loc[table.index <= pd.Timestamp(end)]
+
+    view = pd.DataFrame(index = table.index)
+    for col in SUM_COLUMNS:
+        view[col] = table[f"{col}_sum"]
+    for col in PEAK_COLUMNS:
+        view[f"{col}_mean"] = table[f"{col}_sum"] / table["rows"].where(table["rows"] > 0)
+        view[f"{col}_max"] = table[f"{col}_max"]
+    view["rows"] = table["rows"]
+    return view.reset_index()
+
+
+def rollup_totals(cube: dict, start, end) -> dict | None:
+    """
+    Totaux des mesures sur des journées complètes, lus dans le grain journalier.
+
+    Paramètres :
+        cube (dict) : cube d'agrégats
+        start, end : bornes de la sélection ; start doit être un début de journée
+
+    Retour :
+        dict | None : {'consommation': ..., ..., 'first_day', 'last_day'},
+                      ou None si la sélection ne couvre pas des journées entières
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if start != start.normalize() or end.normalize() + pd.Timedelta(1, unit = "D") - end > pd.Timedelta(30, unit = "min"):
+        return None
+
+    day = rollup_view(cube, "day", start, end)
+    if day.empty:
+        return None
+    totals = {col: float(day[col].sum()) for col in SUM_COLUMNS}
+    totals["first_day"] = day["datetime"].min()
+    totals["last_day"] = day["datetime"].max()
+    return totals
+
+
+# ---------------------------------------------------------------
+# 🖥️ Ligne de commande
+# ---------------------------------------------------------------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cube d'agrégats jour / semaine / mois")
+    parser.add_argument("--refresh", action="store_true", help="Met à jour le cube depuis les séries stockées")
+    parser.add_argument("--since", default=None, help="Recalcule les jours à partir de cette date YYYY-MM-DD")
+    parser.add_argument("--full", action="store_true", help="Recalcule entièrement le cube")
+    return parser.parse_args()
+
+
+def main():
+    from app.core.data_manager import load_merged_data
+
+    args = parse_args()
+    if args.refresh or args.since or args.full:
+        cube = refresh_rollups(load_merged_data(), since = args.since, full = args.full)
+        print(f"🧊 Cube mis à jour : {len(cube['day'])} jours, {len(cube['week'])} semaines, {len(cube['month'])} mois")
+
+
+if __name__ == "__main__":
+    main()
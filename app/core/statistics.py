@@ -4,19 +4,26 @@ Calculs statistiques et indicateurs énergétiques :
 
 - Totaux de consommation et de production
 - Moyennes journalières / horaires
-- Ratios d'autoconsommation
+- Bilan énergétique : autoconsommation, injection, soutirage et taux associés
 - Statistiques synthétiques pour l'affichage Streamlit
+
+Les totaux d'une sélection sont lus, par ordre de préférence, dans l'index de
+sommes cumulées (app.core.range_index, n'importe quelle plage en O(1)), puis
+dans le grain journalier du cube d'agrégats (app.core.rollups, journées
+entières), et à défaut calculés en sommant les colonnes 30 min.
 """
 
 import pandas as pd
 import common.data_tools as dt
+from app.core.rollups import rollup_totals
+from common.tariffs import subscription_cost
 
 
 # ---------------------------------------------------------------
 # ⚡️ Statistiques principales
 # ---------------------------------------------------------------
 
-def compute_summary(df: pd.DataFrame) -> dict:
+def compute_summary(df: pd.DataFrame, tariff: dict | None = None) -> dict:
     """
     Calcule les totaux et ratios sur la période sélectionnée.
 
@@ -25,18 +32,75 @@ def compute_summary(df: pd.DataFrame) -> dict:
             - 'conso' : consommation électrique (Wh)
             - 'prod' : production photovoltaïque (Wh)
             - 'total' : somme conso + prod
+        tariff (dict | None) : contrat tarifaire compilé (common.tariffs) ; ajoute
+            l'abonnement au prorata et le coût par période tarifaire
 
     Retour :
         dict : dictionnaire contenant les statistiques principales
     """
-    total_conso = df["consommation"].sum()
-    total_prod = df["production"].sum()
-    total_energy = df["total"].sum()
-    estimated_cost_eur = round(df["consumption_cost_eur"].sum() if "consumption_cost_eur" in df.columns else 0.0, 2)
-    estimated_savings_eur = round(df["production_savings_eur"].sum() if "production_savings_eur" in df.columns else 0.0, 2)
+    totals = {
+        "consommation": df["consommation"].sum(),
+        "production": df["production"].sum(),
+        "total": df["total"].sum(),
+        "consumption_cost_eur": df["consumption_cost_eur"].sum() if "consumption_cost_eur" in df.columns else 0.0,
+        "production_savings_eur": df["production_savings_eur"].sum() if "production_savings_eur" in df.columns else 0.0,
+        **dt.balance_totals(df),
+    }
+    summary = summary_from_totals(totals)
+    if tariff is not None and not df.empty:
+        nb_days = (df["datetime"].max() - df["datetime"].min()).days + 1
+        summary.update(tariff_summary(df, tariff, nb_days))
+    return summary
 
-    ratio_autoconso = (total_prod / total_conso * 100) if total_conso else 0
-    ratio_surplus = ((total_prod - total_conso) / total_prod * 100) if total_prod else 0
+
+def tariff_summary(df: pd.DataFrame, tariff: dict, nb_days: float) -> dict:
+    """
+    Indicateurs propres au contrat tarifaire sur la période.
+
+    Paramètres :
+        df (pd.DataFrame) : données fusionnées (colonne 'tariff_period' si valorisées par le contrat)
+        tariff (dict) : contrat tarifaire compilé (common.tariffs)
+        nb_days (float) : durée de la période en jours
+
+    Retour :
+        dict : {'subscription_eur': abonnement au prorata,
+                'cost_by_period_eur': {période: coût de la consommation}}
+    """
+    cost_by_period = {}
+    if "tariff_period" in df.columns and "consumption_cost_eur" in df.columns:
+        grouped = df.groupby("tariff_period", sort = True)["consumption_cost_eur"].sum()
+        cost_by_period = {str(k): round(float(v), 2) for k, v in grouped.items()}
+    return {
+        "subscription_eur": round(subscription_cost(nb_days, tariff), 2),
+        "cost_by_period_eur": cost_by_period,
+    }
+
+
+def summary_from_totals(totals: dict) -> dict:
+    """
+    Construit le dictionnaire de statistiques à partir des totaux de la période.
+
+    Paramètres :
+        totals (dict) : sommes de 'consommation', 'production', 'total',
+                        'consumption_cost_eur', 'production_savings_eur',
+                        'autoconsommation', 'injection' et 'soutirage'
+
+    Retour :
+        dict : dictionnaire contenant les statistiques principales
+    """
+    total_conso = totals["consommation"]
+    total_prod = totals["production"]
+    total_energy = totals["total"]
+    estimated_cost_eur = round(totals["consumption_cost_eur"], 2)
+    estimated_savings_eur = round(totals["production_savings_eur"], 2)
+
+    self_consumed = totals["autoconsommation"]
+
+    # Taux d'autoconsommation : part de la production consommée sur place ;
+    # taux d'autoproduction : part de la consommation couverte par la production
+    ratio_autoconso = (self_consumed / total_prod * 100) if total_prod else 0
+    ratio_autoprod = (self_consumed / total_conso * 100) if total_conso else 0
+    ratio_surplus = (totals["injection"] / total_prod * 100) if total_prod else 0
 
     return {
         "total_conso_kWh": round(
@@ -48,17 +112,59 @@ def compute_summary(df: pd.DataFrame) -> dict:
         "total_energy_kWh": round(
             number = total_energy / 1000, 
             ndigits = 2),
+        "autoconsommation_kWh": round(
+            number = self_consumed / 1000,
+            ndigits = 2),
+        "injection_kWh": round(
+            number = totals["injection"] / 1000,
+            ndigits = 2),
+        "soutirage_kWh": round(
+            number = totals["soutirage"] / 1000,
+            ndigits = 2),
         "estimated_cost_eur": estimated_cost_eur,
         "estimated_savings_eur": estimated_savings_eur,
         "autoconsommation_%": round(
             number = ratio_autoconso, 
             ndigits = 2),
+        "autoproduction_%": round(
+            number = ratio_autoprod,
+            ndigits = 2),
         "surplus_%": round(
             number = ratio_surplus, 
             ndigits = 2)
     }
 
-def get_summary_info(df: pd.DataFrame, mode: str) -> str:
+def period_totals(range_index=None, rollups: dict | None = None, start=None, end=None) -> dict | None:
+    """
+    Totaux des mesures sur [start, end] sans parcourir les données filtrées.
+
+    Paramètres :
+        range_index (RangeSumIndex | None) : index de sommes cumulées du jeu complet
+        rollups (dict | None) : cube d'agrégats du jeu complet
+        start, end : bornes de la sélection
+
+    Retour :
+        dict | None : totaux ('consommation', ..., 'first', 'last'),
+                      ou None si aucune source pré-calculée n'est utilisable
+    """
+    if start is None or end is None:
+        return None
+    if range_index is not None:
+        totals = range_index.totals(start, end)
+        return totals if totals["rows"] else None
+    if rollups is not None:
+        totals = rollup_totals(
+            cube = rollups,
+            start = start,
+            end = end)
+        if totals is not None:
+            totals["first"] = totals["first_day"]
+            totals["last"] = totals["last_day"]
+        return totals
+    return None
+
+
+def get_summary_info(df: pd.DataFrame, mode: str, totals: dict | None = None) -> str:
     """
     Renvoie une chaine Markdown contenant les informations générales
     (production, consommation, totaux) pour la période sélectionnée.
@@ -66,6 +172,7 @@ def get_summary_info(df: pd.DataFrame, mode: str) -> str:
     Paramètres :
         df (pd.DataFrame) : données filtrées
         mode (str) : mode d'affichage (utilisé pour adapter le texte si besoin)
+        totals (dict | None) : totaux pré-calculés de la période (voir period_totals)
 
     Retour :
         str : contenu Markdown prêt à être affiché dans Streamlit (st.markdown)
@@ -74,7 +181,8 @@ def get_summary_info(df: pd.DataFrame, mode: str) -> str:
     try:
         info = dt.print_general_info(
             display_mode = mode,
-            df = df)
+            df = df,
+            totals = totals)
     except Exception:
         # fallback minimal si la fonction n'existe pas ou échoue
         info = (
@@ -105,7 +213,12 @@ def compute_daily_average(df: pd.DataFrame) -> pd.DataFrame:
 # 📊 Statistiques tabulaires pour affichage Streamlit
 # ---------------------------------------------------------------
 
-def compute_basic_stats(df: pd.DataFrame) -> pd.DataFrame:
+def compute_basic_stats(df: pd.DataFrame,
+                        rollups: dict | None = None,
+                        start=None,
+                        end=None,
+                        range_index=None,
+                        tariff: dict | None = None) -> pd.DataFrame:
     """
     Génère un tableau synthétique des statistiques principales
     à afficher dans Streamlit.
@@ -113,6 +226,10 @@ def compute_basic_stats(df: pd.DataFrame) -> pd.DataFrame:
     Paramètres :
         df (pd.DataFrame) : données fusionnées avec colonnes
             'datetime', 'conso', 'prod', 'total'.
+        rollups (dict | None) : cube d'agrégats du jeu complet (optionnel)
+        start, end : bornes de la sélection, nécessaires pour les totaux pré-calculés
+        range_index (RangeSumIndex | None) : index de sommes cumulées du jeu complet (optionnel)
+        tariff (dict | None) : contrat tarifaire compilé (optionnel) : abonnement et coût par période
 
     Retour :
         pd.DataFrame : tableau formaté contenant les indicateurs
@@ -124,7 +241,19 @@ def compute_basic_stats(df: pd.DataFrame) -> pd.DataFrame:
             "Valeur": "-"
         }])
 
-    summary = compute_summary(df)
+    totals = period_totals(
+        range_index = range_index,
+        rollups = rollups,
+        start = start,
+        end = end)
+
+    if totals is not None:
+        summary = summary_from_totals(totals)
+        nb_days = (totals["last"] - totals["first"]).days + 1
+    else:
+        summary = compute_summary(df)
+        nb_days = (df["datetime"].max() - 
+                   df["datetime"].min()).days + 1
 
     # Construction d'un tableau propre pour affichage
     data = [
@@ -133,11 +262,19 @@ def compute_basic_stats(df: pd.DataFrame) -> pd.DataFrame:
         ("Économies estimées (€)", summary["estimated_savings_eur"]),
         ("Production totale (kWh)", summary["total_prod_kWh"]),
         ("Énergie totale (kWh)", summary["total_energy_kWh"]),
+        ("Énergie autoconsommée (kWh)", summary["autoconsommation_kWh"]),
+        ("Énergie injectée (kWh)", summary["injection_kWh"]),
+        ("Énergie soutirée au réseau (kWh)", summary["soutirage_kWh"]),
         ("Autoconsommation (%)", summary["autoconsommation_%"]),
+        ("Autoproduction (%)", summary["autoproduction_%"]),
         ("Surplus de production (%)", summary["surplus_%"]),
-        ("Durée analysée (jours)", (df["datetime"].max() - 
-                                    df["datetime"].min()).days + 1),
+        ("Durée analysée (jours)", nb_days),
     ]
+    if tariff is not None:
+        tariff_info = tariff_summary(df, tariff, nb_days)
+        data.insert(2, ("Abonnement (€)", tariff_info["subscription_eur"]))
+        for offset, (period, cost) in enumerate(tariff_info["cost_by_period_eur"].items(), start = 3):
+            data.insert(offset, (f"Coût {period} (€)", cost))
 
     stats_df = pd.DataFrame(
         data = data, 
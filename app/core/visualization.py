@@ -9,6 +9,14 @@ Contenu :
 - make_timeseries_trace : utilitaire pour construire une trace temporelle
 - build_multi_period_figure : helper pour vues agrégées (hebdo / mensuel)
 
+Les courbes de la figure principale sont réduites à un nombre de points borné
+(app.core.downsampling) ; le taux de réduction est enregistré dans
+fig.layout.meta["downsampling"].
+
+En mode résolution dynamique (x_range + window_loader), seule la fenêtre
+zoomée est rechargée, à la résolution la plus fine qui tient dans le budget
+de points (30 min, sinon 1h) ; elle est décrite dans fig.layout.meta["window"].
+
 Les DataFrame en entrée sont supposées contenir au minimum :
 - une colonne 'datetime' de type datetime
 - une colonne 'production' (W ou Wh suivant convention)
@@ -18,11 +26,13 @@ Les DataFrame en entrée sont supposées contenir au minimum :
 Toutes les fonctions renvoient un objet plotly.graph_objects.Figure.
 """
 
-from typing import Iterable, Optional
+from typing import Callable, Iterable, Optional
 import pandas as pd
 import plotly.graph_objects as go
-from .config import PLOT_THEME
+from .config import PLOT_THEME, PLOT_MAX_POINTS, PLOT_DOWNSAMPLING
+from app.core.downsampling import downsample_frame
 from app.core.preprocessing import normalize_datetime_column
+from app.core.rollups import rollup_view
 from common.plot_utils import create_time_series_plot, create_time_series_bar_plot
 
 
@@ -88,13 +98,47 @@ def make_timeseries_trace(
     return trace
 
 
+# --------------------------------------------------
+# Résolution dynamique (zoom)
+# --------------------------------------------------
+
+# Résolutions disponibles dans les séries stockées, de la plus fine à la plus grossière
+WINDOW_RESOLUTIONS = [
+    ("30min", pd.Timedelta(30, unit = "min")),
+    ("1h", pd.Timedelta(1, unit = "h")),
+]
+
+
+def select_resolution(start, end, max_points: int = PLOT_MAX_POINTS) -> str:
+    """
+    Choisit la résolution la plus fine dont le nombre de points sur [start, end]
+    tient dans le budget (la plus grossière sinon, la réduction prenant le relais).
+
+    Paramètres :
+        start, end : bornes de la fenêtre visible
+        max_points (int) : budget de points par courbe
+
+    Retour :
+        str : '30min' ou '1h'
+    """
+    span = pd.Timestamp(end) - pd.Timestamp(start)
+    for name, step in WINDOW_RESOLUTIONS:
+        if span / step <= max_points:
+            return name
+    return WINDOW_RESOLUTIONS[-1][0]
+
+
 # --------------------------------------------------
 # Figure principale : production vs consommation
 # --------------------------------------------------
 def plot_production_vs_consumption(
         df: pd.DataFrame,
         mode: str = "Classique",
-        chart_type: str = "Courbe"
+        chart_type: str = "Courbe",
+        max_points: Optional[int] = PLOT_MAX_POINTS,
+        downsampling: str = PLOT_DOWNSAMPLING,
+        x_range: Optional[tuple] = None,
+        window_loader: Optional[Callable[..., pd.DataFrame]] = None
     ) -> go.Figure:
     """
     Construit la figure principale affichant la consommation, la production
@@ -113,12 +157,36 @@ def plot_production_vs_consumption(
         Influence le titre et l'agrégation éventuelle.
     chart_type : str
         Type d'affichage (courbe ou histogramme)
+    max_points : int | None
+        Nombre maximal de points par courbe (None : pas de réduction)
+    downsampling : str
+        Méthode de réduction : "lttb" ou "minmax" (extrêmes par intervalle)
+    x_range : tuple | None
+        Fenêtre visible (début, fin) capturée depuis le graphique (zoom)
+    window_loader : callable | None
+        Fonction (start, end, resolution) → DataFrame rechargeant la fenêtre
+        depuis les séries stockées (ex. data_manager.load_window) ; avec x_range,
+        remplace df par la fenêtre à la résolution adaptée
 
     Retour
     ------
     go.Figure
         Figure Plotly interactive.
     """
+    window = None
+    if x_range is not None and window_loader is not None:
+        start, end = (pd.Timestamp(x) for x in x_range)
+        resolution = select_resolution(
+            start = start,
+            end = end,
+            max_points = max_points or PLOT_MAX_POINTS)
+        df = window_loader(start, end, resolution)
+        window = {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "resolution": resolution,
+        }
+
     if df.empty:
         return go.Figure()
     df_local = normalize_datetime_column(
@@ -126,6 +194,16 @@ def plot_production_vs_consumption(
         col = "datetime")
 
     title = f"Consommation vs Production — {mode}"
+    if window is not None:
+        title += f" (zoom, pas de {window['resolution']})"
+
+    downsampling_stats = None
+    if chart_type != "Histogramme" and max_points:
+        df_local, downsampling_stats = downsample_frame(
+            df = df_local,
+            columns = ["consommation", "production", "total"],
+            max_points = max_points,
+            method = downsampling)
 
     if chart_type == "Histogramme":
         fig = create_time_series_bar_plot(
@@ -145,6 +223,14 @@ def plot_production_vs_consumption(
     fig.update_layout(
         template = PLOT_THEME if hasattr(PLOT_THEME, "__str__") else "plotly_white",
     )
+    meta = {}
+    if downsampling_stats is not None:
+        meta["downsampling"] = downsampling_stats
+    if window is not None:
+        meta["window"] = window
+    if meta:
+        fig.update_layout(
+            meta = meta)
 
     # On n'ajoute le rangeselector et le slider que pour les séries temporelles
     if chart_type != "Histogramme":
@@ -186,20 +272,38 @@ def plot_production_vs_consumption(
 def build_multi_period_figure(
         df: pd.DataFrame,
         freq: str = "W",
-        chart_type: str = "Courbe"
+        chart_type: str = "Courbe",
+        rollups: Optional[dict] = None,
+        start=None,
+        end=None
     ) -> go.Figure:
+    """
+    Construit la vue agrégée par semaine ("W") ou par mois ("M").
+
+    Si le cube d'agrégats est fourni, les périodes qui recoupent [start, end]
+    y sont lues directement (une ligne par période, datée du premier jour) ;
+    sinon les données 30 min sont ré-échantillonnées.
+    """
     if df.empty:
         return go.Figure()
 
-    df_local = normalize_datetime_column(
-        df = df, 
-        col = "datetime")
-    
-    df_local = df_local.set_index("datetime")
-    agg = df_local[["production", "consommation"]].resample(
-        rule = freq).sum(min_count = 1).fillna(0)
-    agg["total"] = agg["production"] + agg["consommation"]
-    agg = agg.reset_index()
+    if rollups is not None:
+        grain = "week" if freq == "W" else "month"
+        agg = rollup_view(
+            cube = rollups,
+            grain = grain,
+            start = start,
+            end = end)[["datetime", "production", "consommation", "total"]]
+    else:
+        df_local = normalize_datetime_column(
+            df = df, 
+            col = "datetime")
+
+        df_local = df_local.set_index("datetime")
+        agg = df_local[["production", "consommation"]].resample(
+            rule = freq).sum(min_count = 1).fillna(0)
+        agg["total"] = agg["production"] + agg["consommation"]
+        agg = agg.reset_index()
 
     freq_label = "Hebdomadaire" if freq == "W" else "Mensuelle"
     title = f"Agrégation périodique ({freq_label})"
@@ -13,9 +13,52 @@ import pandas as pd
 
 from app.ui.widgets import select_mode, select_period, select_chart_type
 from app.core.visualization import plot_production_vs_consumption, build_multi_period_figure
-from app.core.statistics import compute_basic_stats, get_summary_info
-from app.core.periods import extract_periods
-from app.core.localization import format_date_fr
+from app.core.statistics import compute_basic_stats, get_summary_info, period_totals
+from app.core.periods import extract_periods, period_bounds, period_label
+from app.core.data_manager import load_range_index, load_rollup_cube, load_tariff, load_window
+
+
+# Erreurs attendues des accélérateurs (cube, index, contrat) : fichier illisible ou
+# corrompu (OSError, ValueError dont pyarrow.ArrowInvalid et json.JSONDecodeError),
+# colonne absente (KeyError). Les autres erreurs ne sont pas masquées.
+_FALLBACK_ERRORS = (OSError, ValueError, KeyError)
+
+
+def _safe_rollup_cube():
+    """Cube d'agrégats du jeu fusionné, ou None s'il est indisponible (calcul à la volée)."""
+    try:
+        return load_rollup_cube()
+    except _FALLBACK_ERRORS as e:
+        st.warning(body = f"⚠️ Cube d'agrégats indisponible, calcul à la volée : {e}")
+        return None
+
+
+def _safe_tariff():
+    """Contrat tarifaire du jeu fusionné, ou None s'il est absent ou invalide."""
+    try:
+        return load_tariff()
+    except _FALLBACK_ERRORS as e:
+        st.warning(body = f"⚠️ Contrat tarifaire ignoré : {e}")
+        return None
+
+
+def _safe_range_index(df: pd.DataFrame):
+    """Index de sommes cumulées correspondant à df, ou None s'il est indisponible."""
+    try:
+        range_index = load_range_index()
+    except _FALLBACK_ERRORS as e:
+        st.warning(body = f"⚠️ Index de sommes cumulées indisponible, filtrage ligne à ligne : {e}")
+        return None
+    return range_index if len(range_index) == len(df) else None
+
+
+def _current_zoom(zoom_key: str, base_range: tuple):
+    """Fenêtre zoomée mémorisée pour la période principale courante (None sinon)."""
+    zoom = st.session_state.get(zoom_key)
+    if zoom is None or zoom["base"] != base_range:
+        st.session_state.pop(zoom_key, None)
+        return None
+    return zoom["range"]
 
 
 def render_app(df: pd.DataFrame) -> None:
@@ -54,9 +97,20 @@ def render_app(df: pd.DataFrame) -> None:
         df = df)
 
     # --- Filtrage de la période principale dans le DataFrame ---
-    mask = ((df["datetime"] >= start_datetime) & 
-            (df["datetime"] <= end_datetime))
-    df_filtered = df.loc[mask].copy()
+    # (deux recherches dichotomiques dans l'index plutôt qu'un masque sur toute la colonne)
+    range_index = _safe_range_index(df)
+    if range_index is not None:
+        df_filtered = range_index.slice(
+            start = start_datetime,
+            end = end_datetime).copy()
+    else:
+        mask = ((df["datetime"] >= start_datetime) & 
+                (df["datetime"] <= end_datetime))
+        df_filtered = df.loc[mask].copy()
+    totals = period_totals(
+        range_index = range_index,
+        start = start_datetime,
+        end = end_datetime)
 
     # --- Options avancées (affichées seulement pour Hebdomadaire / Mensuel) ---
     show_detail = False
@@ -113,7 +167,7 @@ def render_app(df: pd.DataFrame) -> None:
                 selected_periods = st.sidebar.multiselect(
                     label = "Choisissez une ou plusieurs périodes",
                     options = list(period_list),
-                    format_func = lambda x: period_labels[list(period_list).index(x)], 
+                    format_func = dict(zip(period_list, period_labels)).get, 
                     placeholder = "Sélectionner une ou plusieurs périodes", 
                     help = "Sélectionner une ou plusieurs périodes pour afficher les détails horaires correspondants")
 
@@ -124,31 +178,72 @@ def render_app(df: pd.DataFrame) -> None:
 
     # --- Informations et aide ---
     st.markdown(
-        body = get_summary_info(df_filtered, mode))
+        body = get_summary_info(df_filtered, mode, totals = totals))
     st.markdown(
         body = "⚙️ Cliquez sur la légende pour activer/désactiver les courbes.")
 
     # --- Figure principale selon le mode ---
+    # En mode Classique, une sélection horizontale (box select) sur la courbe sert de zoom :
+    # la fenêtre sélectionnée est rechargée depuis les séries stockées à la résolution adaptée.
+    zoom_key = "zoom_classique"
+    base_range = (start_datetime, end_datetime)
+    zoom_range = None
     if mode == "Classique" or mode == "Journée spécifique":
+        dynamic = mode == "Classique" and chart_type != "Histogramme"
+        zoom_range = _current_zoom(zoom_key, base_range) if dynamic else None
         fig = plot_production_vs_consumption(
             df = df_filtered, 
             mode = mode, 
-            chart_type = chart_type)
+            chart_type = chart_type,
+            x_range = zoom_range,
+            window_loader = load_window if dynamic else None)
+        if dynamic:
+            fig.update_layout(
+                dragmode = "select",
+                selectdirection = "h")
     elif mode == "Hebdomadaire" or mode == "Mensuel":
+        dynamic = False
         fig = build_multi_period_figure(
             df = df_filtered, 
             freq = freq, 
-            chart_type = chart_type)
+            chart_type = chart_type,
+            rollups = _safe_rollup_cube(),
+            start = start_datetime,
+            end = end_datetime)
     else:
         st.error(body = "Mode inconnu.")
         return
 
     # ID unique basé sur le mode + borne de dates (utile pour éviter le rerun inutile)
     chart_key = f"plot_{mode}_{start_datetime.strftime('%Y%m%d%H%M')}_{end_datetime.strftime(format = '%Y%m%d%H%M')}"
-    st.plotly_chart(
-        figure_or_data = fig, 
-        width = 'content', 
-        key = chart_key)
+    if dynamic:
+        if zoom_range is not None:
+            chart_key += f"_zoom_{pd.Timestamp(zoom_range[0]):%Y%m%d%H%M}_{pd.Timestamp(zoom_range[1]):%Y%m%d%H%M}"
+        event = st.plotly_chart(
+            figure_or_data = fig, 
+            width = 'content', 
+            key = chart_key,
+            on_select = "rerun",
+            selection_mode = "box")
+        boxes = event.selection.get("box", []) if event else []
+        if boxes and boxes[0].get("x"):
+            x0, x1 = sorted(pd.Timestamp(x) for x in boxes[0]["x"])
+            st.session_state[zoom_key] = {"base": base_range, "range": (x0, x1)}
+            st.rerun()
+        if zoom_range is not None:
+            if st.button(
+                label = "🔍 Réinitialiser le zoom",
+                help = "Revenir à la période complète sélectionnée"):
+                st.session_state.pop(zoom_key, None)
+                st.rerun()
+        else:
+            st.caption(
+                body = "🔍 Sélectionnez une plage horizontale sur la courbe pour zoomer avec le détail 30 min.")
+    else:
+        st.plotly_chart(
+            figure_or_data = fig, 
+            width = 'content', 
+            key = chart_key)
 
     # --- Affichage des détails horaires si demandé ---
     if show_detail:
@@ -165,31 +260,30 @@ def render_app(df: pd.DataFrame) -> None:
             st.info(
                 body = "Aucune période sélectionnée ou disponible pour afficher les détails.")
         else:
+            # Bornes de lignes de chaque période (données triées : découpage sans filtrage)
+            if not df_filtered["datetime"].is_monotonic_increasing:
+                df_filtered = df_filtered.sort_values(
+                    by = "datetime")
+            starts, lows, highs = period_bounds(
+                df = df_filtered,
+                freq = freq)
+            bounds = {start: (lo, hi) for start, lo, hi in zip(starts, lows, highs)}
+
             # Pour chaque période cible, on affiche un sous-graphique horaire
             for p in targets:
                 st.markdown(
                     body = "---")
-                if freq == "W":
-                    start_label = format_date_fr(
-                        d = p, 
-                        pattern = "d MMMM")
-                    end_label = format_date_fr(
-                        d = p + pd.offsets.Day(6), 
-                        pattern = "d MMMM y")
-                    title = f"Semaine du {start_label} au {end_label}"
-                else:
-                    title = f"Mois de {format_date_fr(
-                        d = p, 
-                        pattern = 'LLLL y')}"
+                title = period_label(
+                    start = pd.Timestamp(p),
+                    freq = freq)
 
                 # Affichage du titre de la période
                 st.markdown(
                     body = f"### {title}")
 
-                # Filtrage des données pour la période courante
-                df_period = df_filtered.copy()
-                df_period["period"] = df_period["datetime"].dt.to_period(freq).apply(lambda r: r.start_time)
-                df_period = df_period[df_period["period"] == p]
+                # Lignes de la période courante
+                lo, hi = bounds.get(pd.Timestamp(p), (0, 0))
+                df_period = df_filtered.iloc[lo:hi]
 
                 # Si pas de données pour la période, afficher un message et passer à la suivante
                 if df_period.empty:
@@ -215,7 +309,12 @@ def render_app(df: pd.DataFrame) -> None:
         st.markdown(
             body = "### 📈 Statistiques sur la période sélectionnée")
         stats = compute_basic_stats(
-            df = df_filtered)
+            df = df_filtered,
+            rollups = _safe_rollup_cube(),
+            start = start_datetime,
+            end = end_datetime,
+            range_index = range_index,
+            tariff = _safe_tariff())
         st.dataframe(
             data = stats, 
             width = 'content')
@@ -7,6 +7,8 @@ et affichage des messages contextuels.
 import streamlit as st
 import pandas as pd
 
+from app.core.data_manager import load_period_options
+
 
 # ----------------------------------------------------------------------
 # 🎛️ Choix du mode d'affichage
@@ -51,16 +53,18 @@ def select_period(display_mode: str, df: pd.DataFrame):
                             - "Hebdomadaire"
                             - "Mensuel"
                             - "Journée spécifique"
-        df (pd.DataFrame): données fusionnées avec une colonne 'datetime'
-                           pour extraire les bornes de dates disponibles
+        df (pd.DataFrame): données fusionnées avec une colonne 'datetime' ;
+                           les bornes de dates et les semaines / mois disponibles
+                           sont lus dans le cache du jeu fusionné (load_period_options)
 
     Retour :
         tuple(datetime, datetime, list, str) :
             bornes de la période sélectionnée, liste des périodes sélectionnées (pour Hebdo/Mensuel), type de période (W/M)
     """
 
-    min_date = df['datetime'].min().date()
-    max_date = df['datetime'].max().date()
+    period_options = load_period_options(df)
+    min_date = period_options["min"].date()
+    max_date = period_options["max"].date()
 
     # Valeurs par défaut
     selected_periods = None
@@ -93,8 +97,7 @@ def select_period(display_mode: str, df: pd.DataFrame):
         return datetime_debut, datetime_fin, selected_periods
 
     elif display_mode == "Hebdomadaire":
-        semaines = df['datetime'].dt.to_period(
-            freq = "W").drop_duplicates().sort_values()
+        semaines = period_options["W"]
         options = ["Toutes"] + [str(s) for s in semaines]
 
         choix = st.selectbox(label = "Choisissez une semaine :", 
@@ -102,8 +105,8 @@ def select_period(display_mode: str, df: pd.DataFrame):
                              index = 0)
 
         if choix == "Toutes":
-            datetime_debut = df['datetime'].min()
-            datetime_fin = df['datetime'].max()
+            datetime_debut = period_options["min"]
+            datetime_fin = period_options["max"]
             selected_periods = semaines      # ← important !
         else:
             semaine = pd.Period(
@@ -116,8 +119,7 @@ def select_period(display_mode: str, df: pd.DataFrame):
         return datetime_debut, datetime_fin, selected_periods
 
     elif display_mode == "Mensuel":
-        mois = df['datetime'].dt.to_period(
-            freq = "M").drop_duplicates().sort_values()
+        mois = period_options["M"]
         options = ["Tous"] + [str(m) for m in mois]
 
         choix = st.selectbox(
@@ -126,8 +128,8 @@ def select_period(display_mode: str, df: pd.DataFrame):
             index = 0)
 
         if choix == "Tous":
-            datetime_debut = df['datetime'].min()
-            datetime_fin = df['datetime'].max()
+            datetime_debut = period_options["min"]
+            datetime_fin = period_options["max"]
             selected_periods = [m.start_time for m in mois]
         else:
             per = pd.Period(
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+bench_plot_utils.py
+
+Compare les deux chemins de rendu de common.plot_utils sur des séries synthétiques
+au pas de 30 minutes :
+- courbes SVG (go.Scatter) vs WebGL (go.Scattergl)
+- barres complètes vs barres agrégées
+
+Pour chaque taille, mesure le temps de construction de la figure et la taille
+du JSON envoyé au navigateur (fig.to_json()).
+
+🧩 Exemples d'utilisation :
+    python benchmarks/bench_plot_utils.py
+    python benchmarks/bench_plot_utils.py --sizes 10000 50000 100000 --repeat 5
+"""
+
+import sys
+from pathlib import Path
+
+# Ajout du dossier racine au sys.path pour permettre les imports de 'common'
+root_path = Path(__file__).resolve().parents[1]
+if str(root_path) not in sys.path:
+    sys.path.insert(0, str(root_path))
+
+import argparse
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from common.plot_utils import create_time_series_plot, create_time_series_bar_plot
+
+
+def make_series(n_points: int) -> pd.DataFrame:
+    """
+    Génère une série synthétique consommation / production au pas de 30 minutes.
+
+    Paramètres :
+        n_points (int) : nombre de lignes
+
+    Retour :
+        pd.DataFrame : colonnes datetime, consommation, production, total
+    """
+    datetimes = pd.date_range("2025-03-25", periods = n_points, freq = "30min")
+    hours = datetimes.hour.to_numpy() + datetimes.minute.to_numpy() / 60
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "datetime": datetimes,
+        "consommation": 300 + 50 * np.cos(hours / 24 * 2 * np.pi) + rng.normal(0, 20, n_points),
+        "production": np.clip(np.sin((hours - 6) / 12 * np.pi), 0, None) * 1000,
+    })
+    df["total"] = df["consommation"] + df["production"]
+    return df
+
+
+def measure(build, repeat: int) -> tuple[float, int]:
+    """
+    Mesure le meilleur temps de construction (ms) et la taille JSON (octets) d'une figure.
+
+    Paramètres :
+        build (callable) : fonction sans argument renvoyant une go.Figure
+        repeat (int) : nombre de répétitions
+
+    Retour :
+        tuple(float, int) : temps minimal en ms, taille du JSON en octets
+    """
+    build()  # échauffement (imports et validateurs Plotly)
+    timings = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        fig = build()
+        timings.append((perf_counter() - t0) * 1000)
+    return min(timings), len(fig.to_json().encode("utf-8"))
+
+
+def run(sizes: list[int], repeat: int) -> pd.DataFrame:
+    """
+    Lance le benchmark pour chaque taille et chaque chemin de rendu.
+
+    Retour :
+        pd.DataFrame : une ligne par (taille, chemin) avec build_ms et json_kb
+    """
+    rows = []
+    for n in sizes:
+        df = make_series(n)
+        paths = {
+            "scatter (SVG)": lambda: create_time_series_plot(df, webgl_threshold = n),
+            "scattergl (WebGL)": lambda: create_time_series_plot(df, webgl_threshold = 0),
+            "bar (complet)": lambda: create_time_series_bar_plot(df, max_bars = n),
+            "bar (agrégé)": lambda: create_time_series_bar_plot(df),
+        }
+        for name, build in paths.items():
+            build_ms, json_bytes = measure(build, repeat)
+            rows.append({
+                "points": n,
+                "chemin": name,
+                "build_ms": round(build_ms, 1),
+                "json_kb": round(json_bytes / 1024, 1),
+            })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark des chemins de rendu de common.plot_utils.")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = [5_000, 20_000, 50_000, 100_000],
+                        help = "Nombres de points testés")
+    parser.add_argument("--repeat", type = int, default = 3, help = "Répétitions par mesure")
+    args = parser.parse_args()
+
+    print(run(args.sizes, args.repeat).to_string(index = False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+bench_tariffs.py
+
+Mesure le temps de tarification de common.tariffs (tariff_prices) sur des séries
+synthétiques au pas de 30 minutes, avec un contrat Tempo (plages HC, couleurs
+des jours et journée tarifaire commençant à 06:00).
+
+🧩 Exemples d'utilisation :
+    python benchmarks/bench_tariffs.py
+    python benchmarks/bench_tariffs.py --years 1 3 6 --repeat 5
+"""
+
+import sys
+from pathlib import Path
+
+# Ajout du dossier racine au sys.path pour permettre les imports de 'common'
+root_path = Path(__file__).resolve().parents[1]
+if str(root_path) not in sys.path:
+    sys.path.insert(0, str(root_path))
+
+import argparse
+from time import perf_counter
+
+import pandas as pd
+
+from common.tariffs import normalize_contract, tariff_prices
+
+
+def make_tempo_contract(start: str, years: int) -> dict:
+    """
+    Construit un contrat Tempo normalisé avec 22 jours rouges par an.
+
+    Paramètres :
+        start (str) : date de début 'YYYY-MM-DD'
+        years (int) : nombre d'années couvertes
+
+    Retour :
+        dict : contrat normalisé (voir common.tariffs.normalize_contract)
+    """
+    red_days = pd.date_range(start, periods = 22 * years, freq = "W")
+    return normalize_contract({
+        "name": "Tempo",
+        "periods": [{"name": "HC", "hours": [["22:00", "06:00"]]}],
+        "default_period": "HP",
+        "day_start": "06:00",
+        "default_color": "bleu",
+        "colors": {str(d.date()): "rouge" for d in red_days},
+        "prices": {
+            "bleu": {"HP": 0.16, "HC": 0.13},
+            "rouge": {"HP": 0.75, "HC": 0.15},
+        },
+    })
+
+
+def run(years_list: list[int], repeat: int) -> pd.DataFrame:
+    """
+    Lance le benchmark pour chaque durée de série.
+
+    Retour :
+        pd.DataFrame : une ligne par durée avec le nombre de créneaux et le meilleur temps (ms)
+    """
+    rows = []
+    for years in years_list:
+        datetimes = pd.date_range("2020-01-01", periods = years * 365 * 48, freq = "30min")
+        tariff = make_tempo_contract("2020-01-06", years)
+        tariff_prices(datetimes[:48], tariff)  # échauffement
+        timings = []
+        for _ in range(repeat):
+            t0 = perf_counter()
+            tariff_prices(datetimes, tariff)
+            timings.append((perf_counter() - t0) * 1000)
+        rows.append({"années": years, "créneaux": len(datetimes), "tarification_ms": round(min(timings), 1)})
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark de la tarification de common.tariffs.")
+    parser.add_argument("--years", type = int, nargs = "+", default = [1, 3, 6],
+                        help = "Durées de série testées (années)")
+    parser.add_argument("--repeat", type = int, default = 3, help = "Répétitions par mesure")
+    args = parser.parse_args()
+
+    print(run(args.years, args.repeat).to_string(index = False))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,4 +15,7 @@ ROOT_PATH = Path(__file__).resolve().parents[1]
 START_DATE = datetime(
     year = 2025, 
     month = 3, 
-    day = 25)
\ No newline at end of file
+    day = 25)
+# Nombre de points par courbe au-delà duquel les graphiques passent en rendu
+# WebGL (go.Scattergl) et les histogrammes en barres agrégées
+WEBGL_THRESHOLD = 20_000
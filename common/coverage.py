@@ -0,0 +1,432 @@
+# coverage.py
+# -*- coding: utf-8 -*-
+"""
+Index de couverture des séries resamplées (production et consommation).
+
+Pour chaque série et chaque jour, un entier sert de bitmap des 48 créneaux
+d'une demi-heure présents dans la série (bit i = horodatage i × 30 min).
+Une série horaire n'allume que les créneaux pairs (HH:00).
+
+Les séries de consommation Enedis sont horodatées à la fin de l'intervalle
+(label 'end') : la journée D couvre alors les horodatages D 00:30 … D+1 00:00,
+et les requêtes de complétude décalent les bitmaps d'un intervalle (coverage_masks).
+
+L'index est stocké dans un fichier JSON par dossier de données
+(ex. data/prod/coverage_index.json), mis à jour à chaque écriture de série
+par common.storage, et interrogé en O(1) par jour au lieu de relire les CSV.
+Chaque série y garde l'empreinte de contenu de son CSV : l'index est versionné
+avec les CSV et n'est reconstruit que s'il ne leur correspond plus.
+
+🧩 Exemples d'utilisation :
+    python -m common.coverage --rebuild
+    python -m common.coverage --check 2025-03-25 2025-12-31
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+COVERAGE_FILE_NAME = "coverage_index.json"
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# Masque des créneaux HH:00 d'une journée
+HOURLY_SLOTS_MASK = sum(1 << (2 * h) for h in range(24))
+
+# Cache mémoire des index chargés : {chemin: (mtime_ns, contenu)}
+_INDEX_CACHE: dict = {}
+
+
+# ------------------------------------------------------
+# 🧮 Calcul des bitmaps
+# ------------------------------------------------------
+
+def compute_day_bitmaps(index: pd.DatetimeIndex) -> dict[str, int]:
+    """
+    Calcule le bitmap des créneaux présents pour chaque jour d'un index.
+
+    Paramètre :
+        index (pd.DatetimeIndex) : horodatages de la série
+
+    Retour :
+        dict[str, int] : {'YYYY-MM-DD': bitmap des créneaux de 30 min présents}
+    """
+    index = pd.DatetimeIndex(index).dropna()
+    if len(index) == 0:
+        return {}
+
+    days = index.normalize().to_numpy()
+    slots = ((index.hour * 60 + index.minute) // SLOT_MINUTES).to_numpy()
+    bits = np.left_shift(np.int64(1), slots.astype(np.int64))
+
+    order = np.argsort(days, kind = "stable")
+    days, bits = days[order], bits[order]
+    unique_days, starts = np.unique(days, return_index = True)
+    masks = np.bitwise_or.reduceat(bits, starts)
+
+    labels = pd.DatetimeIndex(unique_days).strftime("%Y-%m-%d")
+    return dict(zip(labels, (int(m) for m in masks)))
+
+
+# ------------------------------------------------------
+# 💾 Persistance de l'index
+# ------------------------------------------------------
+
+def coverage_path(csv_path: Path) -> Path:
+    """Chemin du fichier d'index de couverture associé à une série."""
+    return Path(csv_path).parent / COVERAGE_FILE_NAME
+
+
+def _series_key(csv_path: Path) -> str:
+    return Path(csv_path).stem
+
+
+def csv_fingerprint(csv_path: Path, known: dict | None = None) -> dict | None:
+    """
+    Empreinte de contenu du CSV d'une série (taille et SHA-256).
+
+    Le mtime n'est qu'un raccourci local : si taille et mtime sont ceux de `known`,
+    son hachage est réutilisé ; sinon (copie, git checkout…) le fichier est relu.
+
+    Paramètres :
+        csv_path (Path) : chemin du CSV de la série
+        known (dict | None) : empreinte enregistrée lors de la dernière écriture
+
+    Retour :
+        dict | None : {'size', 'mtime_ns', 'sha256'}, ou None si le CSV n'existe pas
+    """
+    try:
+        stat = Path(csv_path).stat()
+    except FileNotFoundError:
+        return None
+    if isinstance(known, dict) and known.get("size") == stat.st_size and known.get("mtime_ns") == stat.st_mtime_ns:
+        return dict(known)
+
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+
+def same_content(fingerprint: dict | None, known: dict | None) -> bool:
+    """Indique si deux empreintes de CSV (voir csv_fingerprint) décrivent le même contenu."""
+    if not isinstance(fingerprint, dict) or not isinstance(known, dict):
+        return False
+    return fingerprint["size"] == known.get("size") and fingerprint["sha256"] == known.get("sha256")
+
+
+def _load_index(path: Path) -> dict:
+    """Charge l'index de couverture d'un dossier (avec cache mémoire)."""
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {"format_version": 1, "series": {}}
+
+    cached = _INDEX_CACHE.get(str(path))
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(
+        file = path,
+        mode = "r",
+        encoding = "utf-8") as f:
+        index = json.load(f)
+    _INDEX_CACHE[str(path)] = (mtime, index)
+    return index
+
+
+def _save_index(path: Path, index: dict) -> None:
+    """Écrit l'index de couverture de façon atomique."""
+    path.parent.mkdir(
+        parents = True,
+        exist_ok = True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(
+        file = tmp_path,
+        mode = "w",
+        encoding = "utf-8") as f:
+        json.dump(
+            obj = index,
+            fp = f,
+            indent = 1,
+            sort_keys = True)
+    os.replace(tmp_path, path)
+    _INDEX_CACHE[str(path)] = (path.stat().st_mtime_ns, index)
+
+
+def update_coverage(csv_path: Path,
+                    index: pd.DatetimeIndex,
+                    replace: bool = False,
+                    fingerprint: dict | None = None,
+                    previous: dict | None = None) -> None:
+    """
+    Met à jour l'index de couverture d'une série avec de nouveaux horodatages.
+
+    Paramètres :
+        csv_path (Path) : chemin du CSV d'export de la série
+        index (pd.DatetimeIndex) : horodatages ajoutés (ou série complète si replace)
+        replace (bool) : remplace toute la couverture de la série au lieu de la compléter
+        fingerprint (dict | None) : empreinte du CSV après l'écriture (calculée si absente)
+        previous (dict | None) : empreinte du CSV avant l'écriture ; si l'index ne
+                                 la reflétait pas, il est reconstruit depuis le CSV
+    """
+    path = coverage_path(csv_path)
+    coverage = _load_index(path)
+    key = _series_key(csv_path)
+
+    entry = coverage["series"].get(key)
+    if entry is not None and not replace and previous is not None \
+            and not same_content(previous, entry.get("csv_fingerprint")):
+        # Index en retard sur le CSV (non versionné avec lui) : le compléter le laisserait faux
+        rebuild_coverage(csv_path, fingerprint)
+        return
+    if entry is None or replace:
+        entry = {"days": {}}
+
+    days = entry["days"]
+    for day, mask in compute_day_bitmaps(index).items():
+        days[day] = days.get(day, 0) | mask
+
+    entry["csv_fingerprint"] = fingerprint or csv_fingerprint(csv_path)
+    coverage["series"][key] = entry
+    _save_index(path, coverage)
+
+
+def rebuild_coverage(csv_path: Path, fingerprint: dict | None = None) -> dict[str, int]:
+    """
+    Reconstruit la couverture d'une série à partir de son CSV.
+
+    Paramètres :
+        csv_path (Path) : chemin du CSV de la série
+        fingerprint (dict | None) : empreinte du CSV, si elle est déjà connue
+
+    Retour :
+        dict[str, int] : bitmaps par jour
+    """
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        return {}
+    df = pd.read_csv(
+        filepath_or_buffer = csv_path,
+        sep = ";",
+        usecols = ["datetime"])
+    index = pd.DatetimeIndex(pd.to_datetime(
+        arg = df["datetime"],
+        errors = "coerce"))
+    update_coverage(csv_path, index, replace = True, fingerprint = fingerprint)
+    return compute_day_bitmaps(index)
+
+
+def get_series_coverage(csv_path: Path) -> dict[str, int]:
+    """
+    Renvoie les bitmaps par jour d'une série.
+
+    L'index est reconstruit depuis le CSV s'il est absent ou si le contenu
+    du CSV ne correspond plus à son empreinte (CSV modifié ou récupéré sans
+    l'index). Un index versionné avec son CSV est réutilisé après un checkout.
+
+    Paramètre :
+        csv_path (Path) : chemin du CSV de la série
+
+    Retour :
+        dict[str, int] : {'YYYY-MM-DD': bitmap}
+    """
+    coverage = _load_index(coverage_path(csv_path))
+    entry = coverage["series"].get(_series_key(csv_path))
+    if entry is None:
+        return rebuild_coverage(csv_path)
+    known = entry.get("csv_fingerprint")
+    fingerprint = csv_fingerprint(csv_path, known)
+    if fingerprint is None and known is None:
+        return entry["days"]
+    if not same_content(fingerprint, known):
+        return rebuild_coverage(csv_path, fingerprint)
+    if fingerprint != known:
+        # Même contenu, nouveau mtime (copie, checkout) : évite de rehacher le CSV
+        entry["csv_fingerprint"] = fingerprint
+        try:
+            _save_index(coverage_path(csv_path), coverage)
+        except OSError:
+            pass
+    return entry["days"]
+
+
+# ------------------------------------------------------
+# 🔎 Requêtes
+# ------------------------------------------------------
+
+def day_bitmap(csv_path: Path, day: date | datetime) -> int:
+    """Bitmap des créneaux de 30 min présents pour un jour (0 si aucun)."""
+    return get_series_coverage(csv_path).get(day.strftime("%Y-%m-%d"), 0)
+
+
+def is_day_complete(mask: int, interval: str) -> bool:
+    """
+    Vérifie qu'un bitmap journalier est complet pour un intervalle donné.
+
+    Règles (identiques aux vérifications historiques sur les CSV) :
+    - '1h'    : les 24 horodatages HH:00 doivent exister
+    - '30min' : au moins un créneau par heure doit exister
+
+    Paramètres :
+        mask (int) : bitmap du jour
+        interval (str) : '1h' ou '30min'
+
+    Retour :
+        bool : True si la journée est complète
+    """
+    if interval == "1h":
+        return (mask & HOURLY_SLOTS_MASK) == HOURLY_SLOTS_MASK
+    if interval == "30min":
+        hours = (mask | (mask >> 1)) & HOURLY_SLOTS_MASK
+        return hours == HOURLY_SLOTS_MASK
+    raise ValueError(f"Intervalle non supporté : {interval} ('1h' ou '30min')")
+
+
+def has_full_coverage(csv_path: Path, day: date | datetime, interval: str) -> bool:
+    """
+    Indique si une série couvre entièrement une journée.
+
+    Paramètres :
+        csv_path (Path) : chemin du CSV de la série
+        day (date | datetime) : jour à vérifier
+        interval (str) : '1h' ou '30min'
+
+    Retour :
+        bool : True si la journée est complète dans la série
+    """
+    return is_day_complete(day_bitmap(csv_path, day), interval)
+
+
+def day_range(start: date | datetime, end: date | datetime) -> np.ndarray:
+    """Jours de la plage [start, end] (bornes incluses) sous forme de tableau datetime64[D]."""
+    start = start.date() if isinstance(start, datetime) else start
+    end = end.date() if isinstance(end, datetime) else end
+    return np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + np.timedelta64(1, "D"))
+
+
+def coverage_masks(csv_path: Path, days: np.ndarray, label: str = "start", interval: str = "30min") -> np.ndarray:
+    """
+    Bitmaps de couverture d'une série pour un tableau de jours, en une passe.
+
+    Paramètres :
+        csv_path (Path) : chemin du CSV de la série
+        days (np.ndarray) : jours (datetime64[D]) à interroger
+        label (str) : 'start' si les horodatages marquent le début de l'intervalle,
+                      'end' s'ils en marquent la fin : les bitmaps sont alors décalés
+                      d'un intervalle (lu sur le jour et son lendemain), de sorte que
+                      le bit i corresponde à l'intervalle commençant à i × 30 min
+        interval (str) : '30min' ou '1h' (longueur du décalage en mode 'end')
+
+    Retour :
+        np.ndarray : bitmap de chaque jour (int64, 0 pour un jour absent)
+    """
+    coverage = get_series_coverage(csv_path)
+    if label == "start":
+        return _lookup_masks(coverage, days)
+    if label != "end":
+        raise ValueError(f"Label d'horodatage non supporté : {label} ('start' ou 'end')")
+    shift = 2 if interval == "1h" else 1
+    own = _lookup_masks(coverage, days)
+    following = _lookup_masks(coverage, days + np.timedelta64(1, "D"))
+    return (own >> shift) | ((following & ((1 << shift) - 1)) << (SLOTS_PER_DAY - shift))
+
+
+def _lookup_masks(coverage: dict[str, int], days: np.ndarray) -> np.ndarray:
+    """Bitmap brut de chaque jour d'après les bitmaps d'une série (0 pour un jour absent)."""
+    masks = np.zeros(len(days), dtype = np.int64)
+    if not coverage or not len(days):
+        return masks
+
+    known_days = np.array(list(coverage), dtype = "datetime64[D]")
+    known_masks = np.fromiter(coverage.values(), dtype = np.int64, count = len(coverage))
+    order = np.argsort(known_days)
+    known_days, known_masks = known_days[order], known_masks[order]
+
+    pos = np.minimum(np.searchsorted(known_days, days), len(known_days) - 1)
+    found = known_days[pos] == days
+    masks[found] = known_masks[pos[found]]
+    return masks
+
+
+def complete_mask(masks: np.ndarray, interval: str) -> np.ndarray:
+    """Version vectorisée de is_day_complete : un booléen par bitmap journalier."""
+    hourly = np.int64(HOURLY_SLOTS_MASK)
+    if interval == "1h":
+        return (masks & hourly) == hourly
+    if interval == "30min":
+        return ((masks | (masks >> 1)) & hourly) == hourly
+    raise ValueError(f"Intervalle non supporté : {interval} ('1h' ou '30min')")
+
+
+def incomplete_days(csv_path: Path,
+                    start: date | datetime,
+                    end: date | datetime,
+                    interval: str,
+                    label: str = "start") -> list[date]:
+    """
+    Liste les jours manquants ou partiels d'une série sur une plage de dates.
+
+    Paramètres :
+        csv_path (Path) : chemin du CSV de la série
+        start, end (date | datetime) : bornes incluses de la plage
+        interval (str) : '1h' ou '30min'
+        label (str) : 'start' ou 'end' (voir coverage_masks)
+
+    Retour :
+        list[date] : jours incomplets, dans l'ordre chronologique
+    """
+    days = day_range(start, end)
+    complete = complete_mask(coverage_masks(csv_path, days, label, interval), interval)
+    return [d.item() for d in days[~complete]]
+
+
+# ------------------------------------------------------
+# 🖥️ Ligne de commande
+# ------------------------------------------------------
+
+def _default_series() -> list[tuple[Path, str, str]]:
+    """Séries resamplées du projet avec leur intervalle et leur label d'horodatage."""
+    from conso_api_tools import config as conso_config
+    from prod_api_tools import config as prod_config
+
+    return [
+        (prod_config.CSV_30MIN, "30min", "start"),
+        (prod_config.CSV_1H, "1h", "start"),
+        (conso_config.CSV_30MIN, "30min", conso_config.TIMESTAMP_LABEL),
+        (conso_config.CSV_1H, "1h", conso_config.TIMESTAMP_LABEL),
+    ]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Index de couverture des séries resamplées")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruit l'index depuis les CSV")
+    parser.add_argument("--check", nargs=2, metavar=("DEBUT", "FIN"), default=None,
+                        help="Liste les jours incomplets entre deux dates YYYY-MM-DD")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    for csv_path, interval, label in _default_series():
+        if args.rebuild:
+            days = rebuild_coverage(csv_path)
+            print(f"🗂️ {csv_path.name} : couverture reconstruite ({len(days)} jours)")
+        if args.check:
+            start, end = (datetime.strptime(d, "%Y-%m-%d") for d in args.check)
+            missing = incomplete_days(csv_path, start, end, interval, label)
+            print(f"🔎 {csv_path.name} ({interval}) : {len(missing)} jour(s) incomplet(s)")
+            for day in missing:
+                print(f"   - {day}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,19 +5,36 @@ common/data_tools_OLD.py
 Outils communs de manipulation des données de production et de consommation :
 - Compléter un DataFrame pour avoir toutes les dates/horaires réguliers
 - Fusionner les jeux de données conso/production
+- Appliquer les prix par jointure « as-of » sur les points de changement de tarif
+- Établir le bilan énergétique de chaque pas (autoconsommation, injection, soutirage)
 - Générer les informations générales de synthèse
 """
 
-import os
 from pathlib import Path
+import numpy as np
 import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+from common.tariffs import tariff_prices
 
 
 DEFAULT_PRICE_DATA_PATH = Path("data/conso/consumption_prices.csv")
 
+# Colonnes reconnues pour la fin de validité (exclue) d'un prix
+PRICE_VALIDITY_COLUMNS = ["valid_until", "valid_to", "end", "end_datetime"]
+
+# Colonnes du bilan énergétique par pas (Wh)
+BALANCE_COLUMNS = ["autoconsommation", "injection", "soutirage"]
+
 
 def load_price_data(price_path: str | Path | None = None) -> pd.DataFrame | None:
-    """Charge un fichier de prix de consommation si disponible."""
+    """
+    Charge un fichier de prix de consommation si disponible.
+
+    Chaque ligne est un point de changement de tarif : le prix s'applique
+    à partir de 'datetime' jusqu'au point suivant, ou jusqu'à 'valid_until'
+    (exclu) si une colonne de fin de validité est présente.
+    """
     resolved_path = Path(price_path) if price_path is not None else DEFAULT_PRICE_DATA_PATH
     if not resolved_path.exists():
         return None
@@ -27,7 +44,7 @@ def load_price_data(price_path: str | Path | None = None) -> pd.DataFrame | None
         return None
 
     datetime_col = None
-    for candidate in ["datetime", "date", "timestamp", "time"]:
+    for candidate in ["datetime", "valid_from", "date", "timestamp", "time"]:
         if candidate in price_df.columns:
             datetime_col = candidate
             break
@@ -47,10 +64,109 @@ def load_price_data(price_path: str | Path | None = None) -> pd.DataFrame | None
     normalized = price_df[[datetime_col, price_col]].copy()
     normalized.columns = ["datetime", "price_eur_per_kwh"]
     normalized["datetime"] = pd.to_datetime(normalized["datetime"], utc=False, errors="coerce")
-    normalized = normalized.dropna(subset=["datetime", "price_eur_per_kwh"]).sort_values("datetime")
+    validity_col = next((c for c in PRICE_VALIDITY_COLUMNS if c in price_df.columns), None)
+    if validity_col is not None:
+        normalized["valid_until"] = pd.to_datetime(price_df[validity_col], utc=False, errors="coerce")
+    normalized = normalized.dropna(subset=["datetime", "price_eur_per_kwh"]).sort_values("datetime", kind="stable")
+    normalized = normalized.drop_duplicates(subset="datetime", keep="last")
     return normalized.reset_index(drop=True)
 
 
+# ------------------------- PRIX : JOINTURE AS-OF ----------------------------- #
+def price_at(datetimes, price_df: pd.DataFrame | None) -> np.ndarray:
+    """
+    Prix applicable à chaque horodatage, par recherche dichotomique dans les
+    points de changement de tarif (jointure « as-of »), quelle que soit la
+    résolution des horodatages (30 min, 1h, échantillons bruts...).
+
+    La mémoire utilisée en plus du résultat est proportionnelle au nombre de
+    changements de tarif, pas à la longueur de l'historique.
+
+    Paramètres :
+    ------------
+    datetimes : array-like de datetime
+        Horodatages à valoriser (ordre quelconque).
+    price_df : pd.DataFrame | None
+        Points de changement (voir load_price_data) : colonnes 'datetime',
+        'price_eur_per_kwh' et, optionnellement, 'valid_until' (fin exclue).
+
+    Retour :
+    --------
+    np.ndarray
+        Prix en €/kWh (float64), NaN avant le premier tarif ou hors période de validité.
+    """
+    times = pd.to_datetime(datetimes).to_numpy(dtype="datetime64[ns]")
+    prices = np.full(len(times), np.nan)
+    if price_df is None or price_df.empty:
+        return prices
+
+    changes = price_df.dropna(subset=["datetime"]).sort_values("datetime", kind="stable")
+    starts = pd.to_datetime(changes["datetime"]).to_numpy(dtype="datetime64[ns]")
+    values = changes["price_eur_per_kwh"].to_numpy(dtype="float64")
+
+    idx = np.searchsorted(starts, times, side="right") - 1
+    covered = idx >= 0
+    prices[covered] = values[idx[covered]]
+
+    if "valid_until" in changes.columns:
+        until = pd.to_datetime(changes["valid_until"]).to_numpy(dtype="datetime64[ns]")
+        ends = until[np.where(covered, idx, 0)]
+        expired = covered & ~np.isnat(ends) & (times >= ends)
+        prices[expired] = np.nan
+    return prices
+
+
+# ------------------------- BILAN ÉNERGÉTIQUE PAR PAS -------------------------- #
+def energy_balance(consommation, production) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Bilan énergétique de chaque pas, calculé sur des tableaux alignés.
+
+    Dans un même pas, la production ne couvre la consommation qu'à hauteur
+    de min(consommation, production) ; l'excédent est injecté sur le réseau
+    et le déficit soutiré au réseau.
+
+    Paramètres :
+    ------------
+    consommation : array-like
+        Consommation de chaque pas (Wh).
+    production : array-like
+        Production de chaque pas (Wh), alignée sur la consommation.
+
+    Retour :
+    --------
+    tuple(np.ndarray, np.ndarray, np.ndarray)
+        Énergie autoconsommée, injectée et soutirée (float64, Wh).
+    """
+    conso = np.asarray(consommation, dtype="float64")
+    prod = np.asarray(production, dtype="float64")
+    autoconsommation = np.minimum(conso, prod)
+    return autoconsommation, prod - autoconsommation, conso - autoconsommation
+
+
+def add_energy_balance(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ajoute (ou recalcule) les colonnes BALANCE_COLUMNS à partir de
+    'consommation' et 'production'. Le DataFrame est modifié en place et renvoyé.
+    """
+    balance = energy_balance(df["consommation"].to_numpy(dtype="float64", na_value=np.nan),
+                             df["production"].to_numpy(dtype="float64", na_value=np.nan))
+    for col, values in zip(BALANCE_COLUMNS, balance):
+        df[col] = values
+    return df
+
+
+def balance_totals(df: pd.DataFrame) -> dict:
+    """
+    Sommes des colonnes du bilan énergétique d'un DataFrame, recalculées
+    pas à pas depuis 'consommation' / 'production' si elles sont absentes.
+    """
+    if all(col in df.columns for col in BALANCE_COLUMNS):
+        return {col: float(df[col].sum()) for col in BALANCE_COLUMNS}
+    balance = energy_balance(df["consommation"].to_numpy(dtype="float64", na_value=np.nan),
+                             df["production"].to_numpy(dtype="float64", na_value=np.nan))
+    return {col: float(np.nansum(values)) for col, values in zip(BALANCE_COLUMNS, balance)}
+
+
 # ---------------------- COMPLÉTION DES DATES MANQUANTES ---------------------- #
 def complete_dataframe_datetimes(df: pd.DataFrame, min_freq: str) -> pd.DataFrame:
     """
@@ -91,14 +207,59 @@ def complete_dataframe_datetimes(df: pd.DataFrame, min_freq: str) -> pd.DataFram
 
 
 # -------------------------- FUSION DES DONNÉES ------------------------------- #
+def interval_step(interval: str = "30min") -> np.timedelta64:
+    """
+    Durée d'un pas de série ('30min', '1h') en np.timedelta64 (unité explicite).
+    """
+    return np.timedelta64(to_offset(interval).nanos, "ns")
+
+
+def to_interval_start(datetimes, label: str = "end", interval: str = "30min"):
+    """
+    Ramène des horodatages au début de leur pas.
+
+    Paramètres :
+    ------------
+    datetimes : pd.Series | pd.DatetimeIndex
+        Horodatages de la série.
+    label : str
+        Convention de la série : 'end' (fin du pas, horodatage Enedis) ou 'start'.
+    interval : str
+        Pas de la série ('30min', '1h').
+
+    Retour :
+    --------
+    pd.Series | pd.DatetimeIndex
+        Horodatages de début de pas (inchangés si label vaut 'start').
+    """
+    if label == "start":
+        return datetimes
+    if label != "end":
+        raise ValueError(f"Convention d'horodatage inconnue : {label} ('start' ou 'end')")
+    return datetimes - interval_step(interval)
+
+
 def merge_conso_prod_data(
     conso_df_30min: pd.DataFrame,
     prod_df_30min: pd.DataFrame,
     price_df: pd.DataFrame | None = None,
+    tariff: dict | None = None,
+    conso_label: str = "end",
 ) -> pd.DataFrame:
     """
     Fusionne les DataFrames de consommation et de production (agrégés sur 30 minutes)
-    et calcule la colonne 'total'.
+    et calcule la colonne 'total' ainsi que le bilan énergétique de chaque pas
+    (voir energy_balance). Les économies ne portent que sur l'énergie autoconsommée :
+    l'excédent injecté n'évite aucun achat.
+
+    La consommation Enedis est horodatée en fin de pas, la production (rééchantillonnée
+    par plancher) en début de pas : la consommation est ramenée au début de son pas
+    avant la jointure, et la colonne 'datetime' du résultat désigne toujours le
+    début du pas de 30 minutes.
+
+    Avec un contrat tarifaire (common.tariffs), le prix de chaque pas vient du
+    contrat (période HP/HC, couleur de jour) et la colonne 'tariff_period' est
+    ajoutée ; sinon il vient de la série de prix price_df.
 
     Paramètres :
     ------------
@@ -106,16 +267,25 @@ def merge_conso_prod_data(
         Données de consommation avec colonnes ['datetime', 'consommation'].
     prod_df_30min : pd.DataFrame
         Données de production avec colonnes ['datetime', 'production'].
+    price_df : pd.DataFrame | None
+        Points de changement de prix (voir load_price_data).
+    tariff : dict | None
+        Contrat tarifaire compilé (common.tariffs.load_tariff_contract), prioritaire sur price_df.
+    conso_label : str
+        Convention d'horodatage de la consommation : 'end' (Enedis, défaut) ou 'start'.
 
     Retour :
     --------
     pd.DataFrame
-        DataFrame fusionné contenant les colonnes ['datetime', 'consommation', 'production', 'total'].
+        DataFrame fusionné contenant les colonnes ['datetime', 'consommation', 'production', 'total',
+        'autoconsommation', 'injection', 'soutirage', 'price_eur_per_kwh', 'consumption_cost_eur',
+        'production_savings_eur'].
     """
 
     conso_df_30min = conso_df_30min.copy()
     prod_df_30min = prod_df_30min.copy()
-    conso_df_30min["datetime"] = pd.to_datetime(conso_df_30min["datetime"], errors="coerce")
+    conso_df_30min["datetime"] = to_interval_start(
+        pd.to_datetime(conso_df_30min["datetime"], errors="coerce"), conso_label)
     prod_df_30min["datetime"] = pd.to_datetime(prod_df_30min["datetime"], errors="coerce")
 
     # Fusion des deux DataFrames sur la colonne 'datetime' en utilisant une jointure interne
@@ -125,16 +295,12 @@ def merge_conso_prod_data(
         on = "datetime", 
         how = "inner")
 
-    if price_df is not None:
-        price_df = price_df.copy()
-        price_df["datetime"] = pd.to_datetime(price_df["datetime"], errors="coerce")
-        price_df = price_df.dropna(subset=["datetime"]).sort_values("datetime")
-        price_df = price_df.set_index("datetime").resample("30min").ffill().reset_index()
-        merged_df = pd.merge(
-            left = merged_df,
-            right = price_df[["datetime", "price_eur_per_kwh"]],
-            on = "datetime",
-            how = "left")
+    # Prix : contrat tarifaire, sinon jointure as-of sur les points de changement de prix
+    tariff_labels = None
+    if tariff is not None:
+        merged_df["price_eur_per_kwh"], tariff_labels = tariff_prices(merged_df["datetime"], tariff, label = "start")
+    elif price_df is not None:
+        merged_df["price_eur_per_kwh"] = price_at(merged_df["datetime"], price_df)
     else:
         merged_df["price_eur_per_kwh"] = pd.NA
 
@@ -144,17 +310,14 @@ def merge_conso_prod_data(
         merged_df.rename(columns={"prod": "production"}, inplace=True)
 
     merged_df["total"] = merged_df["consommation"] + merged_df["production"]
+    add_energy_balance(merged_df)
     merged_df["consumption_cost_eur"] = (merged_df["consommation"] / 1000) * merged_df["price_eur_per_kwh"].fillna(0)
-    merged_df["production_savings_eur"] = (merged_df["production"] / 1000) * merged_df["price_eur_per_kwh"].fillna(0)
+    merged_df["production_savings_eur"] = (merged_df["autoconsommation"] / 1000) * merged_df["price_eur_per_kwh"].fillna(0)
     merged_df.fillna(
         value = 0, 
         inplace=True)
-
-    output_path = os.path.join("data", "global.csv")
-    merged_df.to_csv(
-        path_or_buf = output_path, 
-        sep = ";", 
-        index = False)
+    if tariff_labels is not None:
+        merged_df["tariff_period"] = tariff_labels
     return merged_df
 
 
@@ -164,6 +327,7 @@ def print_general_info(
     df: pd.DataFrame,
     mois_choisi: str | None = None,
     price_per_kwh: float | None = None,
+    totals: dict | None = None,
 ) -> str:
     """
     Génère un texte descriptif des totaux et moyennes de consommation et de production.
@@ -176,6 +340,10 @@ def print_general_info(
         Données filtrées sur la période affichée.
     mois_choisi : str | None
         Mois ou période choisie (facultatif).
+    totals : dict | None
+        Totaux déjà calculés de la période ('consommation', 'production',
+        'consumption_cost_eur', 'production_savings_eur' et BALANCE_COLUMNS) ;
+        évite de sommer df.
 
     Retour :
     --------
@@ -186,10 +354,16 @@ def print_general_info(
         """Formate une puissance en W ou kW."""
         return f"{value/1000:,.2f} kW" if value >= 1000 else f"{value:,.0f} W"
 
-    total_conso = df["consommation"].sum()
-    total_prod = df["production"].sum()
-    estimated_cost_eur = round(df["consumption_cost_eur"].sum() if "consumption_cost_eur" in df.columns else 0.0, 2)
-    estimated_savings_eur = round(df["production_savings_eur"].sum() if "production_savings_eur" in df.columns else 0.0, 2)
+    if totals is None:
+        totals = {col: df[col].sum() for col in ["consommation", "production"]}
+        for col in ["consumption_cost_eur", "production_savings_eur"]:
+            totals[col] = df[col].sum() if col in df.columns else 0.0
+        totals.update(balance_totals(df))
+
+    total_conso = totals["consommation"]
+    total_prod = totals["production"]
+    estimated_cost_eur = round(totals["consumption_cost_eur"], 2)
+    estimated_savings_eur = round(totals["production_savings_eur"], 2)
 
     return f"""
 **Informations générales sur la période :**
@@ -200,4 +374,8 @@ def print_general_info(
 - 🌿 Économies estimées grâce à la production : **{estimated_savings_eur:,.2f} €**
 - 🌿 Production totale : **{format_power(
                                 value = total_prod)}**
+- ♻️ Autoconsommée : **{format_power(
+                                value = totals["autoconsommation"])}** · injectée : **{format_power(
+                                value = totals["injection"])}** · soutirée au réseau : **{format_power(
+                                value = totals["soutirage"])}**
 """
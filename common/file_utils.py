@@ -15,6 +15,8 @@ import pandas as pd
 from pathlib import Path
 from typing import List
 
+from common.storage import read_series
+
 # ------------------------------------------------------
 # 📁 Gestion de dossiers et fichiers
 # ------------------------------------------------------
@@ -56,6 +58,9 @@ def load_clean_data(csv_filepath: Path) -> pd.DataFrame:
     Charge les données complètes de production ou de consommation
     (production_data.csv ou consumption_data.csv).
 
+    La lecture passe par le stockage typé (common.storage) : le fichier
+    binaire associé au CSV est privilégié lorsqu'il est à jour.
+
     Paramètre :
         csv_filepath : chemin vers le fichier CSV
                        (production_data.csv ou consumption_data.csv)
@@ -64,23 +69,9 @@ def load_clean_data(csv_filepath: Path) -> pd.DataFrame:
         DataFrame avec les colonnes 'datetime' (datetime)
         et 'production' ou 'consommation' (numérique)
     """
-    if not csv_filepath.exists():
-        raise FileNotFoundError(f"🚫 Le fichier {csv_filepath} est introuvable.")
-    df = pd.read_csv(
-        filepath_or_buffer = csv_filepath, 
-        sep = ";")
-    df["datetime"] = pd.to_datetime(
-        arg = df["datetime"], 
-        errors = "coerce")
-    # conversion automatique des autres colonnes en numérique
-    for col in df.columns:
-        if col != "datetime":
-            df[col] = pd.to_numeric(
-                arg = df[col], 
-                errors = "coerce")
-    df = df.sort_values(
-                by = "datetime").reset_index(drop = True)
-    return df
+    df = read_series(
+        csv_path = csv_filepath)
+    return df.reset_index()
 
 # ------------------------------------------------------
 # 🧹 Suppression de fichiers
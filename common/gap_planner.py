@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+common/gap_planner.py
+
+Planification des téléchargements d'historique : calcule, pour chaque source
+(consommation Enedis, production Hoymiles) et chaque intervalle, les jours
+manquants ou partiels, puis les regroupe en un minimum de requêtes API.
+
+L'état de chaque jour est obtenu en une seule passe vectorisée sur :
+- les membres de l'archive brute (ZIP) de la source ;
+- l'index de couverture des séries 30 min et 1h (common.coverage).
+
+Un jour absent de l'archive est à télécharger ; un jour archivé mais
+incomplet dans une série resamplée est reconstruit localement depuis
+l'archive, sans appel à l'API. Les jours à télécharger consécutifs sont
+regroupés en plages d'au plus `max_days` jours (limite du fournisseur).
+Les jours `deferred` (échecs récents en attente de nouvel essai, voir
+common.job_journal) ne sont pas téléchargés.
+
+En mode combiné (consommation), une seule requête 30 min alimente les deux
+séries : la série 1h est dérivée localement de la courbe 30 min.
+
+🧩 Exemples d'utilisation :
+    python -m common.gap_planner
+    python -m common.gap_planner --start-date 2025-03-25 --source production
+"""
+
+import argparse
+import re
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+from common.config import START_DATE
+from common.coverage import complete_mask, coverage_masks, day_range
+from common.utils import extract_zip_file_list, yesterday
+
+
+# Date contenue dans le nom d'un membre d'archive (prod_YYYY-MM-DD.csv, conso_1h/conso_YYYY-MM-DD.json)
+_MEMBER_DATE = re.compile(r"(\d{4}-\d{2}-\d{2})\.(?:csv|json)$")
+
+# Intervalle des unités de consommation en mode combiné (30 min téléchargé, 1h dérivé)
+COMBINED_INTERVAL = "30min+1h"
+
+
+# ------------------------------------------------------
+# 🧮 État des jours
+# ------------------------------------------------------
+
+def archived_mask(members: list[str], prefix: str, days: np.ndarray) -> np.ndarray:
+    """
+    Indique pour chaque jour si l'archive contient son membre.
+
+    Paramètres :
+        members (list[str]) : membres de l'archive (extract_zip_file_list)
+        prefix (str) : préfixe des membres de la série (ex. 'prod_', 'conso_30min/conso_')
+        days (np.ndarray) : jours (datetime64[D])
+
+    Retour :
+        np.ndarray : booléen par jour
+    """
+    archived = [m.group(1) for name in members
+                if name.startswith(prefix) and (m := _MEMBER_DATE.search(name))]
+    return np.isin(days, np.array(archived, dtype = "datetime64[D]"))
+
+
+def coalesce_days(days: np.ndarray, needed: np.ndarray, max_days: int) -> list[tuple[date, date]]:
+    """
+    Regroupe les jours sélectionnés consécutifs en plages d'au plus max_days jours.
+
+    Paramètres :
+        days (np.ndarray) : jours consécutifs (datetime64[D])
+        needed (np.ndarray) : booléen par jour
+        max_days (int) : longueur maximale d'une plage
+
+    Retour :
+        list[tuple[date, date]] : plages (début, fin incluse), dans l'ordre chronologique
+    """
+    edges = np.diff(np.concatenate(([0], needed.astype(np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+
+    ranges = []
+    step = max(1, max_days)
+    for lo, hi in zip(run_starts, run_ends):
+        for chunk_start in range(lo, hi, step):
+            chunk_end = min(chunk_start + step, hi) - 1
+            ranges.append((days[chunk_start].item(), days[chunk_end].item()))
+    return ranges
+
+
+def deferred_mask(days: np.ndarray, deferred: list[date] | None) -> np.ndarray:
+    """Indique pour chaque jour s'il fait partie des jours différés."""
+    if not deferred:
+        return np.zeros(len(days), dtype = bool)
+    return np.isin(days, np.array([d.isoformat() for d in deferred], dtype = "datetime64[D]"))
+
+
+def _units(source: str, interval: str | None, action: str, days: np.ndarray, needed: np.ndarray,
+           max_days: int) -> list[dict]:
+    return [{
+        "source": source,
+        "interval": interval,
+        "action": action,
+        "start": start,
+        "end": end,
+        "days": (end - start).days + 1,
+    } for start, end in coalesce_days(days, needed, max_days)]
+
+
+# ------------------------------------------------------
+# 🗺️ Plans par source
+# ------------------------------------------------------
+
+def plan_production(start: date | datetime,
+                    end: date | datetime,
+                    archive_path: Path,
+                    csv_path_30min: Path,
+                    csv_path_1h: Path,
+                    max_days: int,
+                    deferred: list[date] | None = None) -> list[dict]:
+    """
+    Plan de la production Hoymiles : un export couvre les séries 30 min et 1h.
+
+    Paramètres :
+        deferred (list[date] | None) : jours à ne pas télécharger (backoff en cours)
+
+    Retour :
+        list[dict] : unités {'source', 'interval' (None), 'action' ('download' | 'rebuild'),
+                     'start', 'end', 'days'}, dans l'ordre chronologique
+    """
+    days = day_range(start, end)
+    archived = archived_mask(extract_zip_file_list(zip_path = Path(archive_path)), "prod_", days)
+    resampled = (complete_mask(coverage_masks(csv_path_30min, days), "30min")
+                 & complete_mask(coverage_masks(csv_path_1h, days), "1h"))
+
+    download = ~archived & ~deferred_mask(days, deferred)
+    units = (_units("production", None, "download", days, download, max_days)
+             + _units("production", None, "rebuild", days, archived & ~resampled, len(days)))
+    return sorted(units, key = lambda u: u["start"])
+
+
+def plan_consumption(start: date | datetime,
+                     end: date | datetime,
+                     archive_path: Path,
+                     series: dict[str, Path],
+                     max_days: int,
+                     combined: bool = False,
+                     deferred: list[date] | None = None,
+                     label: str = "end") -> list[dict]:
+    """
+    Plan de la consommation Enedis : une requête par intervalle, ou une seule
+    requête 30 min pour les deux intervalles en mode combiné.
+
+    Paramètres :
+        series (dict[str, Path]) : {intervalle ('30min' | '1h'): CSV de la série}
+        combined (bool) : télécharge la courbe 30 min une fois et dérive la série 1h
+                          (unités 'download' d'intervalle COMBINED_INTERVAL) ;
+                          nécessite les deux intervalles dans `series`
+        deferred (list[date] | None) : jours à ne pas télécharger (backoff en cours)
+        label (str) : horodatage des séries ('end' : fin d'intervalle, convention Enedis) ;
+                      une journée est complète sur ses propres horodatages 00:30 / 01:00 … 24:00
+
+    Retour :
+        list[dict] : unités (voir plan_production), triées par intervalle puis par date
+    """
+    days = day_range(start, end)
+    members = extract_zip_file_list(zip_path = Path(archive_path))
+    allowed = ~deferred_mask(days, deferred)
+    archived = {interval: archived_mask(members, f"conso_{interval}/conso_", days) for interval in series}
+    complete = {interval: complete_mask(coverage_masks(csv_path, days, label, interval), interval)
+                for interval, csv_path in series.items()}
+
+    if combined:
+        # Un jour absent de l'archive 30 min est téléchargé une fois pour les deux séries ;
+        # la série 1h d'un jour archivé en 30 min se reconstruit sans appel API
+        rebuild_1h = (archived["30min"] & ~archived["1h"]) | (archived["1h"] & ~complete["1h"])
+        download = ~archived["30min"] & allowed
+        return (_units("consommation", COMBINED_INTERVAL, "download", days, download, max_days)
+                + _units("consommation", "1h", "rebuild", days, rebuild_1h, len(days))
+                + _units("consommation", "30min", "rebuild", days, archived["30min"] & ~complete["30min"],
+                         len(days)))
+
+    units = []
+    for interval in series:
+        download = ~archived[interval] & allowed
+        units += sorted(_units("consommation", interval, "download", days, download, max_days)
+                        + _units("consommation", interval, "rebuild", days,
+                                 archived[interval] & ~complete[interval], len(days)),
+                        key = lambda u: u["start"])
+    return units
+
+
+def build_plan(start: date | datetime = START_DATE,
+               end: date | datetime | None = None,
+               sources: tuple[str, ...] = ("consommation", "production"),
+               intervals: tuple[str, ...] = ("1h", "30min"),
+               combined: bool = True) -> list[dict]:
+    """
+    Plan complet des téléchargements avec les chemins et limites du projet.
+
+    Paramètres :
+        start, end : bornes incluses (défaut : START_DATE → hier)
+        sources (tuple[str]) : 'consommation' et / ou 'production'
+        intervals (tuple[str]) : intervalles de consommation à planifier
+        combined (bool) : une seule requête 30 min pour les deux intervalles (si les deux sont planifiés)
+
+    Retour :
+        list[dict] : unités de travail (voir plan_production)
+    """
+    end = end if end is not None else yesterday()
+    plan = []
+    if "consommation" in sources:
+        from conso_api_tools import config as conso_config
+
+        plan += plan_consumption(
+            start = start,
+            end = end,
+            archive_path = conso_config.ZIP_FILE,
+            series = {i: conso_config.CSV_30MIN if i == "30min" else conso_config.CSV_1H for i in intervals},
+            max_days = conso_config.MAX_RANGE_DAYS,
+            combined = combined and {"1h", "30min"} <= set(intervals),
+            label = conso_config.TIMESTAMP_LABEL)
+    if "production" in sources:
+        from prod_api_tools import config as prod_config
+
+        plan += plan_production(
+            start = start,
+            end = end,
+            archive_path = prod_config.ARCHIVE_FILE,
+            csv_path_30min = prod_config.CSV_30MIN,
+            csv_path_1h = prod_config.CSV_1H,
+            max_days = prod_config.BACKFILL_RANGE_DAYS)
+    return plan
+
+
+def format_plan(plan: list[dict]) -> str:
+    """Texte lisible d'un plan (une ligne par unité, puis le nombre de requêtes API)."""
+    if not plan:
+        return "✅ Aucun jour manquant : aucune requête nécessaire."
+    lines = []
+    for unit in plan:
+        label = unit["source"] + (f" {unit['interval']}" if unit["interval"] else "")
+        action = "📡 téléchargement" if unit["action"] == "download" else "♻️ reconstruction locale"
+        lines.append(f"{label:<24} {action:<24} {unit['start']} → {unit['end']} ({unit['days']} j)")
+    requests = sum(unit["action"] == "download" for unit in plan)
+    lines.append(f"📊 {requests} requête(s) API, {sum(u['days'] for u in plan)} jour(s) concerné(s)")
+    return "\n".join(lines)
+
+
+# ------------------------------------------------------
+# 🖥️ Ligne de commande
+# ------------------------------------------------------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Plan des téléchargements d'historique manquants")
+    parser.add_argument("--start-date", default=None, help="Date de début YYYY-MM-DD (défaut : START_DATE)")
+    parser.add_argument("--end-date", default=None, help="Date de fin YYYY-MM-DD (défaut : hier)")
+    parser.add_argument("--source", choices=["consommation", "production"], default=None,
+                        help="Source à planifier (sinon les deux)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    start = datetime.strptime(args.start_date, "%Y-%m-%d") if args.start_date else START_DATE
+    end = datetime.strptime(args.end_date, "%Y-%m-%d") if args.end_date else None
+    sources = (args.source,) if args.source else ("consommation", "production")
+    print(format_plan(build_plan(start = start, end = end, sources = sources)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# http_client.py
+# -*- coding: utf-8 -*-
+"""
+Client HTTP partagé par les clients d'API (Hoymiles, Conso).
+
+Chaque fournisseur possède un HttpClient qui conserve une requests.Session :
+les connexions TCP/TLS sont réutilisées (keep-alive) au lieu d'être rouvertes
+à chaque appel, ce qui compte lors des backfills de plusieurs centaines de jours.
+
+La session porte :
+- un pool de connexions dimensionné pour les téléchargements parallèles
+- les en-têtes et cookies par défaut du fournisseur
+- un timeout par défaut appliqué à chaque requête
+- un adaptateur de nouvelles tentatives (erreurs de connexion et codes HTTP transitoires)
+"""
+
+import threading
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class HttpClient:
+    """
+    Session HTTP réutilisable avec pool de connexions, timeout et nouvelles tentatives.
+
+    Paramètres :
+        headers (dict | None) : en-têtes envoyés avec chaque requête
+        cookies (dict | None) : cookies envoyés avec chaque requête
+        timeout (float) : timeout par défaut (secondes) si la requête n'en précise pas
+        pool_size (int) : nombre de connexions conservées par hôte
+        retries (int) : nombre de nouvelles tentatives de l'adaptateur
+        backoff_factor (float) : facteur du backoff exponentiel entre tentatives
+        status_forcelist (tuple) : codes HTTP retentés ; vide pour ne retenter
+                                   que les erreurs de connexion
+        allowed_methods (tuple) : méthodes HTTP pouvant être retentées
+    """
+
+    def __init__(self,
+                 headers: Optional[dict] = None,
+                 cookies: Optional[dict] = None,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 retries: int = DEFAULT_RETRIES,
+                 backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+                 status_forcelist: tuple = RETRY_STATUS_CODES,
+                 allowed_methods: tuple = ("GET", "POST")):
+        self.timeout = timeout
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        if cookies:
+            self.session.cookies.update(cookies)
+
+        retry = Retry(
+            total = retries,
+            connect = retries,
+            read = retries,
+            status = retries,
+            backoff_factor = backoff_factor,
+            status_forcelist = status_forcelist,
+            allowed_methods = frozenset(allowed_methods),
+            respect_retry_after_header = True,
+            # La dernière réponse est renvoyée telle quelle : raise_for_status() reste à l'appelant
+            raise_on_status = False)
+        adapter = HTTPAdapter(
+            pool_connections = pool_size,
+            pool_maxsize = pool_size,
+            max_retries = retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Envoie une requête via la session, avec le timeout par défaut si absent."""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def lazy_client(factory: Callable[[], HttpClient]) -> Callable[[], HttpClient]:
+    """
+    Construit un accesseur paresseux et thread-safe vers un HttpClient unique.
+
+    L'accesseur expose aussi reset() pour fermer et oublier le client
+    (utile après un changement de configuration ou dans les tests).
+
+    Paramètre :
+        factory (callable) : fonction créant le client au premier appel
+
+    Retour :
+        callable : accesseur renvoyant toujours le même client
+    """
+    lock = threading.Lock()
+    holder: dict = {}
+
+    def get_client() -> HttpClient:
+        client = holder.get("client")
+        if client is None:
+            with lock:
+                client = holder.get("client")
+                if client is None:
+                    client = holder["client"] = factory()
+        return client
+
+    def reset() -> None:
+        with lock:
+            client = holder.pop("client", None)
+        if client is not None:
+            client.close()
+
+    get_client.reset = reset
+    return get_client
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+common/job_journal.py
+
+Journal persistant des backfills (consommation Enedis, production Hoymiles).
+
+Chaque unité de travail planifiée (plage de jours, voir common.gap_planner)
+est consignée avec ses changements d'état dans un fichier JSONL en ajout seul
+(une ligne par événement, écrite immédiatement) :
+
+    planned → downloaded → archived → resampled
+                        ↘ failed (avec la raison)
+
+Le journal sert à :
+- reprendre un backfill interrompu : un point de reprise (checkpoint) est
+  enregistré en fin d'exécution, jusqu'auquel toutes les journées sont intégrées ;
+  l'exécution suivante planifie à partir du lendemain ;
+- espacer les nouvelles tentatives : une journée dont le téléchargement échoue
+  n'est redemandée qu'après un délai doublé à chaque échec consécutif
+  (d'une exécution à l'autre), jusqu'à RETRY_MAX_SECONDS ;
+- suivre débit et taux d'erreur par fournisseur (commande ci-dessous).
+
+L'état réel des données (archive et couverture des séries) reste la référence :
+une unité consignée mais perdue (arrêt brutal) est simplement replanifiée.
+
+🧩 Exemples d'utilisation :
+    python -m common.job_journal
+    python -m common.job_journal --source production
+"""
+
+import argparse
+import json
+from datetime import date, datetime, timedelta
+from os import getenv
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+from common.config import START_DATE
+from common.utils import print_section
+
+
+JOURNAL_FILE_NAME = "backfill_journal.jsonl"
+
+# États d'une unité de travail ; 'resampled' est l'état final d'une unité réussie
+STATES = ("planned", "downloaded", "archived", "resampled", "failed")
+
+# Délai avant nouvelle tentative d'une journée en échec : base × 2^(échecs - 1), borné
+RETRY_BASE_SECONDS = float(getenv("BACKFILL_RETRY_BASE_HOURS", "12")) * 3600
+RETRY_MAX_SECONDS = 30 * 24 * 3600
+
+
+def _as_date(value: date | datetime | str) -> date:
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _record_days(record: dict) -> list[date]:
+    start, end = _as_date(record["start"]), _as_date(record["end"])
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+# ------------------------------------------------------
+# 📖 Lecture du journal
+# ------------------------------------------------------
+
+def read_journal(path: Path) -> list[dict]:
+    """
+    Lit les événements d'un journal (une ligne incomplète, laissée par un arrêt brutal, est ignorée).
+
+    Paramètres :
+        path (Path) : fichier JSONL du journal
+
+    Retour :
+        list[dict] : événements dans l'ordre d'écriture
+    """
+    path = Path(path)
+    if not path.exists():
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def retry_delay(failures: int, base: float = RETRY_BASE_SECONDS, cap: float = RETRY_MAX_SECONDS) -> float:
+    """Délai (secondes) avant de retenter une journée après `failures` échecs consécutifs."""
+    return min(cap, base * 2 ** max(0, failures - 1))
+
+
+def deferred_days(records: list[dict], now: datetime) -> dict[date, datetime]:
+    """
+    Journées dont le téléchargement a échoué et dont le délai de nouvelle tentative court encore.
+
+    Un téléchargement réussi ('downloaded') remet le compteur d'échecs de ses journées à zéro.
+
+    Paramètres :
+        records (list[dict]) : événements d'un fournisseur (read_journal)
+        now (datetime) : instant de référence
+
+    Retour :
+        dict[date, datetime] : {journée: date de la prochaine tentative autorisée}
+    """
+    failures, last_failure = {}, {}
+    for record in records:
+        if record.get("action") != "download" or record["state"] not in ("failed", "downloaded"):
+            continue
+        for day in _record_days(record):
+            if record["state"] == "downloaded":
+                failures.pop(day, None)
+                continue
+            failures[day] = failures.get(day, 0) + 1
+            last_failure[day] = datetime.fromisoformat(record["ts"])
+
+    deferred = {}
+    for day, count in failures.items():
+        retry_at = last_failure[day] + timedelta(seconds=retry_delay(count))
+        if retry_at > now:
+            deferred[day] = retry_at
+    return deferred
+
+
+def last_checkpoint(records: list[dict]) -> date | None:
+    """Dernier point de reprise enregistré (journées intégrées jusqu'à cette date incluse)."""
+    for record in reversed(records):
+        if record["state"] == "checkpoint":
+            return _as_date(record["end"])
+    return None
+
+
+# ------------------------------------------------------
+# ✍️ Journal d'une exécution
+# ------------------------------------------------------
+
+class JobJournal:
+    """
+    Journal des unités de travail d'une exécution de backfill pour un fournisseur.
+
+    Exemple :
+        journal = JobJournal(config.JOURNAL_FILE, "consommation")
+        start = journal.resume_date(START_DATE)
+        journal.record(unit, "planned")
+        ...
+        journal.record(unit, "resampled")
+        journal.finish(start, end)
+    """
+
+    def __init__(self, path: Path, source: str, clock: Callable[[], datetime] = datetime.now):
+        self.path = Path(path)
+        self.source = source
+        self.clock = clock
+        self.run = clock().strftime("%Y%m%dT%H%M%S")
+        self.records = [r for r in read_journal(self.path) if r.get("source") == source]
+        self.deferred: dict[date, datetime] = {}
+        # Dernier état de chaque journée traitée pendant l'exécution : {(intervalle, jour): état}
+        self._run_states: dict[tuple, str] = {}
+
+    def _append(self, entry: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        # Une ligne tronquée par un arrêt brutal ne doit pas absorber la suivante
+        if self.path.exists() and self.path.stat().st_size > 0:
+            with open(self.path, "rb") as f:
+                f.seek(-1, 2)
+                if f.read(1) != b"\n":
+                    line = "\n" + line
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+        self.records.append(entry)
+
+    def record(self, unit: dict, state: str, reason: str | None = None) -> None:
+        """
+        Consigne le nouvel état d'une unité de travail.
+
+        Paramètres :
+            unit (dict) : unité {'start', 'end'} (+ 'interval', 'action' optionnels, voir common.gap_planner)
+            state (str) : un des STATES
+            reason (str | None) : cause de l'échec (état 'failed')
+        """
+        if state not in STATES:
+            raise ValueError(f"État inconnu : {state}")
+        start, end = _as_date(unit["start"]), _as_date(unit["end"])
+        entry = {
+            "ts": self.clock().isoformat(timespec="seconds"),
+            "run": self.run,
+            "source": self.source,
+            "interval": unit.get("interval"),
+            "action": unit.get("action", "download"),
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "days": (end - start).days + 1,
+            "state": state,
+        }
+        if reason:
+            entry["reason"] = str(reason)
+        self._append(entry)
+        for day in _record_days(entry):
+            self._run_states[(entry["interval"], day)] = state
+
+    def resume_date(self, default: datetime) -> datetime:
+        """Date de reprise : lendemain du dernier point de reprise, ou `default` s'il est postérieur."""
+        checkpoint = last_checkpoint(self.records)
+        if checkpoint is None:
+            return default
+        resume = datetime.combine(checkpoint + timedelta(days=1), datetime.min.time())
+        return max(default, resume)
+
+    def deferred_days(self) -> list[date]:
+        """Journées à ne pas retélécharger pendant cette exécution (backoff en cours)."""
+        self.deferred = deferred_days(self.records, self.clock())
+        return sorted(self.deferred)
+
+    def finish(self, start: date | datetime, end: date | datetime) -> date | None:
+        """
+        Enregistre le point de reprise de l'exécution.
+
+        Le point de reprise est la veille de la première journée non intégrée
+        (échec, différée ou interrompue), ou `end` si tout a été intégré. Il n'est
+        enregistré que si l'exécution a démarré au plus tard au point de reprise
+        courant : les journées antérieures sont alors toutes intégrées.
+
+        Paramètres :
+            start, end : bornes incluses de la plage traitée
+
+        Retour :
+            date | None : point de reprise enregistré
+        """
+        start, end = _as_date(start), _as_date(end)
+        if start > _as_date(self.resume_date(START_DATE)):
+            return None
+        pending = [day for (_, day), state in self._run_states.items() if state != "resampled"]
+        pending += list(self.deferred)
+        pending = [day for day in pending if start <= day <= end]
+        checkpoint = min(pending) - timedelta(days=1) if pending else end
+        if checkpoint < start:
+            return None
+        self._append({
+            "ts": self.clock().isoformat(timespec="seconds"),
+            "run": self.run,
+            "source": self.source,
+            "start": start.isoformat(),
+            "end": checkpoint.isoformat(),
+            "state": "checkpoint",
+        })
+        return checkpoint
+
+
+# ------------------------------------------------------
+# 📊 Statistiques
+# ------------------------------------------------------
+
+def journal_status(records: list[dict], now: datetime | None = None) -> pd.DataFrame:
+    """
+    Débit et taux d'erreur par fournisseur.
+
+    Paramètres :
+        records (list[dict]) : événements (un ou plusieurs fournisseurs)
+        now (datetime | None) : instant de référence des journées différées (défaut : maintenant)
+
+    Retour :
+        pd.DataFrame : une ligne par fournisseur (exécutions, requêtes, échecs, taux d'erreur,
+                       journées intégrées, débit en journées / heure, unités interrompues,
+                       journées différées, point de reprise, dernière exécution)
+    """
+    now = now or datetime.now()
+    events = pd.DataFrame([r for r in records if r["state"] in STATES])
+    if events.empty:
+        return pd.DataFrame()
+    rows = {}
+    for source, group in events.groupby("source"):
+        ts = pd.to_datetime(group["ts"])
+        downloads = group[group["action"] == "download"]
+        requests = int((downloads["state"] == "downloaded").sum())
+        failures = int((downloads["state"] == "failed").sum())
+        integrated = int(group.loc[group["state"] == "resampled", "days"].sum())
+        spans = ts.groupby(group["run"]).agg(["min", "max"])
+        busy_hours = (spans["max"] - spans["min"]).sum().total_seconds() / 3600
+
+        # Dernier état de chaque unité : les états intermédiaires sont des unités interrompues
+        latest = group.groupby(["interval", "action", "start", "end"], dropna=False)["state"].last()
+        source_records = [r for r in records if r.get("source") == source]
+        checkpoint = last_checkpoint(source_records)
+
+        rows[source] = {
+            "exécutions": group["run"].nunique(),
+            "requêtes": requests,
+            "échecs": failures,
+            "taux d'erreur": failures / (requests + failures) if requests + failures else 0.0,
+            "jours intégrés": integrated,
+            "jours / heure": integrated / busy_hours if busy_hours > 0 else float("nan"),
+            "interrompues": int(latest.isin(["planned", "downloaded", "archived"]).sum()),
+            "jours différés": len(deferred_days(source_records, now)),
+            "point de reprise": checkpoint.isoformat() if checkpoint else None,
+            "dernière exécution": ts.max().isoformat(sep=" "),
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def format_status(status: pd.DataFrame) -> str:
+    """Texte lisible des statistiques de journal_status."""
+    if status.empty:
+        return "📭 Aucun backfill consigné."
+    lines = []
+    for source, row in status.iterrows():
+        throughput = "n/a" if pd.isna(row["jours / heure"]) else f"{row['jours / heure']:.1f} j/h"
+        error_rate = row["taux d'erreur"]
+        lines += [
+            f"🔌 {source}",
+            f"   {row['exécutions']} exécution(s), dernière le {row['dernière exécution']}",
+            f"   📡 {row['requêtes']} requête(s) réussie(s), {row['échecs']} échec(s) "
+            f"(taux d'erreur {error_rate:.1%})",
+            f"   ⚡ {row['jours intégrés']} journée(s) intégrée(s), débit {throughput}",
+            f"   ⏸️ {row['interrompues']} unité(s) interrompue(s), {row['jours différés']} journée(s) en attente de nouvel essai",
+            f"   📍 point de reprise : {row['point de reprise'] or 'aucun'}",
+        ]
+    return "\n".join(lines)
+
+
+# ------------------------------------------------------
+# 🖥️ Ligne de commande
+# ------------------------------------------------------
+
+def default_journals() -> dict[str, Path]:
+    """Journaux des deux fournisseurs avec les chemins du projet."""
+    from conso_api_tools import config as conso_config
+    from prod_api_tools import config as prod_config
+
+    return {"consommation": conso_config.JOURNAL_FILE, "production": prod_config.JOURNAL_FILE}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="État des backfills consignés dans les journaux")
+    parser.add_argument("--source", choices=["consommation", "production"], default=None,
+                        help="Fournisseur à afficher (sinon les deux)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    records = []
+    for source, path in default_journals().items():
+        if args.source in (None, source):
+            records += [r for r in read_journal(path) if r.get("source") == source]
+    print_section("📒 État des backfills")
+    print(format_status(journal_status(records)))
+
+
+if __name__ == "__main__":
+    main()
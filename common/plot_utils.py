@@ -4,19 +4,70 @@ Fonctions utilitaires pour la génération de graphiques Plotly.
 
 Ce module centralise la logique de visualisation pour assurer la cohérence
 et optimiser les performances, notamment sur les histogrammes volumineux.
+
+Au-delà de WEBGL_THRESHOLD points par courbe, les courbes sont tracées en
+WebGL (go.Scattergl, même style et mêmes info-bulles) et les histogrammes
+sont remplacés par des barres agrégées sur un pas plus grossier.
 """
 
 import plotly.graph_objects as go
 import pandas as pd
 
+from common.config import WEBGL_THRESHOLD
+
+
+# Pas d'agrégation essayés, du plus fin au plus grossier, pour les histogrammes volumineux
+BAR_AGGREGATION_STEPS = [
+    ("1h", "1h"),
+    ("1D", "jour"),
+    ("W", "semaine"),
+    ("MS", "mois"),
+]
+
+
+def aggregate_for_bars(df: pd.DataFrame, max_bars: int) -> tuple[pd.DataFrame, str | None]:
+    """
+    Agrège les données au pas le plus fin donnant au plus max_bars barres.
+
+    Les valeurs sont moyennées sur chaque pas, ce qui conserve l'unité et
+    l'ordre de grandeur des barres d'origine.
+
+    Paramètres :
+    ------------
+    df : pd.DataFrame
+        Données contenant 'datetime' et les colonnes de puissance.
+    max_bars : int
+        Nombre maximal de barres par série.
+
+    Retour :
+    --------
+    tuple(pd.DataFrame, str | None)
+        Données agrégées et libellé du pas retenu (None si aucune agrégation).
+    """
+    if len(df) <= max_bars:
+        return df, None
+
+    columns = [c for c in ["consommation", "production", "total"] if c in df.columns]
+    indexed = df.set_index(pd.to_datetime(df["datetime"]))[columns]
+    for rule, label in BAR_AGGREGATION_STEPS:
+        agg = indexed.resample(rule).mean().dropna(how = "all")
+        if len(agg) <= max_bars:
+            break
+    return agg.rename_axis("datetime").reset_index(), label
+
+
 def create_time_series_plot(
     df: pd.DataFrame, 
     title: str = "Analyse Temporelle",
-    show_total: bool = True) -> go.Figure:
+    show_total: bool = True,
+    webgl_threshold: int = WEBGL_THRESHOLD) -> go.Figure:
     """
     Génère un graphique de type courbes (Scatter) pour visualiser l'évolution
     temporelle de la consommation et de la production.
 
+    Au-delà de webgl_threshold points, les courbes utilisent go.Scattergl
+    (rendu WebGL) avec le même style et les mêmes info-bulles.
+
     Paramètres :
     ------------
     df : pd.DataFrame
@@ -25,6 +76,8 @@ def create_time_series_plot(
         Si True, affiche également la courbe 'total' (somme prod + conso).
     title : str
         Titre du graphique.
+    webgl_threshold : int
+        Nombre de points au-delà duquel le rendu WebGL est utilisé.
 
     Retour :
     --------
@@ -32,10 +85,11 @@ def create_time_series_plot(
         Objet figure Plotly prêt à être affiché.
     """
     fig = go.Figure()
+    scatter = go.Scattergl if len(df) > webgl_threshold else go.Scatter
 
     # Tracé de la consommation
     if "consommation" in df.columns:
-        fig.add_trace(go.Scatter(
+        fig.add_trace(scatter(
             x=df["datetime"],
             y=df["consommation"],
             name="Consommation (W)",
@@ -45,7 +99,7 @@ def create_time_series_plot(
 
     # Tracé de la production
     if "production" in df.columns:
-        fig.add_trace(go.Scatter(
+        fig.add_trace(scatter(
             x=df["datetime"],
             y=df["production"],
             name="Production (W)",
@@ -55,7 +109,7 @@ def create_time_series_plot(
     
     # Tracé du total
     if show_total and "total" in df.columns:
-        fig.add_trace(go.Scatter(
+        fig.add_trace(scatter(
             x=df["datetime"],
             y=df["total"],
             name="Total (W)",
@@ -77,11 +131,15 @@ def create_time_series_plot(
 def create_time_series_bar_plot(
     df: pd.DataFrame,
     title: str = "Analyse Temporelle (Barres)",
-    show_total: bool = True) -> go.Figure:
+    show_total: bool = True,
+    max_bars: int = WEBGL_THRESHOLD) -> go.Figure:
     """
     Génère un graphique de type barres (Histogramme temporel) pour visualiser 
     l'évolution de la consommation et de la production dans le temps.
 
+    Au-delà de max_bars barres, les données sont moyennées sur un pas plus
+    grossier (voir aggregate_for_bars) et le pas retenu est ajouté au titre.
+
     Paramètres :
     ------------
     df : pd.DataFrame
@@ -90,12 +148,18 @@ def create_time_series_bar_plot(
         Si True, affiche également les barres pour le 'total'.
     title : str
         Titre du graphique.
+    max_bars : int
+        Nombre maximal de barres par série avant agrégation.
 
     Retour :
     --------
     go.Figure
         Objet figure Plotly (barres temporelles).
     """
+    df, step = aggregate_for_bars(df, max_bars)
+    if step is not None:
+        title = f"{title} (moyennes par {step})"
+
     fig = go.Figure()
 
     # Tracé de la consommation
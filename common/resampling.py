@@ -0,0 +1,219 @@
+# resampling.py
+# -*- coding: utf-8 -*-
+"""
+Resampling incrémental des séries brutes vers les grilles 30 min et 1h.
+
+Pour chaque créneau (bucket) de la grille, un état partiel est conservé :
+somme, nombre d'échantillons, minimum et maximum de chaque colonne, ainsi que
+les positions (en secondes depuis le début du créneau) du premier et du dernier
+échantillon brut reçus. La moyenne exportée vaut somme / nombre : un créneau
+rempli en plusieurs fois (journée livrée en deux parties, échantillons en retard)
+a donc une moyenne exacte, et non la moyenne du seul dernier lot.
+
+Règle de fusion d'un nouveau lot dans un créneau existant :
+- plages d'échantillons disjointes → les états sont additionnés (complément)
+- plages qui se recouvrent → le nouvel état remplace l'ancien (nouvelle livraison
+  ou correction de la même période)
+
+Les états sont stockés par partitions mensuelles à côté du CSV de la série
+(ex. production_data_30min_state/2025-03.parquet) : une mise à jour ne relit
+et ne réécrit que les mois touchés, et seuls les créneaux modifiés sont
+transmis à common.storage.append_series.
+
+Les créneaux antérieurs à la mise en place de l'état n'ont pas d'état : ils
+sont remplacés par le premier lot qui les touche (comportement historique).
+Les états doivent donc être conservés avec la série entre deux exécutions :
+les workflows GitHub Actions les versionnent dans le même commit que les CSV.
+"""
+
+import importlib.util
+from pathlib import Path
+
+import pandas as pd
+
+from common.storage import append_series
+
+
+STATE_STATS = ("sum", "count", "min", "max")
+
+
+# ------------------------------------------------------
+# 💾 Stockage des états partiels
+# ------------------------------------------------------
+
+def state_dir(csv_path: Path) -> Path:
+    """Dossier des états partiels associé à un CSV de série resamplée."""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(f"{csv_path.stem}_state")
+
+
+def _state_suffix() -> str:
+    # Les états contiennent des entiers et des sommes en float64 : pas de CSV typé float32
+    return ".parquet" if importlib.util.find_spec("pyarrow") is not None else ".csv"
+
+
+def _read_state(path: Path) -> pd.DataFrame:
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(
+            filepath_or_buffer = path,
+            sep = ";",
+            parse_dates = ["datetime"])
+    return df.set_index("datetime")
+
+
+def _write_state(df: pd.DataFrame, path: Path) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    if path.suffix == ".parquet":
+        df.reset_index().to_parquet(
+            tmp_path,
+            index = False)
+    else:
+        df.to_csv(
+            path_or_buf = tmp_path,
+            sep = ";",
+            index_label = "datetime")
+    tmp_path.replace(path)
+
+
+def load_bucket_state(csv_path: Path, months: list[str] | None = None) -> pd.DataFrame:
+    """
+    Charge les états partiels d'une série.
+
+    Paramètres :
+        csv_path (Path) : chemin du CSV de la série resamplée
+        months (list[str] | None) : partitions 'YYYY-MM' à lire (toutes si None)
+
+    Retour :
+        pd.DataFrame : états indexés par début de créneau (vide si aucun)
+    """
+    folder = state_dir(csv_path)
+    if not folder.exists():
+        return pd.DataFrame(index = pd.DatetimeIndex([], name = "datetime"))
+
+    if months is None:
+        files = sorted(p for p in folder.iterdir() if p.suffix in (".parquet", ".csv"))
+    else:
+        files = [p for m in months for p in (folder / f"{m}.parquet", folder / f"{m}.csv") if p.exists()]
+
+    parts = [_read_state(p) for p in files]
+    if not parts:
+        return pd.DataFrame(index = pd.DatetimeIndex([], name = "datetime"))
+    return pd.concat(objs = parts).sort_index()
+
+
+def _save_bucket_state(state: pd.DataFrame, csv_path: Path) -> None:
+    """Réécrit les partitions mensuelles couvertes par `state` (qui contient tous leurs créneaux)."""
+    folder = state_dir(csv_path)
+    folder.mkdir(
+        parents = True,
+        exist_ok = True)
+    suffix = _state_suffix()
+    for key, part in state.groupby(state.index.to_period("M").strftime("%Y-%m"), sort = True):
+        _write_state(part, folder / f"{key}{suffix}")
+
+
+# ------------------------------------------------------
+# 🧮 Agrégation et fusion des états
+# ------------------------------------------------------
+
+def compute_bucket_state(raw: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """
+    Calcule l'état partiel de chaque créneau touché par un lot brut.
+
+    Paramètres :
+        raw (pd.DataFrame) : échantillons bruts indexés par 'datetime'
+        freq (str) : pas de la grille ('30min', '1h')
+
+    Retour :
+        pd.DataFrame : colonnes '<colonne>_sum|_count|_min|_max', 'first', 'last'
+                       (positions en secondes dans le créneau), indexé par créneau
+    """
+    raw = raw.sort_index()
+    values = raw.apply(pd.to_numeric, errors = "coerce")
+    buckets = raw.index.floor(freq)
+    grouped = values.groupby(buckets)
+
+    stats = grouped.agg(list(STATE_STATS))
+    stats.columns = [f"{col}_{stat}" for col, stat in stats.columns]
+
+    offsets = pd.Series((raw.index - buckets).total_seconds(), index = buckets)
+    stats["first"] = offsets.groupby(level = 0).min()
+    stats["last"] = offsets.groupby(level = 0).max()
+    stats.index.name = "datetime"
+    return stats
+
+
+def merge_bucket_states(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fusionne les états d'un nouveau lot avec les états existants des mêmes créneaux.
+
+    Paramètres :
+        old (pd.DataFrame) : états existants (peut contenir d'autres créneaux)
+        new (pd.DataFrame) : états du nouveau lot
+
+    Retour :
+        pd.DataFrame : états fusionnés des créneaux de `new`
+    """
+    common = new.index.intersection(old.index)
+    if common.empty:
+        return new
+
+    o = old.loc[common].reindex(columns = new.columns)
+    n = new.loc[common]
+    disjoint = (n["first"] > o["last"]) | (n["last"] < o["first"])
+    if not disjoint.any():
+        return new
+
+    d = disjoint[disjoint].index
+    merged = new.copy()
+    for col in merged.columns:
+        if col.endswith("_sum") or col.endswith("_count"):
+            merged.loc[d, col] = n.loc[d, col].add(o.loc[d, col], fill_value = 0)
+        elif col.endswith("_min") or col == "first":
+            merged.loc[d, col] = pd.concat([n.loc[d, col], o.loc[d, col]], axis = 1).min(axis = 1)
+        elif col.endswith("_max") or col == "last":
+            merged.loc[d, col] = pd.concat([n.loc[d, col], o.loc[d, col]], axis = 1).max(axis = 1)
+    return merged
+
+
+def bucket_means(state: pd.DataFrame) -> pd.DataFrame:
+    """Moyenne de chaque colonne (somme / nombre) ; les créneaux sans échantillon sont exclus."""
+    columns = [c[:-len("_sum")] for c in state.columns if c.endswith("_sum")]
+    means = pd.DataFrame(
+        {col: state[f"{col}_sum"] / state[f"{col}_count"].where(state[f"{col}_count"] > 0)
+         for col in columns},
+        index = state.index)
+    return means.dropna(how = "all")
+
+
+def update_resampled_series(raw: pd.DataFrame, csv_path: Path, freq: str) -> pd.DataFrame:
+    """
+    Intègre un lot brut dans une série resamplée en ne recalculant que les créneaux touchés.
+
+    Paramètres :
+        raw (pd.DataFrame) : échantillons bruts indexés par 'datetime'
+        csv_path (Path) : chemin du CSV de la série resamplée
+        freq (str) : pas de la grille ('30min', '1h')
+
+    Retour :
+        pd.DataFrame : moyennes des créneaux mis à jour
+    """
+    new_state = compute_bucket_state(raw, freq)
+    if new_state.empty:
+        return bucket_means(new_state)
+
+    months = sorted(pd.unique(new_state.index.to_period("M").strftime("%Y-%m")))
+    existing = load_bucket_state(csv_path, months)
+    merged = merge_bucket_states(existing, new_state)
+
+    # Les partitions touchées sont réécrites avec tous leurs créneaux
+    full = pd.concat(objs = [existing.drop(index = merged.index, errors = "ignore"), merged]).sort_index()
+    _save_bucket_state(full, csv_path)
+
+    means = bucket_means(merged)
+    append_series(
+        df_new = means,
+        csv_path = csv_path)
+    return means
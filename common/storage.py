@@ -0,0 +1,511 @@
+# storage.py
+# -*- coding: utf-8 -*-
+"""
+Stockage des séries temporelles resamplées (production et consommation).
+
+Les séries sont manipulées sous une forme typée unique :
+- index DatetimeIndex nommé 'datetime' (datetime64, trié, sans doublon)
+- colonnes de valeurs en float32
+
+Le format de stockage principal est binaire et colonnaire (Parquet ou Feather),
+ce qui évite de ré-analyser les dates à chaque chargement. Chaque série est
+découpée en partitions mensuelles décrites par un petit manifeste JSON :
+
+    production_data_30min.csv              ← export CSV ';' (compatibilité)
+    production_data_30min_partitions/
+        manifest.json                      ← bornes et nombre de lignes par mois
+        2025-03.parquet
+        2025-04.parquet
+        ...
+
+Une mise à jour quotidienne ne réécrit que la partition du mois concerné
+(et complète l'export CSV en fin de fichier) ; une lecture sur une plage
+de dates n'ouvre que les partitions qui la recouvrent. Chaque écriture met
+aussi à jour l'index de couverture journalier (common.coverage).
+
+Le manifeste enregistre l'empreinte de contenu du CSV écrit avec les
+partitions : tant qu'elle ne correspond pas au CSV présent sur le disque
+(CSV modifié ou versionné sans ses partitions), le CSV fait foi et les
+partitions sont reconstruites avant toute lecture ou mise à jour.
+
+Le backend est choisi via la variable d'environnement STORAGE_BACKEND
+("parquet" par défaut, "feather" ou "csv").
+"""
+
+import importlib.util
+import json
+import os
+import shutil
+from os import getenv
+from pathlib import Path
+
+import pandas as pd
+
+from common.coverage import csv_fingerprint, same_content, update_coverage
+
+
+DEFAULT_BACKEND = "parquet"
+VALUE_DTYPE = "float32"
+PARTITION_FREQ = "M"
+MANIFEST_NAME = "manifest.json"
+CSV_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+# ------------------------------------------------------
+# 🧱 Normalisation des séries
+# ------------------------------------------------------
+
+def normalize_series_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convertit un DataFrame de série temporelle vers la forme typée du stockage.
+
+    Paramètre :
+        df (pd.DataFrame) : données avec une colonne ou un index 'datetime'
+
+    Retour :
+        pd.DataFrame : index DatetimeIndex 'datetime' trié (doublons : dernière
+                       valeur conservée), colonnes numériques en float32
+    """
+    if "datetime" in df.columns:
+        df = df.set_index("datetime")
+
+    values = df.apply(pd.to_numeric, errors = "coerce").astype(VALUE_DTYPE)
+    values.index = pd.DatetimeIndex(pd.to_datetime(
+        arg = df.index,
+        errors = "coerce"), name = "datetime")
+    values = values[values.index.notna()]
+    values = values[~values.index.duplicated(keep = "last")]
+    return values.sort_index()
+
+
+def _read_csv_series(csv_path: Path) -> pd.DataFrame:
+    """Lit un CSV ';' contenant une colonne 'datetime' et le normalise."""
+    df = pd.read_csv(
+        filepath_or_buffer = csv_path,
+        sep = ";")
+    return normalize_series_frame(df)
+
+
+# ------------------------------------------------------
+# 🔌 Backends de stockage
+# ------------------------------------------------------
+
+class CsvBackend:
+    """Stockage texte ';' (historique, sans fichier binaire)."""
+
+    name = "csv"
+    suffix = ".csv"
+
+    def read(self, path: Path) -> pd.DataFrame:
+        return _read_csv_series(path)
+
+    def write(self, df: pd.DataFrame, path: Path, encoding: str = "utf-8") -> None:
+        df.to_csv(
+            path_or_buf = path,
+            sep = ";",
+            index_label = "datetime",
+            date_format = CSV_DATE_FORMAT,
+            encoding = encoding)
+
+
+class ParquetBackend:
+    """Stockage colonnaire Parquet (via pyarrow)."""
+
+    name = "parquet"
+    suffix = ".parquet"
+
+    def read(self, path: Path) -> pd.DataFrame:
+        df = pd.read_parquet(path)
+        return df.set_index("datetime") if "datetime" in df.columns else df
+
+    def write(self, df: pd.DataFrame, path: Path) -> None:
+        df.reset_index().to_parquet(
+            path,
+            index = False)
+
+
+class FeatherBackend:
+    """Stockage colonnaire Feather / Arrow IPC (lecture quasi sans copie)."""
+
+    name = "feather"
+    suffix = ".feather"
+
+    def read(self, path: Path) -> pd.DataFrame:
+        df = pd.read_feather(path)
+        return df.set_index("datetime")
+
+    def write(self, df: pd.DataFrame, path: Path) -> None:
+        df.reset_index().to_feather(path)
+
+
+BACKENDS = {
+    "csv": CsvBackend,
+    "parquet": ParquetBackend,
+    "feather": FeatherBackend,
+}
+
+
+def get_backend(name: str | None = None):
+    """
+    Retourne le backend de stockage demandé.
+
+    Paramètre :
+        name (str | None) : "parquet", "feather" ou "csv"
+                            (par défaut : variable STORAGE_BACKEND, sinon "parquet")
+
+    Retour :
+        backend de stockage ; retombe sur le CSV si pyarrow n'est pas installé
+    """
+    name = (name or getenv("STORAGE_BACKEND") or DEFAULT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de stockage inconnu : {name} (valeurs possibles : {list(BACKENDS)})")
+
+    if name != "csv" and importlib.util.find_spec("pyarrow") is None:
+        print(f"⚠️ pyarrow non installé — stockage {name} indisponible, utilisation du CSV.")
+        name = "csv"
+    return BACKENDS[name]()
+
+
+def partition_dir(csv_path: Path) -> Path:
+    """
+    Renvoie le dossier des partitions mensuelles associé à un CSV de série.
+
+    Paramètre :
+        csv_path (Path) : chemin du CSV d'export (ex. production_data_30min.csv)
+
+    Retour :
+        Path : dossier des partitions (ex. production_data_30min_partitions/)
+    """
+    csv_path = Path(csv_path)
+    return csv_path.with_name(f"{csv_path.stem}_partitions")
+
+
+# ------------------------------------------------------
+# 🗂️ Partitions mensuelles et manifeste
+# ------------------------------------------------------
+
+def load_manifest(csv_path: Path) -> dict | None:
+    """
+    Charge le manifeste des partitions d'une série.
+
+    Paramètre :
+        csv_path (Path) : chemin du CSV d'export de la série
+
+    Retour :
+        dict | None : manifeste, ou None si la série n'est pas encore partitionnée
+    """
+    manifest_path = partition_dir(csv_path) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    with open(
+        file = manifest_path,
+        mode = "r",
+        encoding = "utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(csv_path: Path, manifest: dict) -> None:
+    """Écrit le manifeste de façon atomique (fichier temporaire puis remplacement)."""
+    manifest_path = partition_dir(csv_path) / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(
+        file = tmp_path,
+        mode = "w",
+        encoding = "utf-8") as f:
+        json.dump(
+            obj = manifest,
+            fp = f,
+            indent = 2,
+            sort_keys = True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _new_manifest(backend) -> dict:
+    return {
+        "format_version": 1,
+        "backend": backend.name,
+        "partition_freq": PARTITION_FREQ,
+        "columns": [],
+        "partitions": {},
+    }
+
+
+def _partition_keys(index: pd.DatetimeIndex) -> pd.Index:
+    """Clé de partition ('YYYY-MM') de chaque horodatage."""
+    return index.to_period(PARTITION_FREQ).strftime("%Y-%m")
+
+
+def _write_partitions(df: pd.DataFrame, csv_path: Path, backend, manifest: dict) -> None:
+    """
+    Réécrit les partitions couvertes par df (df contient l'intégralité
+    des lignes de ces partitions) et met à jour le manifeste en mémoire.
+    """
+    folder = partition_dir(csv_path)
+    folder.mkdir(
+        parents = True,
+        exist_ok = True)
+
+    for key, part in df.groupby(_partition_keys(df.index), sort = True):
+        file_name = f"{key}{backend.suffix}"
+        backend.write(part, folder / file_name)
+        manifest["partitions"][key] = {
+            "file": file_name,
+            "start": part.index.min().isoformat(),
+            "end": part.index.max().isoformat(),
+            "rows": int(len(part)),
+        }
+    manifest["columns"] = list(df.columns)
+
+
+def _series_end(manifest: dict) -> pd.Timestamp | None:
+    """Dernier horodatage stocké d'après le manifeste."""
+    if not manifest["partitions"]:
+        return None
+    return max(pd.Timestamp(p["end"]) for p in manifest["partitions"].values())
+
+
+def _store_is_fresh(csv_path: Path, manifest: dict | None, backend) -> bool:
+    """
+    Vérifie que les partitions reflètent bien le CSV : même backend et même
+    empreinte de contenu que le CSV écrit avec elles (sinon le CSV a été
+    modifié ou récupéré sans ses partitions, et il fait foi).
+
+    Une empreinte identique dont seul le mtime diffère (copie, git checkout)
+    est mise à jour dans le manifeste en mémoire.
+    """
+    if manifest is None or manifest.get("backend") != backend.name:
+        return False
+    if not csv_path.exists():
+        return True
+    known = manifest.get("csv")
+    fingerprint = csv_fingerprint(csv_path, known)
+    if not same_content(fingerprint, known):
+        return False
+    manifest["csv"] = fingerprint
+    return True
+
+
+def _rebuild_partitions(df: pd.DataFrame, csv_path: Path, backend) -> dict:
+    """Reconstruit entièrement les partitions d'une série et renvoie le nouveau manifeste."""
+    folder = partition_dir(csv_path)
+    if folder.exists():
+        shutil.rmtree(folder)
+    manifest = _new_manifest(backend)
+    _write_partitions(df, csv_path, backend, manifest)
+    manifest["csv"] = csv_fingerprint(csv_path)
+    _save_manifest(csv_path, manifest)
+    update_coverage(csv_path, df.index, replace = True, fingerprint = manifest["csv"])
+    return manifest
+
+
+def _ensure_store(csv_path: Path, backend) -> dict | None:
+    """
+    Renvoie le manifeste à jour de la série, en (re)construisant les
+    partitions depuis le CSV si nécessaire.
+
+    Retour :
+        dict | None : manifeste, ou None si ni partitions ni CSV n'existent
+    """
+    manifest = load_manifest(csv_path)
+    known = manifest.get("csv") if manifest is not None else None
+    if _store_is_fresh(csv_path, manifest, backend):
+        if manifest["csv"] != known:
+            # Même contenu, nouveau mtime : évite de rehacher le CSV à la prochaine lecture
+            try:
+                _save_manifest(csv_path, manifest)
+            except OSError:
+                pass
+        return manifest
+    if not csv_path.exists():
+        return None
+
+    df = _read_csv_series(csv_path)
+    try:
+        return _rebuild_partitions(df, csv_path, backend)
+    except OSError as e:
+        print(f"⚠️ Impossible d'écrire les partitions de {csv_path} : {e}")
+        return None
+
+
+def partition_signatures(csv_path: Path, backend=None) -> dict:
+    """
+    Signature de chaque partition mensuelle d'une série (après mise à jour
+    des partitions si le CSV a changé), pour détecter les mois réécrits.
+
+    Paramètres :
+        csv_path (Path) : chemin du CSV d'export de la série
+        backend : backend de stockage (par défaut : get_backend())
+
+    Retour :
+        dict : {'YYYY-MM': [lignes, dernier horodatage, mtime ns, taille]} (vide si la série n'existe pas)
+    """
+    csv_path = Path(csv_path)
+    manifest = _ensure_store(csv_path, backend or get_backend())
+    if manifest is None:
+        return {}
+    folder = partition_dir(csv_path)
+    signatures = {}
+    for key, meta in manifest["partitions"].items():
+        stat = (folder / meta["file"]).stat()
+        signatures[key] = [meta["rows"], meta["end"], stat.st_mtime_ns, stat.st_size]
+    return signatures
+
+
+# ------------------------------------------------------
+# 📥 Lecture / écriture des séries
+# ------------------------------------------------------
+
+def _slice_series(df: pd.DataFrame, start, end) -> pd.DataFrame:
+    """Restreint une série triée à l'intervalle [start, end[."""
+    if start is None and end is None:
+        return df
+    lo = 0 if start is None else df.index.searchsorted(start, side = "left")
+    hi = len(df) if end is None else df.index.searchsorted(end, side = "left")
+    return df.iloc[lo:hi]
+
+
+def read_series(csv_path: Path,
+                backend=None,
+                start=None,
+                end=None) -> pd.DataFrame:
+    """
+    Charge une série resamplée depuis le stockage partitionné.
+
+    Seules les partitions qui recouvrent l'intervalle [start, end[ sont lues.
+    Si le CSV ne correspond plus à l'empreinte du manifeste (ou si les partitions
+    n'existent pas encore), il est analysé et les partitions sont reconstruites.
+
+    Paramètres :
+        csv_path (Path) : chemin du CSV d'export de la série
+        backend : backend de stockage (par défaut : get_backend())
+        start : borne de début incluse (None = début de la série)
+        end : borne de fin exclue (None = fin de la série)
+
+    Retour :
+        pd.DataFrame : série typée indexée par 'datetime'
+    """
+    csv_path = Path(csv_path)
+    backend = backend or get_backend()
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    manifest = _ensure_store(csv_path, backend)
+    if manifest is None:
+        if not csv_path.exists():
+            raise FileNotFoundError(f"🚫 Le fichier {csv_path} est introuvable.")
+        # Partitions non inscriptibles (ex. disque en lecture seule) : lecture du CSV
+        return _slice_series(_read_csv_series(csv_path), start, end)
+
+    folder = partition_dir(csv_path)
+    parts = []
+    for key in sorted(manifest["partitions"]):
+        meta = manifest["partitions"][key]
+        if start is not None and pd.Timestamp(meta["end"]) < start:
+            continue
+        if end is not None and pd.Timestamp(meta["start"]) >= end:
+            continue
+        parts.append(backend.read(folder / meta["file"]))
+
+    if not parts:
+        empty = pd.DataFrame(
+            columns = manifest["columns"],
+            index = pd.DatetimeIndex([], name = "datetime"),
+            dtype = VALUE_DTYPE)
+        return empty
+
+    df = pd.concat(objs = parts) if len(parts) > 1 else parts[0]
+    return _slice_series(df, start, end)
+
+
+def write_series(df: pd.DataFrame,
+                 csv_path: Path,
+                 backend=None,
+                 export_csv: bool = True,
+                 encoding: str = "utf-8") -> None:
+    """
+    Réécrit entièrement une série : partitions mensuelles et export CSV.
+
+    Paramètres :
+        df (pd.DataFrame) : série (colonne ou index 'datetime')
+        csv_path (Path) : chemin du CSV d'export de la série
+        backend : backend de stockage (par défaut : get_backend())
+        export_csv (bool) : écrit aussi l'export CSV ';'
+        encoding (str) : encodage de l'export CSV
+    """
+    csv_path = Path(csv_path)
+    backend = backend or get_backend()
+    df = normalize_series_frame(df)
+    csv_path.parent.mkdir(
+        parents = True,
+        exist_ok = True)
+
+    if export_csv:
+        CsvBackend().write(df, csv_path, encoding = encoding)
+    # Le manifeste est écrit après le CSV : il enregistre son empreinte
+    _rebuild_partitions(df, csv_path, backend)
+
+
+def append_series(df_new: pd.DataFrame,
+                  csv_path: Path,
+                  backend=None,
+                  encoding: str = "utf-8") -> None:
+    """
+    Ajoute de nouvelles lignes à une série stockée (les nouvelles valeurs
+    remplacent les anciennes pour un même horodatage).
+
+    Seules les partitions mensuelles touchées par les nouvelles lignes sont
+    relues et réécrites. L'export CSV est complété en fin de fichier lorsque
+    les nouvelles lignes sont postérieures à la série existante (cas d'une
+    mise à jour quotidienne) ; il n'est réécrit en entier que pour une
+    correction de données passées, à partir de partitions dont l'empreinte
+    du CSV a été vérifiée (sinon elles sont d'abord reconstruites depuis le CSV).
+
+    Paramètres :
+        df_new (pd.DataFrame) : nouvelles données (colonne ou index 'datetime')
+        csv_path (Path) : chemin du CSV d'export de la série
+        backend : backend de stockage (par défaut : get_backend())
+        encoding (str) : encodage de l'export CSV
+    """
+    csv_path = Path(csv_path)
+    backend = backend or get_backend()
+    df_new = normalize_series_frame(df_new)
+    if df_new.empty:
+        return
+
+    manifest = _ensure_store(csv_path, backend)
+    if manifest is None:
+        write_series(df_new, csv_path, backend, encoding = encoding)
+        return
+
+    previous_end = _series_end(manifest)
+    same_columns = list(df_new.columns) == manifest["columns"]
+
+    # Fusion avec les seules partitions touchées
+    folder = partition_dir(csv_path)
+    touched = []
+    for key in pd.unique(_partition_keys(df_new.index)):
+        meta = manifest["partitions"].get(key)
+        if meta is not None:
+            touched.append(backend.read(folder / meta["file"]))
+    df_touched = normalize_series_frame(pd.concat(objs = touched + [df_new]))
+    _write_partitions(df_touched, csv_path, backend, manifest)
+
+    # Export CSV : ajout en fin de fichier si possible, sinon réécriture
+    if previous_end is not None and same_columns and csv_path.exists() and df_new.index.min() > previous_end:
+        df_new.to_csv(
+            path_or_buf = csv_path,
+            sep = ";",
+            mode = "a",
+            header = False,
+            index_label = "datetime",
+            date_format = CSV_DATE_FORMAT,
+            encoding = encoding.replace("-sig", ""))
+    else:
+        parts = [backend.read(folder / manifest["partitions"][key]["file"])
+                 for key in sorted(manifest["partitions"])]
+        CsvBackend().write(pd.concat(objs = parts), csv_path, encoding = encoding)
+
+    previous_csv = manifest.get("csv")
+    manifest["csv"] = csv_fingerprint(csv_path)
+    _save_manifest(csv_path, manifest)
+    update_coverage(csv_path, df_new.index, fingerprint = manifest["csv"], previous = previous_csv)
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+common/tariffs.py
+
+Moteur de tarifs horo-saisonniers : heures pleines / heures creuses, règles
+par jour de la semaine et couleurs de jours (type Tempo), abonnement.
+
+Le contrat est déclaratif (JSON, par défaut data/conso/tariff_contract.json) :
+
+    {
+      "name": "Tempo",
+      "subscription_eur_per_month": 16.55,
+      "periods": [
+        {"name": "HC", "hours": [["22:00", "06:00"]]},
+        {"name": "HC", "weekdays": [6]}
+      ],
+      "default_period": "HP",
+      "day_start": "06:00",
+      "default_color": "bleu",
+      "colors": {"2025-01-09": "rouge", "2025-01-10": "blanc"},
+      "prices": {
+        "bleu":  {"HP": 0.1609, "HC": 0.1296},
+        "blanc": {"HP": 0.1894, "HC": 0.1486},
+        "rouge": {"HP": 0.7562, "HC": 0.1568}
+      }
+    }
+
+- "periods" : règles évaluées dans l'ordre (la première qui s'applique l'emporte) ;
+  "hours" liste des plages [début, fin[ (une plage peut passer minuit),
+  "weekdays" les jours concernés (0 = lundi) ; une règle sans "hours" couvre la journée.
+- "colors" : calendrier des couleurs de jours ; un jour tarifaire commence à
+  "day_start" (06:00 pour Tempo). Sans couleurs, "prices" est directement
+  {période: prix}.
+- "colors_file" (optionnel) : CSV ';' (colonnes date;color) complétant "colors".
+
+Le prix de chaque pas est obtenu par des masques NumPy et une indexation dans
+une matrice [couleur, période] : aucun appel Python par ligne, plusieurs années
+de données 30 min sont valorisées en quelques dizaines de millisecondes.
+
+Un pas est classé sur l'instant où il commence : pour des horodatages de fin
+d'intervalle (convention Enedis, label 'end'), le pas 21:30 → 22:00 horodaté
+22:00 reste en HP et le pas 05:30 → 06:00 reste en HC et dans le jour tarifaire
+précédent.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+
+DEFAULT_TARIFF_PATH = Path("data/conso/tariff_contract.json")
+
+NS_PER_MINUTE = 60 * 10**9
+MINUTES_PER_DAY = 24 * 60
+# Le 1970-01-01 (origine datetime64) est un jeudi
+_EPOCH_WEEKDAY = 3
+# Couleur implicite d'un contrat sans calendrier de couleurs
+_NO_COLOR = "*"
+
+
+# ---------------------------------------------------------------
+# 📄 Chargement du contrat
+# ---------------------------------------------------------------
+
+def _minutes(hhmm: str) -> int:
+    """Convertit 'HH:MM' en minutes depuis minuit ('24:00' = 1440)."""
+    hours, minutes = str(hhmm).split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def normalize_contract(contract: dict, base_dir: Path | None = None) -> dict:
+    """
+    Valide un contrat déclaratif et le compile en tableaux prêts pour le calcul vectorisé.
+
+    Paramètres :
+        contract (dict) : contrat (voir la docstring du module)
+        base_dir (Path | None) : dossier de référence pour "colors_file"
+
+    Retour :
+        dict : contrat compilé ('periods', 'colors', 'rules', 'price_matrix',
+               'calendar_days', 'calendar_codes', 'default_color', 'day_start',
+               'subscription_eur_per_month', 'name', 'fingerprint')
+    """
+    prices = contract["prices"]
+    if all(not isinstance(v, dict) for v in prices.values()):
+        prices = {_NO_COLOR: prices}
+
+    default_period = contract.get("default_period", "HP")
+    periods = [default_period]
+    for rule in contract.get("periods", []):
+        if rule["name"] not in periods:
+            periods.append(rule["name"])
+
+    colors = list(prices)
+    default_color = contract.get("default_color", colors[0])
+    if default_color not in colors:
+        raise ValueError(f"Couleur par défaut sans prix : {default_color}")
+
+    price_matrix = np.full((len(colors), len(periods)), np.nan)
+    for c, color in enumerate(colors):
+        for p, period in enumerate(periods):
+            if period not in prices[color]:
+                raise ValueError(f"Prix manquant pour la couleur '{color}' et la période '{period}'")
+            price_matrix[c, p] = float(prices[color][period])
+
+    rules = []
+    for rule in contract.get("periods", []):
+        windows = [(_minutes(start), _minutes(end)) for start, end in rule.get("hours", [["00:00", "24:00"]])]
+        weekdays = rule.get("weekdays")
+        rules.append({
+            "period": periods.index(rule["name"]),
+            "windows": windows,
+            "weekdays": None if weekdays is None else np.asarray(weekdays, dtype = np.int64),
+        })
+
+    calendar = dict(contract.get("colors", {}))
+    if contract.get("colors_file"):
+        colors_path = Path(contract["colors_file"])
+        if base_dir is not None and not colors_path.is_absolute():
+            colors_path = Path(base_dir) / colors_path
+        colors_df = pd.read_csv(colors_path, sep = ";")
+        calendar = {**dict(zip(colors_df["date"].astype(str), colors_df["color"])), **calendar}
+    unknown = set(calendar.values()) - set(colors)
+    if unknown:
+        raise ValueError(f"Couleurs de jours sans prix : {sorted(unknown)}")
+
+    calendar_days = pd.to_datetime(list(calendar)).to_numpy(dtype = "datetime64[D]").astype(np.int64)
+    calendar_codes = np.array([colors.index(c) for c in calendar.values()], dtype = np.int64)
+    order = np.argsort(calendar_days)
+
+    return {
+        "name": contract.get("name", "contrat"),
+        "periods": periods,
+        "colors": colors,
+        "rules": rules,
+        "price_matrix": price_matrix,
+        "calendar_days": calendar_days[order],
+        "calendar_codes": calendar_codes[order],
+        "default_color": colors.index(default_color),
+        "day_start": _minutes(contract.get("day_start", "00:00")),
+        "subscription_eur_per_month": float(contract.get("subscription_eur_per_month", 0.0)),
+        "fingerprint": hashlib.sha1(json.dumps(contract, sort_keys = True).encode("utf-8")).hexdigest(),
+    }
+
+
+def load_tariff_contract(tariff_path: str | Path | None = None) -> dict | None:
+    """
+    Charge et compile le contrat tarifaire s'il existe.
+
+    Paramètres :
+        tariff_path (str | Path | None) : fichier JSON du contrat (défaut : DEFAULT_TARIFF_PATH)
+
+    Retour :
+        dict | None : contrat compilé (voir normalize_contract), ou None sans fichier
+    """
+    resolved_path = Path(tariff_path) if tariff_path is not None else DEFAULT_TARIFF_PATH
+    if not resolved_path.exists():
+        return None
+    with open(
+        file = resolved_path,
+        mode = "r",
+        encoding = "utf-8") as f:
+        contract = json.load(f)
+    return normalize_contract(contract, base_dir = resolved_path.parent)
+
+
+# ---------------------------------------------------------------
+# 🧮 Valorisation vectorisée
+# ---------------------------------------------------------------
+
+def classify_slots(datetimes,
+                   tariff: dict,
+                   label: str = "start",
+                   interval: str = "30min") -> tuple[np.ndarray, np.ndarray]:
+    """
+    Détermine la couleur de jour et la période tarifaire de chaque pas, d'après son début.
+
+    Paramètres :
+        datetimes : array-like de datetime (ordre et résolution quelconques)
+        tariff (dict) : contrat compilé (normalize_contract)
+        label (str) : 'start' si les horodatages marquent le début du pas,
+                      'end' s'ils en marquent la fin (le pas commence `interval` plus tôt)
+        interval (str) : durée d'un pas ('30min', '1h'), utilisée avec label='end'
+
+    Retour :
+        tuple(np.ndarray, np.ndarray) : indices de couleur et de période (int64)
+    """
+    minutes = pd.to_datetime(datetimes).to_numpy(dtype = "datetime64[ns]").astype(np.int64) // NS_PER_MINUTE
+    if label == "end":
+        minutes = minutes - to_offset(interval).nanos // NS_PER_MINUTE
+    elif label != "start":
+        raise ValueError(f"Label d'horodatage non supporté : {label} ('start' ou 'end')")
+    day = minutes // MINUTES_PER_DAY
+    minute_of_day = minutes - day * MINUTES_PER_DAY
+    weekday = (day + _EPOCH_WEEKDAY) % 7
+
+    # Périodes : règles appliquées de la dernière à la première (la première l'emporte)
+    period = np.zeros(len(minutes), dtype = np.int64)
+    for rule in reversed(tariff["rules"]):
+        in_hours = np.zeros(len(minutes), dtype = bool)
+        for start, end in rule["windows"]:
+            if start <= end:
+                in_hours |= (minute_of_day >= start) & (minute_of_day < end)
+            else:
+                in_hours |= (minute_of_day >= start) | (minute_of_day < end)
+        if rule["weekdays"] is not None:
+            in_hours &= np.isin(weekday, rule["weekdays"])
+        period[in_hours] = rule["period"]
+
+    # Couleurs : jour tarifaire décalé de day_start, recherché dans le calendrier trié
+    color = np.full(len(minutes), tariff["default_color"], dtype = np.int64)
+    calendar_days = tariff["calendar_days"]
+    if len(calendar_days):
+        tariff_day = (minutes - tariff["day_start"]) // MINUTES_PER_DAY
+        pos = np.minimum(np.searchsorted(calendar_days, tariff_day), len(calendar_days) - 1)
+        found = calendar_days[pos] == tariff_day
+        color[found] = tariff["calendar_codes"][pos[found]]
+    return color, period
+
+
+def tariff_prices(datetimes,
+                  tariff: dict,
+                  label: str = "start",
+                  interval: str = "30min") -> tuple[np.ndarray, np.ndarray]:
+    """
+    Prix (€/kWh) et libellé de période tarifaire de chaque pas.
+
+    Paramètres :
+        datetimes : array-like de datetime
+        tariff (dict) : contrat compilé (normalize_contract)
+        label, interval : convention d'horodatage (voir classify_slots)
+
+    Retour :
+        tuple(np.ndarray, np.ndarray) : prix (float64) et libellés ('HP', 'HC',
+                                        ou 'rouge HP'... avec des couleurs de jours)
+    """
+    color, period = classify_slots(datetimes, tariff, label, interval)
+    prices = tariff["price_matrix"][color, period]
+
+    labels = np.array([
+        period_name if color_name == _NO_COLOR else f"{color_name} {period_name}"
+        for color_name in tariff["colors"] for period_name in tariff["periods"]
+    ], dtype = object)
+    return prices, labels[color * len(tariff["periods"]) + period]
+
+
+def subscription_cost(nb_days: float, tariff: dict | None) -> float:
+    """
+    Coût de l'abonnement sur une durée donnée, au prorata des jours.
+
+    Paramètres :
+        nb_days (float) : durée de la période en jours
+        tariff (dict | None) : contrat compilé
+
+    Retour :
+        float : coût en euros (0 sans contrat)
+    """
+    if tariff is None:
+        return 0.0
+    return tariff["subscription_eur_per_month"] * 12 * max(float(nb_days), 0.0) / 365.25
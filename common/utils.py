@@ -10,6 +10,10 @@ import pandas as pd
 import zipfile
 import shutil
 import json
+import os
+
+from common.coverage import has_full_coverage
+from common.resampling import update_resampled_series
 
 # ------------------------------------------------------
 # ⏰ Gestion des dates
@@ -190,7 +194,7 @@ def clean_csv_columns(source_csv: Path, columns_map: dict) -> Path:
 
     # Écrasement du fichier source
     df_clean.to_csv(
-        filepath_or_buf = source_csv, 
+        path_or_buf = source_csv, 
         sep = ";", 
         index = False)
 
@@ -202,7 +206,10 @@ def append_csvs_with_resampling(csv_paths: list[Path],
                                 csv_1h: Path):
     """
     Ajoute plusieurs CSV bruts et met à jour uniquement
-    les fichiers resamplés 30 min et 1h par concaténation.
+    les créneaux touchés des séries resamplées 30 min et 1h.
+
+    Chaque créneau conserve un état partiel (common.resampling) : un créneau
+    complété par un lot ultérieur garde une moyenne exacte.
 
     Paramètres
     ----------
@@ -231,8 +238,7 @@ def append_csvs_with_resampling(csv_paths: list[Path],
             sep = ";")
         df["datetime"] = pd.to_datetime(
                                 arg = df["datetime"])
-        dfs.append(
-            object = df)
+        dfs.append(df)
 
     df_new = pd.concat(
         objs = dfs, 
@@ -240,66 +246,17 @@ def append_csvs_with_resampling(csv_paths: list[Path],
     df_new = df_new.set_index("datetime").sort_index()
 
     # -----------------------------------------------------------
-    # 2) Resampling des nouvelles données
-    # -----------------------------------------------------------
-    df_new_30min = (
-        df_new.resample("30min")
-        .mean(numeric_only = True)
-        .dropna()
-    )
-
-    df_new_1h = (
-        df_new.resample("1h")
-        .mean(numeric_only = True)
-        .dropna()
-    )
-    df_new_1h = df_new_1h[df_new_1h.index.minute == 0]
-
-    # -----------------------------------------------------------
-    # 3) Charger l'existant et concaténer
+    # 2) Resampling incrémental : seuls les créneaux touchés sont
+    #    recalculés à partir de leur état partiel (somme, nombre, min, max)
     # -----------------------------------------------------------
-
-    # ---- 30 min ----
-    if csv_30min.exists():
-        df_old_30 = pd.read_csv(
-            filepath_or_buffer = csv_30min, 
-            sep = ";", 
-            parse_dates = ["datetime"])
-        df_old_30 = df_old_30.set_index("datetime")
-        df_30 = pd.concat(
-            objs = [df_old_30, df_new_30min], 
-            ignore_index = True)
-        df_30 = df_30[~df_30.index.duplicated(keep = 'last')]  # supprime doublons
-        df_30 = df_30.sort_index()
-    else:
-        df_30 = df_new_30min
-
-    # ---- 1 heure ----
-    if csv_1h.exists():
-        df_old_1h = pd.read_csv(
-            filepath_or_buffer = csv_1h, 
-            sep = ";", 
-            parse_dates = ["datetime"])
-        df_old_1h = df_old_1h.set_index("datetime")
-        df_1h_final = pd.concat(
-            objs = [df_old_1h, df_new_1h], 
-            ignore_index = True)
-        df_1h_final = df_1h_final[~df_1h_final.index.duplicated(keep = 'last')]
-        df_1h_final = df_1h_final.sort_index()
-    else:
-        df_1h_final = df_new_1h
-
-    # -----------------------------------------------------------
-    # 4) Sauvegarde finale
-    # -----------------------------------------------------------
-    df_30.to_csv(
-        path_or_buf = csv_30min, 
-        sep = ";", 
-        index_label = "datetime")
-    df_1h_final.to_csv(
-        path_or_buf = csv_1h, 
-        sep = ";", 
-        index_label = "datetime")
+    update_resampled_series(
+        raw = df_new,
+        csv_path = csv_30min,
+        freq = "30min")
+    update_resampled_series(
+        raw = df_new,
+        csv_path = csv_1h,
+        freq = "1h")
 
     print(f"⏱️ Mise à jour du fichier 30 minutes : {csv_30min}")
     print(f"⏱️ Mise à jour du fichier 1 heure : {csv_1h}")
@@ -347,6 +304,10 @@ def resampled_data_exists_for_date(target_date: datetime,
     Vérifie si les données resamplées (30 min et 1h) existent déjà
     pour la journée target_date dans les fichiers csv_30min et csv_1h.
 
+    La vérification interroge l'index de couverture (common.coverage)
+    au lieu de relire les fichiers : son coût ne dépend pas de la
+    longueur de l'historique.
+
     Règles :
     - 30 min : il doit exister au moins les 24 timestamps horaires (HH:00)
     - 1h : les 24 timestamps horaires doivent exister (HH:00)
@@ -365,58 +326,14 @@ def resampled_data_exists_for_date(target_date: datetime,
     bool
         True si les données existent déjà, False sinon
     """
-
-    day_start = datetime.combine(
-        date = target_date.date(), 
-        time = datetime.min.time())
-    expected_hours = [day_start + timedelta(
-                                    hours = h) for h in range(24)]
-
-    # -----------------------------------------------------------
-    # Vérification fichier 1h
-    # -----------------------------------------------------------
-    if not csv_1h.exists():
-        return False
-
-    df_1h = pd.read_csv(
-        filepath_or_buffer = csv_1h, 
-        sep = ";", 
-        parse_dates = ["datetime"])
-    df_day_1h = df_1h[(df_1h["datetime"].dt.date == target_date.date())]
-
-    if df_day_1h.empty:
-        return False
-
-    # Timestamps attendus : toutes les heures
-    found_hours = set(df_day_1h["datetime"])
-    if not all(h in found_hours for h in expected_hours):
-        return False
-
-    # -----------------------------------------------------------
-    # Vérification fichier 30 min
-    # -----------------------------------------------------------
-    if not csv_30min.exists():
-        return False
-
-    df_30 = pd.read_csv(
-        filepath_or_buffer = csv_30min, 
-        sep = ";", 
-        parse_dates = ["datetime"])
-    df_day_30 = df_30[(df_30["datetime"].dt.date == target_date.date())]
-
-    if df_day_30.empty:
-        return False
-
-    # Vérifier qu'il existe au moins une donnée par heure
-    hours_with_data = set(df_day_30["datetime"].dt.hour)
-
-    expected_hours_set = set(range(
-                                stop = 24))
-    if not expected_hours_set.issubset(
-                                s = hours_with_data):
-        return False
-
-    return True
+    return (has_full_coverage(
+                csv_path = csv_1h,
+                day = target_date,
+                interval = "1h")
+            and has_full_coverage(
+                csv_path = csv_30min,
+                day = target_date,
+                interval = "30min"))
 
 
 # ------------------------------------------------------
@@ -442,6 +359,104 @@ def add_file_to_zip(tmp_file: Path, zip_path: Path, arcname: str):
 
     print(f"📦 Fichier ajouté dans l’archive sous : {arcname}")
 
+class ZipArchiveWriter:
+    """
+    Écrit un lot de fichiers dans une archive ZIP en une seule passe.
+
+    L'archive n'est ouverte qu'une fois par exécution : la liste des membres
+    est lue à l'ouverture puis tenue à jour en mémoire, et les membres sont
+    écrits directement depuis la mémoire (writestr), sans fichier temporaire.
+
+    Les écritures se font dans une copie de l'archive (créée au premier ajout)
+    qui remplace l'original de façon atomique (os.replace) à la fermeture :
+    un arrêt brutal laisse l'archive précédente intacte.
+
+    Exemple :
+        with ZipArchiveWriter(zip_path) as archive:
+            if "conso_1h/conso_2025-03-25.json" not in archive:
+                archive.writestr("conso_1h/conso_2025-03-25.json", contenu)
+    """
+
+    def __init__(self, zip_path: Path):
+        self.zip_path = Path(zip_path)
+        self.names = set(extract_zip_file_list(
+                            zip_path = self.zip_path))
+        self._tmp_path = self.zip_path.with_name(self.zip_path.name + ".tmp")
+        self._zipf = None
+
+    def __contains__(self, arcname: str) -> bool:
+        return arcname in self.names
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Les membres déjà écrits sont complets : ils sont conservés même en cas d'erreur
+        self.close()
+
+    def _open(self) -> zipfile.ZipFile:
+        if self._zipf is None:
+            self.zip_path.parent.mkdir(
+                parents = True,
+                exist_ok = True)
+            if self.zip_path.exists():
+                shutil.copyfile(self.zip_path, self._tmp_path)
+            else:
+                self._tmp_path.unlink(missing_ok = True)
+            self._zipf = zipfile.ZipFile(self._tmp_path, "a", zipfile.ZIP_DEFLATED)
+        return self._zipf
+
+    def writestr(self, arcname: str, data: bytes | str) -> bool:
+        """
+        Ajoute un membre depuis la mémoire.
+
+        Paramètres :
+            arcname (str) : chemin/nom du fichier DANS le ZIP
+            data (bytes | str) : contenu du membre (str encodé en UTF-8)
+
+        Retour :
+            bool : True si le membre a été ajouté, False s'il existait déjà
+        """
+        if arcname in self.names:
+            return False
+        self._open().writestr(arcname, data)
+        self.names.add(arcname)
+        print(f"📦 Fichier ajouté dans l’archive sous : {arcname}")
+        return True
+
+    def read(self, arcname: str) -> bytes | None:
+        """Contenu d'un membre (y compris ajouté pendant l'exécution), ou None s'il est absent."""
+        if arcname not in self.names:
+            return None
+        if self._zipf is not None:
+            return self._zipf.read(arcname)
+        with zipfile.ZipFile(self.zip_path, "r") as zipf:
+            return zipf.read(arcname)
+
+    def write(self, filename: Path, arcname: str) -> bool:
+        """Ajoute un fichier local sous le nom arcname (ignoré s'il existe déjà)."""
+        if arcname in self.names:
+            return False
+        self._open().write(
+            filename = filename,
+            arcname = arcname)
+        self.names.add(arcname)
+        print(f"📦 Fichier ajouté dans l’archive sous : {arcname}")
+        return True
+
+    def close(self) -> None:
+        """Finalise l'archive temporaire et remplace l'original (aucune action sans ajout)."""
+        if self._zipf is None:
+            return
+        zipf, self._zipf = self._zipf, None
+        try:
+            zipf.close()
+        except Exception:
+            self._tmp_path.unlink(missing_ok = True)
+            raise
+        os.replace(self._tmp_path, self.zip_path)
+
+
 def extract_zip_file_list(zip_path: Path) -> list[str]:
     """
     Liste les fichiers contenus dans une archive ZIP.
@@ -5,9 +5,10 @@ Client pour l'API Conso (consommation électrique).
 
 Fonctions principales :
 - Vérifie si un JSON pour une date est déjà dans l'archive
-- Télécharge les données 1h ou 30min si manquantes
+- Télécharge les données 1h ou 30min si manquantes ; en mode « un seul passage »,
+  la courbe 30 min est téléchargée une fois et la série 1h en est dérivée localement
 - Concatène les CSV
-- Archive les JSON et supprime les fichiers locaux
+- Archive les JSON directement dans le ZIP (une seule ouverture par exécution)
 
 Utilise :
 - config.py pour token, PRM et chemins de fichiers
@@ -15,21 +16,28 @@ Utilise :
 """
 
 import pandas as pd
+import json
 from datetime import datetime, timedelta
 import time
+import zipfile
 import requests
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 from dotenv import load_dotenv
 from os import getenv
 
 from conso_api_tools import config
-from common.utils import ensure_folder, add_file_to_zip, save_json, check_json_in_archive, format_date_to_str, format_str_to_date, next_day
+from common.http_client import HttpClient, lazy_client
+from common.storage import append_series, read_series, write_series
+from common.utils import ensure_folder, ZipArchiveWriter, format_date_to_str, format_str_to_date, next_day
 
 # -------------------------------
 # ⚙️ CONFIGURATION DES DOSSIERS
 # -------------------------------
 
+# Fuseau des horodatages Enedis (jours de changement d'heure)
+TIMEZONE = "Europe/Paris"
+
 ensure_folder(config.FOLDER_1H)
 ensure_folder(config.FOLDER_30MIN)
 
@@ -66,6 +74,27 @@ def _get_headers(token: Optional[str] = None) -> dict:
     }
 
 
+def _build_http_client() -> HttpClient:
+    """
+    Crée le client HTTP de l'API Conso.
+
+    L'adaptateur ne retente que les erreurs de connexion : les codes 429/5xx
+    sont gérés par download_interval_data, qui journalise chaque tentative.
+    """
+    return HttpClient(
+        headers={
+            "Accept": "application/json",
+            "User-Agent": "github.com/gguillaume/conso-prod-elec",
+            "From": "contact@example.com",
+        },
+        status_forcelist=(),
+        allowed_methods=("GET",))
+
+
+# Client HTTP partagé (keep-alive) pour tous les appels à l'API Conso
+get_http_client = lazy_client(_build_http_client)
+
+
 def _extract_day_from_value(value: object) -> Optional[str]:
     """Extrait la date au format YYYY-MM-DD depuis une valeur de type date."""
     if isinstance(value, datetime):
@@ -81,17 +110,48 @@ def _extract_day_from_value(value: object) -> Optional[str]:
     return None
 
 
+def _reading_day(item: dict) -> Optional[str]:
+    """
+    Jour d'une lecture : celui du début de son intervalle si 'interval_length' est connu.
+
+    Les horodatages Enedis marquent la fin de l'intervalle : la lecture de 00:00
+    clôt la dernière demi-heure de la veille et appartient à cette journée.
+    """
+    length = item.get("interval_length")
+    if length:
+        try:
+            start = pd.Timestamp(item.get("date")) - pd.to_timedelta([length])[0]
+            return start.strftime("%Y-%m-%d")
+        except (TypeError, ValueError):
+            pass
+    return _extract_day_from_value(item.get("date"))
+
+
 def group_interval_readings_by_day(data: dict) -> dict[str, list[dict]]:
-    """Regroupe les lectures d'un payload par jour afin de les archiver par date."""
+    """
+    Regroupe les lectures d'un payload par jour afin de les archiver par date.
+
+    Une lecture portant 'interval_length' est rattachée au jour où commence son
+    intervalle ; sinon au jour de son horodatage.
+    """
     grouped: dict[str, list[dict]] = {}
     for item in data.get("interval_reading", []):
-        day = _extract_day_from_value(item.get("date"))
+        day = _reading_day(item)
         if day is None:
             continue
         grouped.setdefault(day, []).append(item)
     return grouped
 
 
+def interval_url(date_str: str, end_date_str: Optional[str] = None) -> str:
+    """
+    URL de la courbe de charge entre deux dates (fin exclue ; par défaut le lendemain de date_str).
+    """
+    if end_date_str is None:
+        end_date_str = format_date_to_str(next_day(format_str_to_date(date_str)))
+    return f"{config.API_BASE_URL}?prm={config.LINKY_PRM}&start={date_str}&end={end_date_str}"
+
+
 def download_interval_data(
     date_str: str,
     interval: str = "30min",
@@ -114,12 +174,12 @@ def download_interval_data(
     if end_date_str is None:
         end_date_str = format_date_to_str(next_day(format_str_to_date(date_str)))
 
-    url = f"{config.API_BASE_URL}?prm={config.LINKY_PRM}&start={date_str}&end={end_date_str}"
+    url = interval_url(date_str, end_date_str)
     response = None
 
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, headers=_get_headers(), timeout=30)
+            response = get_http_client().get(url, headers=_get_headers(), timeout=30)
             response.raise_for_status()
             data = response.json()
             if "interval_reading" not in data:
@@ -152,7 +212,7 @@ def download_interval_data(
 
 def append_to_csv(data: dict, csv_file: Path):
     """
-    Concatène les valeurs JSON dans le CSV correspondant.
+    Concatène les valeurs JSON dans la série stockée correspondante.
 
     Paramètres :
     ------------
@@ -161,9 +221,10 @@ def append_to_csv(data: dict, csv_file: Path):
 
     Détails :
     ---------
+        - Passe par le stockage typé (common.storage) : fichier binaire + export CSV.
         - Utilise le séparateur ';' pour rester cohérent avec les fichiers de production.
-        - Ajoute les données sans réécrire l'en-tête si le fichier existe déjà.
-        - Force l'encodage UTF-8 avec BOM pour compatibilité Windows.
+        - Les valeurs déjà présentes pour un même horodatage sont remplacées.
+        - Force l'encodage UTF-8 avec BOM de l'export CSV pour compatibilité Windows.
     """
     rows = []
     for item in data.get("interval_reading", []):
@@ -175,30 +236,155 @@ def append_to_csv(data: dict, csv_file: Path):
         return
 
     df = pd.DataFrame(rows)
-    if csv_file.exists():
-        df.to_csv(
-            csv_file,
-            mode="a",
-            header=False,
-            index=False,
-            sep=";",
-            encoding="utf-8-sig")
+    append_series(df, csv_file, encoding="utf-8-sig")
+
+
+def derive_hourly_series(readings: pd.DataFrame) -> pd.Series:
+    """
+    Agrège des lectures de courbe de charge (30 min) en puissances moyennes horaires.
+
+    Chaque lecture est une puissance moyenne (W) sur l'intervalle qui se termine
+    à 'date' (convention Enedis) et dure 'interval_length' (30 min par défaut).
+    Les lectures sont ramenées au début de leur intervalle avant d'être rangées
+    par heure ; l'énergie de chaque heure est la somme des énergies de ses
+    intervalles (W × durée), si bien que la valeur horaire est la puissance
+    moyenne sur l'heure, même si des lectures de durées différentes se mélangent.
+    Les heures incomplètes sont écartées ; une lecture présente deux fois (même
+    fin d'intervalle) n'est comptée qu'une fois.
+
+    Paramètres :
+        readings (pd.DataFrame) : colonnes 'date', 'value' et éventuellement 'interval_length'
+
+    Retour :
+        pd.Series : puissance moyenne (W) par heure complète, indexée par la fin de
+                    l'heure (même convention que les lectures)
+    """
+    dates = readings["date"].astype(str)
+    if dates.str.contains(r"(?:[+-]\d{2}:?\d{2}|Z)$").any():
+        # Horodatages avec décalage (éventuellement mélangés un jour de changement d'heure)
+        ends = pd.to_datetime(dates, format="ISO8601", utc=True).dt.tz_convert(TIMEZONE)
+    else:
+        ends = pd.to_datetime(dates, format="ISO8601")
+    unique = ~ends.duplicated(keep="last").to_numpy()
+    readings, ends = readings.loc[unique], ends.loc[unique]
+    if "interval_length" in readings.columns:
+        lengths = pd.to_timedelta(readings["interval_length"].fillna("PT30M"))
+    else:
+        lengths = pd.Series(pd.Timedelta(30, unit="min"), index=readings.index)
+    minutes = lengths.dt.total_seconds().to_numpy() / 60
+    watts = pd.to_numeric(readings["value"], errors="coerce").to_numpy(dtype="float64")
+
+    starts = ends - lengths
+    if starts.dt.tz is not None:
+        # Arrondi en UTC : pas d'heure ambiguë au passage à l'heure d'hiver
+        starts = starts.dt.tz_convert("UTC").dt.floor("h").dt.tz_convert(starts.dt.tz)
     else:
-        df.to_csv(
-            csv_file,
-            index=False,
-            sep=";",
-            encoding="utf-8-sig")
+        starts = starts.dt.floor("h")
+    per_hour = pd.DataFrame({"energy_wh": watts * minutes / 60, "minutes": minutes}).groupby(
+        pd.DatetimeIndex(starts)).sum(min_count=1)
+    per_hour = per_hour[(per_hour["minutes"] == 60) & per_hour["energy_wh"].notna()]
+    return pd.Series(per_hour["energy_wh"].to_numpy(),
+                     index=pd.DatetimeIndex(per_hour.index) + pd.Timedelta(1, unit="h"))
+
+
+def derive_hourly_payload(data: dict) -> dict:
+    """
+    Dérive un payload horaire d'un payload de courbe de charge plus fine (30 min).
+
+    Paramètres :
+        data (dict) : payload JSON renvoyé par l'API ('interval_reading')
+
+    Retour :
+        dict : payload de même structure avec une lecture par heure complète
+               (voir derive_hourly_series ; horodatée à la fin de l'heure,
+               'interval_length' = 'PT60M')
+    """
+    hourly_payload = {key: value for key, value in data.items() if key != "interval_reading"}
+    readings = pd.DataFrame(data.get("interval_reading", []))
+    if readings.empty:
+        hourly_payload["interval_reading"] = []
+        return hourly_payload
+
+    hourly = derive_hourly_series(readings)
+    hourly_payload["interval_reading"] = [
+        {"value": round(float(energy), 3), "date": end.isoformat(sep=" "), "interval_length": "PT60M"}
+        for end, energy in hourly.items()
+    ]
+    return hourly_payload
+
+
+def _hourly_payload_for_day(date_str: str, read: Callable[[str], Optional[bytes]]) -> Optional[dict]:
+    """
+    Payload horaire d'une journée dérivé des JSON 30 min archivés.
+
+    Le JSON du lendemain est ajouté : selon l'ancienne répartition par jour,
+    la lecture de 00:00 qui clôt la dernière demi-heure y était archivée.
+
+    Paramètres :
+        date_str (str) : journée au format 'YYYY-MM-DD'
+        read : lecture d'un membre de l'archive (None s'il est absent)
+
+    Retour :
+        dict | None : payload horaire de la journée, ou None sans JSON 30 min archivé
+    """
+    content = read(f"conso_30min/conso_{date_str}.json")
+    if content is None:
+        return None
+    data = json.loads(content)
+    readings = list(data.get("interval_reading", []))
+    next_content = read(f"conso_30min/conso_{format_date_to_str(next_day(format_str_to_date(date_str)))}.json")
+    if next_content is not None:
+        readings += json.loads(next_content).get("interval_reading", [])
+
+    hourly = derive_hourly_payload({**data, "interval_reading": readings})
+    hourly["interval_reading"] = group_interval_readings_by_day(hourly).get(date_str, [])
+    return hourly
+
 
+def rebuild_hourly_series() -> int:
+    """
+    Réécrit entièrement la série 1h en la dérivant de la série 30 min stockée.
+
+    Migration des séries 1h antérieures au mode « un seul passage » (lectures
+    30 min brutes) : après réécriture, la série ne contient que des puissances
+    moyennes horaires, horodatées à la fin de l'heure.
+
+    Retour :
+        int : nombre d'heures écrites
+    """
+    series = read_series(config.CSV_30MIN)
+    if series.empty:
+        return 0
+    hourly = derive_hourly_series(pd.DataFrame({
+        "date": series.index,
+        "value": series["consommation"].to_numpy(dtype="float64"),
+    }))
+    write_series(pd.DataFrame({"datetime": hourly.index, "consommation": hourly.round(3).to_numpy()}),
+                 config.CSV_1H, encoding="utf-8-sig")
+    print(f"♻️ Série 1h reconstruite depuis la série 30 min : {len(hourly)} heures")
+    return len(hourly)
+
+
+def _archive_interval_payloads(data: dict, interval: str, csv_file: Path, archive: ZipArchiveWriter) -> int:
+    """
+    Archive les lectures d'un payload par jour dans le ZIP et dans le CSV.
+
+    Paramètres :
+        data (dict) : payload JSON renvoyé par l'API
+        interval (str) : '30min' ou '1h'
+        csv_file (Path) : série à mettre à jour
+        archive (ZipArchiveWriter) : archive ouverte pour l'exécution en cours
 
-def _archive_interval_payloads(data: dict, interval: str, csv_file: Path, folder: Path) -> int:
-    """Archive les lectures d'un payload par jour dans le ZIP et dans le CSV."""
+    Retour :
+        int : nombre de journées ajoutées
+    """
     grouped = group_interval_readings_by_day(data)
     saved_count = 0
     interval_folder_name = "conso_30min" if interval == "30min" else "conso_1h"
 
     for date_str, items in sorted(grouped.items()):
-        if check_json_in_archive(zip_path=config.ZIP_FILE, date_str=date_str, interval_folder=interval_folder_name):
+        arcname = f"{interval_folder_name}/conso_{date_str}.json"
+        if arcname in archive:
             continue
 
         day_payload = {
@@ -206,26 +392,68 @@ def _archive_interval_payloads(data: dict, interval: str, csv_file: Path, folder
         }
         day_payload["interval_reading"] = items
 
-        json_path = save_json(day_payload, date_str, folder)
         append_to_csv(day_payload, csv_file)
         print(f"🧾 Données ajoutées à {csv_file} pour le {date_str}")
 
-        add_file_to_zip(
-            tmp_file=json_path,
-            zip_path=config.ZIP_FILE,
-            arcname=f"{interval_folder_name}/conso_{date_str}.json"
-        )
-        json_path.unlink()
-        print(f"✅ {json_path.name} archivé et supprimé localement")
+        archive.writestr(arcname, json.dumps(day_payload, ensure_ascii=False, indent=2))
         saved_count += 1
 
     return saved_count
 
 
+def _archive_all_intervals(data: dict, archive: ZipArchiveWriter) -> int:
+    """
+    Archive un payload 30 min et la série horaire qui en est dérivée.
+
+    Retour :
+        int : nombre de journées ajoutées (30 min et 1h confondus)
+    """
+    saved_count = _archive_interval_payloads(data, "30min", config.CSV_30MIN, archive)
+    saved_count += _archive_interval_payloads(derive_hourly_payload(data), "1h", config.CSV_1H, archive)
+    return saved_count
+
+
+def fetch_and_archive_day(date_obj: datetime, archive: Optional[ZipArchiveWriter] = None) -> bool:
+    """
+    Met à jour les archives 30 min et 1h d'une journée avec une seule requête API.
+
+    La courbe 30 min est téléchargée une fois ; la série horaire en est dérivée
+    (derive_hourly_payload). Si seule l'archive 1h manque, elle est dérivée des
+    JSON 30 min déjà archivés, sans appel à l'API.
+
+    Paramètres :
+        date_obj (datetime) : date ciblée
+        archive (ZipArchiveWriter | None) : archive ouverte pour l'exécution en cours ;
+                                            sinon config.ZIP_FILE est ouvert pour cette seule journée
+
+    Retour :
+        bool : True si de nouvelles journées ont été archivées
+    """
+    if archive is None:
+        with ZipArchiveWriter(config.ZIP_FILE) as single_archive:
+            return fetch_and_archive_day(date_obj, single_archive)
+
+    date_str = format_date_to_str(date_obj)
+    member_30min = f"conso_30min/conso_{date_str}.json"
+    member_1h = f"conso_1h/conso_{date_str}.json"
+
+    if member_30min in archive and member_1h in archive:
+        print(f"📂 Archives 30min et 1h déjà présentes pour le {date_str}, pas de téléchargement.")
+        return False
+    if member_30min in archive:
+        hourly = _hourly_payload_for_day(date_str, archive.read)
+        return _archive_interval_payloads(hourly, "1h", config.CSV_1H, archive) > 0
+
+    data = download_interval_data(date_str, "30min")
+    if data is None:
+        return False
+    return _archive_all_intervals(data, archive) > 0
+
+
 def fetch_and_archive(date_obj: datetime, interval: str):
     """
     Télécharge les données si elles ne sont pas déjà archivées,
-    les ajoute au CSV et au ZIP, puis supprime le JSON local.
+    puis les ajoute au CSV et au ZIP.
 
     Paramètres :
         date_obj (datetime) : date ciblée
@@ -235,22 +463,20 @@ def fetch_and_archive(date_obj: datetime, interval: str):
         bool : True si une requête API a été effectuée, False sinon
     """
     date_str = format_date_to_str(date_obj)
-    folder = config.FOLDER_30MIN if interval == "30min" else config.FOLDER_1H
     csv_file = config.CSV_30MIN if interval == "30min" else config.CSV_1H
     interval_folder_name = "conso_30min" if interval == "30min" else "conso_1h"
     arcname = f"{interval_folder_name}/conso_{date_str}.json"
 
-    if check_json_in_archive(zip_path=config.ZIP_FILE,
-                             date_str=date_str,
-                             interval_folder=interval_folder_name):
-        print(f"📂 {arcname} déjà présent dans l’archive, pas de téléchargement.")
-        return False
+    with ZipArchiveWriter(config.ZIP_FILE) as archive:
+        if arcname in archive:
+            print(f"📂 {arcname} déjà présent dans l’archive, pas de téléchargement.")
+            return False
 
-    data = download_interval_data(date_str, interval)
-    if data is None:
-        return False
+        data = download_interval_data(date_str, interval)
+        if data is None:
+            return False
 
-    saved_count = _archive_interval_payloads(data, interval, csv_file, folder)
+        saved_count = _archive_interval_payloads(data, interval, csv_file, archive)
     return saved_count > 0
 
 
@@ -262,25 +488,85 @@ def fetch_range_and_archive(
     chunk_days: int = 7,
     request_delay_seconds: float = 1.0,
 ):
-    """Télécharge l'historique d'une plage de dates en requêtes groupées par lots de plusieurs jours."""
+    """
+    Télécharge l'historique d'une plage de dates en requêtes groupées par lots de plusieurs jours.
+
+    L'archive ZIP est ouverte une seule fois pour toute la plage et remplacée
+    atomiquement à la fin. La date de fin de l'API étant exclue, chaque lot
+    [début, fin] est demandé jusqu'au lendemain de sa fin.
+    """
     current_start = start_date_obj
     downloaded_any = False
+    csv_file = config.CSV_30MIN if interval == "30min" else config.CSV_1H
 
-    while current_start <= end_date_obj:
-        current_end = min(current_start + timedelta(days=chunk_days - 1), end_date_obj)
-        start_str = format_date_to_str(current_start)
-        end_str = format_date_to_str(current_end)
-        print(f"📦 Requête API {interval} du {start_str} au {end_str} ({chunk_days} jours)")
+    with ZipArchiveWriter(config.ZIP_FILE) as archive:
+        while current_start <= end_date_obj:
+            current_end = min(current_start + timedelta(days=chunk_days - 1), end_date_obj)
+            start_str = format_date_to_str(current_start)
+            end_str = format_date_to_str(current_end)
+            print(f"📦 Requête API {interval} du {start_str} au {end_str} ({(current_end - current_start).days + 1} jours)")
 
-        data = download_interval_data(start_str, interval, end_date_str=end_str)
-        if data is not None:
-            folder = config.FOLDER_30MIN if interval == "30min" else config.FOLDER_1H
-            csv_file = config.CSV_30MIN if interval == "30min" else config.CSV_1H
-            downloaded_any = _archive_interval_payloads(data, interval, csv_file, folder) > 0 or downloaded_any
+            data = download_interval_data(start_str, interval, end_date_str=format_date_to_str(next_day(current_end)))
+            if data is not None:
+                downloaded_any = _archive_interval_payloads(data, interval, csv_file, archive) > 0 or downloaded_any
 
-        if request_delay_seconds > 0:
-            time.sleep(request_delay_seconds)
+            if request_delay_seconds > 0:
+                time.sleep(request_delay_seconds)
 
-        current_start = current_end + timedelta(days=1)
+            current_start = current_end + timedelta(days=1)
 
     return downloaded_any
+
+
+def rebuild_from_archive(start_date_obj: datetime, end_date_obj: datetime, interval: str) -> int:
+    """
+    Réintègre dans la série les journées déjà archivées d'une plage (aucun appel API).
+
+    Pour l'intervalle 1h, la série est dérivée des JSON 30 min archivés
+    (_hourly_payload_for_day) ; une journée absente de l'archive horaire y est
+    ajoutée. Le JSON 1h archivé ne sert que si le JSON 30 min manque.
+
+    Paramètres :
+        start_date_obj, end_date_obj (datetime) : bornes incluses de la plage
+        interval (str) : '30min' ou '1h'
+
+    Retour :
+        int : nombre de journées réintégrées
+    """
+    csv_file = config.CSV_30MIN if interval == "30min" else config.CSV_1H
+    interval_folder_name = "conso_30min" if interval == "30min" else "conso_1h"
+    rebuilt = 0
+
+    if not config.ZIP_FILE.exists():
+        return 0
+    derived = []
+    with zipfile.ZipFile(config.ZIP_FILE, "r") as archive:
+        names = set(archive.namelist())
+
+        def read(name: str) -> Optional[bytes]:
+            return archive.read(name) if name in names else None
+
+        current = start_date_obj
+        while current <= end_date_obj:
+            date_str = format_date_to_str(current)
+            arcname = f"{interval_folder_name}/conso_{date_str}.json"
+            hourly = _hourly_payload_for_day(date_str, read) if interval == "1h" else None
+            if hourly is not None and not hourly["interval_reading"]:
+                hourly = None
+            if hourly is not None and arcname not in names:
+                derived.append(hourly)
+            elif hourly is not None:
+                append_to_csv(hourly, csv_file)
+                rebuilt += 1
+            elif arcname in names:
+                append_to_csv(json.loads(archive.read(arcname)), csv_file)
+                rebuilt += 1
+            current = next_day(current)
+
+    if derived:
+        with ZipArchiveWriter(config.ZIP_FILE) as writer:
+            for payload in derived:
+                rebuilt += _archive_interval_payloads(payload, "1h", csv_file, writer)
+
+    print(f"♻️ {rebuilt} journée(s) {interval} réintégrée(s) depuis l'archive")
+    return rebuilt
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+async_client.py
+
+Client asynchrone (asyncio) de l'API Conso pour les backfills.
+
+Fonctionnalités :
+- Télécharge les plages 1h et 30min simultanément, avec un nombre de requêtes
+  en vol borné par un sémaphore
+- Unités combinées (COMBINED_INTERVAL) : une seule requête 30 min alimente les
+  archives et séries 30 min et 1h (série horaire dérivée localement)
+- Enchaîne les requêtes : la requête de la plage N+1 part pendant l'archivage de la plage N
+  (aucune pause fixe entre deux requêtes)
+- Respecte l'en-tête Retry-After des réponses 429 / 503 ; à défaut, backoff exponentiel
+- Archive les plages dans l'ordre chronologique de chaque intervalle, une seule
+  ouverture de l'archive ZIP pour toute l'exécution
+- Consigne l'état de chaque journée reçue dans le journal de backfill (common.job_journal) :
+  une journée absente de la réponse, ou incomplète dans les séries après archivage
+  (common.coverage), est consignée en échec et retentée plus tard
+
+Les requêtes passent par la session HTTP partagée (common.http_client, keep-alive)
+exécutée dans des threads (asyncio.to_thread) : aucune dépendance supplémentaire.
+
+🧩 Exemple d'utilisation :
+    python conso_api_tools/fetch_history.py --concurrency 4
+"""
+
+import asyncio
+import contextlib
+from collections import deque
+from datetime import date, datetime, timedelta
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+import requests
+
+from common.coverage import complete_mask, coverage_masks, day_range
+from common.gap_planner import COMBINED_INTERVAL
+from common.http_client import RETRY_STATUS_CODES
+from common.job_journal import JobJournal
+from common.utils import ZipArchiveWriter, format_date_to_str
+from conso_api_tools import config
+from conso_api_tools.api_client import (
+    _archive_all_intervals,
+    _archive_interval_payloads,
+    _get_headers,
+    get_http_client,
+    group_interval_readings_by_day,
+    interval_url,
+)
+
+
+# Attente maximale accordée à un Retry-After (secondes)
+MAX_RETRY_AFTER_SECONDS = 300
+
+
+def retry_after_seconds(response, default: float) -> float:
+    """
+    Délai demandé par l'en-tête Retry-After (secondes ou date HTTP), sinon `default`.
+
+    Paramètres :
+        response : réponse HTTP (requests.Response)
+        default (float) : délai à utiliser sans en-tête exploitable
+
+    Retour :
+        float : délai en secondes, borné à MAX_RETRY_AFTER_SECONDS
+    """
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return default
+        seconds = (retry_at - datetime.now(retry_at.tzinfo)).total_seconds()
+    return min(MAX_RETRY_AFTER_SECONDS, max(0.0, seconds))
+
+
+async def download_interval_data_async(
+    date_str: str,
+    interval: str = "30min",
+    *,
+    end_date_str: Optional[str] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    max_retries: int = 3,
+    retry_delay_seconds: float = 10,
+    sleep: Callable[[float], Awaitable] = asyncio.sleep,
+) -> dict | None:
+    """
+    Télécharge les données de consommation d'une plage, sans bloquer la boucle d'événements.
+
+    Le sémaphore n'est tenu que pendant la requête : une attente de nouvel essai
+    libère la place pour les autres plages.
+
+    Paramètres :
+        date_str (str) : date de début au format 'YYYY-MM-DD'
+        interval (str) : '30min' ou '1h'
+        end_date_str (str | None) : date de fin exclue (défaut : lendemain de date_str)
+        semaphore (asyncio.Semaphore | None) : limite de requêtes simultanées
+        max_retries (int) : nombre total de tentatives
+        retry_delay_seconds (float) : délai de base du backoff sans Retry-After
+        sleep : coroutine d'attente (remplaçable dans les tests)
+
+    Retour :
+        dict | None : données JSON renvoyées par l'API, ou None en cas d'échec définitif
+    """
+    url = interval_url(date_str, end_date_str)
+    label = f"{date_str} → {end_date_str}" if end_date_str else date_str
+
+    for attempt in range(max_retries):
+        response = None
+        try:
+            async with semaphore if semaphore is not None else contextlib.nullcontext():
+                response = await asyncio.to_thread(get_http_client().get, url, headers=_get_headers(), timeout=30)
+            if response.status_code in RETRY_STATUS_CODES and attempt < max_retries - 1:
+                wait = retry_after_seconds(response, default=min(60, retry_delay_seconds * 2 ** attempt))
+                print(f"⚠️ Erreur {response.status_code} pour {label} ({interval}). "
+                      f"Tentative {attempt + 2}/{max_retries} dans {wait:.0f}s...")
+                await sleep(wait)
+                continue
+            response.raise_for_status()
+            data = response.json()
+            if "interval_reading" not in data:
+                print(f"❌ Aucune donnée disponible pour {label} ({interval})")
+                return None
+            return data
+        except requests.exceptions.HTTPError as err:
+            print(f"💥 Erreur API définitive pour {label} ({interval}): {err}")
+            return None
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt < max_retries - 1:
+                wait = min(60, retry_delay_seconds * 2 ** attempt)
+                print(f"⚠️ Erreur de connexion/timeout pour {label}. Tentative {attempt + 2}/{max_retries} dans {wait:.0f}s...")
+                await sleep(wait)
+                continue
+            print(f"📡 Échec de connexion définitif pour {label}: {e}")
+            return None
+    return None
+
+
+def _as_datetime(day: date | datetime) -> datetime:
+    return day if isinstance(day, datetime) else datetime.combine(day, datetime.min.time())
+
+
+def _day_runs(days: np.ndarray, selected: np.ndarray) -> list[tuple[date, date]]:
+    """Plages (début, fin incluse) des journées sélectionnées consécutives."""
+    edges = np.diff(np.concatenate(([0], selected.astype(np.int8), [0])))
+    return [(days[lo].item(), days[hi - 1].item())
+            for lo, hi in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))]
+
+
+def _complete_days(interval: str, days: np.ndarray) -> np.ndarray:
+    """Indique pour chaque jour s'il est complet dans la ou les séries alimentées par l'intervalle."""
+    series = {"30min": config.CSV_30MIN, "1h": config.CSV_1H}
+    intervals = ("30min", "1h") if interval == COMBINED_INTERVAL else (interval,)
+    complete = np.ones(len(days), dtype=bool)
+    for name in intervals:
+        masks = coverage_masks(series[name], days, config.TIMESTAMP_LABEL, name)
+        complete &= complete_mask(masks, name)
+    return complete
+
+
+async def fetch_units_async(
+    units: list[dict],
+    *,
+    concurrency: int = config.API_CONCURRENCY,
+    download: Callable[..., Awaitable] = download_interval_data_async,
+    journal: Optional[JobJournal] = None,
+) -> dict:
+    """
+    Télécharge et archive des plages de consommation de façon concurrente.
+
+    Chaque intervalle est traité par sa propre file : au plus `concurrency` × 2
+    plages sont lancées en avance sur l'archivage, qui reste séquentiel et
+    chronologique (une seule écriture à la fois dans l'archive et les séries).
+
+    Paramètres :
+        units (list[dict]) : plages à télécharger ({'interval', 'start', 'end'} inclus,
+                             voir common.gap_planner ; 'interval' peut valoir COMBINED_INTERVAL)
+        concurrency (int) : nombre maximal de requêtes HTTP simultanées
+        download : coroutine de téléchargement (remplaçable dans les tests)
+        journal (JobJournal | None) : journal où consigner l'état de chaque plage
+
+    Retour :
+        dict : {'requests': plages téléchargées, 'archived_days': journées ajoutées,
+                'failed': [(intervalle, début, fin)] (plages en échec, absentes ou incomplètes)}
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    archive_lock = asyncio.Lock()
+    window = max(1, concurrency) * 2
+    summary = {"requests": 0, "archived_days": 0, "failed": []}
+
+    def record(unit: dict, state: str, reason: Optional[str] = None) -> None:
+        if journal is not None:
+            journal.record(unit, state, reason)
+
+    def record_days(unit: dict, days: np.ndarray, selected: np.ndarray, state: str,
+                    reason: Optional[str] = None) -> None:
+        # Une entrée par plage de journées consécutives dans le même état
+        for start, end in _day_runs(days, selected):
+            if state == "failed":
+                summary["failed"].append((unit["interval"], start, end))
+            record({**unit, "start": start, "end": end}, state, reason)
+
+    by_interval: dict[str, list[dict]] = {}
+    for unit in units:
+        by_interval.setdefault(unit["interval"], []).append(unit)
+
+    with ZipArchiveWriter(config.ZIP_FILE) as archive:
+
+        async def run_interval(interval: str, interval_units: list[dict]) -> None:
+            # Mode combiné : la courbe 30 min est téléchargée, la série 1h en est dérivée
+            request_interval = "30min" if interval == COMBINED_INTERVAL else interval
+            csv_file = config.CSV_30MIN if interval == "30min" else config.CSV_1H
+
+            def store(data: dict) -> int:
+                if interval == COMBINED_INTERVAL:
+                    return _archive_all_intervals(data, archive)
+                return _archive_interval_payloads(data, interval, csv_file, archive)
+            remaining = iter(sorted(interval_units, key=lambda u: u["start"]))
+            pending = deque()
+
+            def submit_next() -> None:
+                unit = next(remaining, None)
+                if unit is None:
+                    return
+                start_str = format_date_to_str(_as_datetime(unit["start"]))
+                end_str = format_date_to_str(_as_datetime(unit["end"]) + timedelta(days=1))
+                task = asyncio.create_task(download(start_str, request_interval, end_date_str=end_str,
+                                                    semaphore=semaphore))
+                pending.append((unit, task))
+
+            for _ in range(window):
+                submit_next()
+
+            while pending:
+                unit, task = pending.popleft()
+                data = await task
+                # La requête suivante part avant l'archivage de la plage courante
+                submit_next()
+                if data is None:
+                    summary["failed"].append((interval, unit["start"], unit["end"]))
+                    record(unit, "failed", "aucune donnée reçue de l'API")
+                    continue
+                summary["requests"] += 1
+                # Réponse partielle : seules les journées reçues sont consignées comme téléchargées
+                days = day_range(unit["start"], unit["end"])
+                received = np.isin(days, np.array(list(group_interval_readings_by_day(data)), dtype="datetime64[D]"))
+                record_days(unit, days, received, "downloaded")
+                record_days(unit, days, ~received, "failed", "absente de la réponse multi-jours")
+                async with archive_lock:
+                    try:
+                        summary["archived_days"] += await asyncio.to_thread(store, data)
+                    except Exception as e:
+                        record_days(unit, days, received, "failed", f"archivage : {e}")
+                        raise
+                    complete = await asyncio.to_thread(_complete_days, interval, days)
+                # Archive ZIP et séries sont mises à jour par le même appel
+                record_days(unit, days, received, "archived")
+                record_days(unit, days, received & complete, "resampled")
+                record_days(unit, days, received & ~complete, "failed", "journée incomplète dans les séries")
+
+        await asyncio.gather(*(run_interval(i, u) for i, u in by_interval.items()))
+
+    return summary
+
+
+def fetch_units(units: list[dict], concurrency: int = config.API_CONCURRENCY,
+                journal: Optional[JobJournal] = None) -> dict:
+    """Point d'entrée synchrone de fetch_units_async (scripts et GitHub Actions)."""
+    return asyncio.run(fetch_units_async(units, concurrency=concurrency, journal=journal))
@@ -33,5 +33,17 @@ CSV_1H = BASE_DATA_DIR.joinpath("consumption_data_1h.csv")
 CSV_30MIN = BASE_DATA_DIR.joinpath("consumption_data_30min.csv")
 ZIP_FILE = BASE_DATA_DIR.joinpath("raw_conso_files.zip")
 
+# Horodatage des séries : fin de l'intervalle (convention Enedis, voir common.coverage)
+TIMESTAMP_LABEL = "end"
+
+# Journal des backfills (common.job_journal)
+JOURNAL_FILE = BASE_DATA_DIR.joinpath("backfill_journal.jsonl")
+
 # URL de base de l’API Conso
 API_BASE_URL = "https://conso.boris.sh/api/consumption_load_curve"
+
+# Nombre maximal de jours par requête de courbe de charge (limite Enedis)
+MAX_RANGE_DAYS = 7
+
+# Nombre maximal de requêtes simultanées lors des backfills asynchrones
+API_CONCURRENCY = int(getenv("CONSO_API_CONCURRENCY", "4"))
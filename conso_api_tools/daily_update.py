@@ -6,9 +6,10 @@ Script quotidien pour GitHub Actions ou exécution locale.
 
 Fonctionnalités :
 - Vérifie pour la veille si les fichiers JSON sont déjà présents dans l’archive
-- Télécharge les données 1h et 30min si manquantes
+- Télécharge la courbe 30min si manquante (une seule requête) et en dérive la série 1h
 - Concatène les nouvelles données dans consumption_data_1h.csv et consumption_data_30min.csv
-- Archive les JSON dans raw_conso_files.zip et supprime les fichiers locaux
+- Archive les JSON dans raw_conso_files.zip (ouverte une seule fois par exécution)
+  et supprime les fichiers locaux
 - Affiche la progression et un récapitulatif clair
 """
 
@@ -21,9 +22,9 @@ if str(root_path) not in sys.path:
     sys.path.insert(0, str(root_path))
 
 from datetime import datetime, timedelta
-from conso_api_tools.api_client import fetch_and_archive
+from conso_api_tools.api_client import fetch_and_archive_day
 from conso_api_tools import config
-from common.utils import print_section, format_date_to_str, cleanup_folders
+from common.utils import print_section, format_date_to_str, cleanup_folders, ZipArchiveWriter
 
 def main():
     # -------------------------------
@@ -34,27 +35,14 @@ def main():
 
     print_section(f"📆 Mise à jour quotidienne des données Conso API ({date_str})")
 
-    downloaded = False
-
-    # -------------------------------
-    # ⚙️ Téléchargement 1h
-    # -------------------------------
-    print(f"⚡ Vérification des données 1h pour le {date_str}...")
-    new_1h = fetch_and_archive(
-        date_obj = yesterday, 
-        interval = "1h")
-    if new_1h:
-        downloaded = True
-
     # -------------------------------
-    # ⚙️ Téléchargement 30min
+    # ⚙️ Téléchargement 30min (1h dérivé)
     # -------------------------------
-    print(f"⚡ Vérification des données 30min pour le {date_str}...")
-    new_30 = fetch_and_archive(
-        date_obj = yesterday, 
-        interval = "30min")
-    if new_30:
-        downloaded = True
+    print(f"⚡ Vérification des données 30min et 1h pour le {date_str}...")
+    with ZipArchiveWriter(config.ZIP_FILE) as archive:
+        downloaded = fetch_and_archive_day(
+            date_obj = yesterday,
+            archive = archive)
 
     # -------------------------------
     # 🧹 Nettoyage des dossiers temporaires
@@ -6,14 +6,25 @@ Télécharge l’historique complet des données de consommation depuis une date
 jusqu’à la veille du jour courant.
 
 ⚙️ Fonctionnalités :
-- Vérifie pour chaque date si les fichiers JSON sont déjà présents dans l’archive
-- Télécharge uniquement les jours manquants (1h et 30min)
+- Planifie en une passe (common.gap_planner) les jours absents de l’archive ou
+  incomplets dans les séries, regroupés en un minimum de requêtes API
+- Télécharge uniquement les jours manquants via le client asynchrone
+  (conso_api_tools.async_client) : par défaut une seule requête 30 min par plage,
+  la série 1h étant dérivée localement ; les jours archivés mais absents des
+  séries sont réintégrés depuis l’archive
 - Concatène les nouvelles données dans consumption_data_1h.csv et consumption_data_30min.csv
 - Archive les JSON dans raw_conso_files.zip et supprime les fichiers locaux
 - Affiche un compteur de journées réellement téléchargées
+- Consigne chaque plage dans un journal (common.job_journal) : une exécution
+  interrompue reprend au dernier point de reprise, et les jours en échec ne sont
+  retentés qu’après un délai croissant d’une exécution à l’autre
 
-🧩 Exemple d’utilisation :
+🧩 Exemples d’utilisation :
     python conso_api_tools/fetch_history.py
+    python conso_api_tools/fetch_history.py --dry-run   # affiche le plan sans rien télécharger
+    python conso_api_tools/fetch_history.py --separate-intervals   # une requête par intervalle
+    python conso_api_tools/fetch_history.py --no-resume   # replanifie depuis START_DATE
+    python conso_api_tools/fetch_history.py --rebuild-hourly   # migre la série 1h (dérivée de la série 30 min)
 """
 
 import argparse
@@ -27,50 +38,132 @@ if str(root_path) not in sys.path:
 
 from datetime import datetime
 
-from conso_api_tools.config import FOLDER_30MIN, FOLDER_1H
-from conso_api_tools.api_client import fetch_range_and_archive
+from conso_api_tools.config import (
+    API_CONCURRENCY,
+    CSV_1H,
+    CSV_30MIN,
+    FOLDER_30MIN,
+    FOLDER_1H,
+    JOURNAL_FILE,
+    MAX_RANGE_DAYS,
+    ZIP_FILE,
+)
+from conso_api_tools.api_client import rebuild_from_archive, rebuild_hourly_series
+from conso_api_tools.async_client import fetch_units
+from common.gap_planner import format_plan, plan_consumption
+from common.job_journal import JobJournal
 from common.utils import cleanup_folders, format_date_to_str, format_str_to_date, print_section, yesterday
 from common.config import START_DATE
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Télécharger un historique de consommation Enedis")
-    parser.add_argument("--start-date", default=None, help="Date de début au format YYYY-MM-DD")
+    parser.add_argument("--start-date", default=None,
+                        help="Date de début au format YYYY-MM-DD (par défaut le point de reprise du journal)")
     parser.add_argument("--end-date", default=None, help="Date de fin au format YYYY-MM-DD (par défaut hier)")
-    parser.add_argument("--chunk-days", type=int, default=7, help="Nombre de jours par requête API")
+    parser.add_argument("--chunk-days", type=int, default=MAX_RANGE_DAYS, help="Nombre maximal de jours par requête API")
     parser.add_argument("--interval", choices=["1h", "30min"], default=None, help="Intervalle à télécharger (sinon 1h et 30min)")
+    parser.add_argument("--dry-run", action="store_true", help="Affiche le plan des requêtes sans rien télécharger")
+    parser.add_argument("--separate-intervals", action="store_true",
+                        help="Télécharge 1h et 30min séparément au lieu de dériver 1h de la courbe 30min")
+    parser.add_argument("--concurrency", type=int, default=API_CONCURRENCY, help="Nombre maximal de requêtes simultanées")
+    parser.add_argument("--rebuild-hourly", action="store_true",
+                        help="Réécrit la série 1h depuis la série 30 min (migration vers la série horaire dérivée)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Ignore le point de reprise du journal et replanifie depuis START_DATE")
     return parser.parse_args()
 
 
+def build_plan(
+    start_date: datetime,
+    end_date: datetime,
+    chunk_days: int,
+    interval: str | None,
+    separate_intervals: bool = False,
+    deferred: list | None = None,
+) -> list[dict]:
+    """Plan des requêtes et reconstructions de consommation (voir common.gap_planner)."""
+    intervals = [interval] if interval else ["1h", "30min"]
+    return plan_consumption(
+        start=start_date,
+        end=end_date,
+        archive_path=ZIP_FILE,
+        series={i: CSV_30MIN if i == "30min" else CSV_1H for i in intervals},
+        max_days=chunk_days,
+        combined=interval is None and not separate_intervals,
+        deferred=deferred,
+    )
+
+
 def fetch_all_missing_data(
-    start_date: datetime = START_DATE,
+    start_date: datetime | None = None,
     end_date: datetime | None = None,
-    chunk_days: int = 7,
+    chunk_days: int = MAX_RANGE_DAYS,
     interval: str | None = None,
+    dry_run: bool = False,
+    concurrency: int = API_CONCURRENCY,
+    separate_intervals: bool = False,
+    resume: bool = True,
+    journal_path: Path = JOURNAL_FILE,
 ):
     """
     Télécharge toutes les données de consommation manquantes depuis la date donnée.
 
-    Paramètre :
-        start_date (datetime) : date de début (incluse)
+    Paramètres :
+        start_date (datetime | None) : date de début (incluse, défaut : point de reprise
+                                       du journal, ou START_DATE)
+        end_date (datetime | None) : date de fin (incluse, défaut : hier)
+        chunk_days (int) : nombre maximal de jours par requête API
+        interval (str | None) : '1h' ou '30min' (sinon les deux)
+        dry_run (bool) : affiche le plan sans rien télécharger
+        concurrency (int) : nombre maximal de requêtes simultanées
+        separate_intervals (bool) : une requête par intervalle (sinon 30min téléchargé, 1h dérivé)
+        resume (bool) : reprend au point de reprise du journal si start_date n'est pas fourni
+        journal_path (Path) : journal des backfills de consommation
 
     Retour :
         None
     """
     if end_date is None:
         end_date = yesterday()
+    journal = JobJournal(journal_path, "consommation")
+    if start_date is None:
+        start_date = journal.resume_date(START_DATE) if resume else START_DATE
+    deferred = journal.deferred_days()
+
+    plan = build_plan(start_date, end_date, chunk_days, interval, separate_intervals, deferred)
+    if dry_run:
+        print_section(f"🗺️ Plan de l’historique Conso API depuis le {format_date_to_str(start_date)}")
+        print(format_plan(plan))
+        if deferred:
+            print(f"⏸️ {len(deferred)} journée(s) en échec différée(s) (nouvel essai plus tard)")
+        return
 
     print_section(f"📡 Téléchargement de l’historique Conso API depuis le {format_date_to_str(start_date)}")
-    intervals = [interval] if interval else ["1h", "30min"]
-
-    for current_interval in intervals:
-        print(f"\n⚡ Traitement de l’intervalle {current_interval}...")
-        fetch_range_and_archive(
-            start_date_obj=start_date,
-            end_date_obj=end_date,
-            interval=current_interval,
-            chunk_days=chunk_days,
-        )
+    print(format_plan(plan))
+    if deferred:
+        print(f"⏸️ {len(deferred)} journée(s) en échec différée(s) (nouvel essai plus tard)")
+    for unit in plan:
+        journal.record(unit, "planned")
+
+    for unit in plan:
+        if unit["action"] == "rebuild":
+            rebuild_from_archive(
+                datetime.combine(unit["start"], datetime.min.time()),
+                datetime.combine(unit["end"], datetime.min.time()),
+                unit["interval"],
+            )
+            journal.record(unit, "resampled")
+
+    downloads = [unit for unit in plan if unit["action"] == "download"]
+    if downloads:
+        summary = fetch_units(downloads, concurrency=concurrency, journal=journal)
+        print(f"📊 {summary['requests']} requête(s) réussie(s), {summary['archived_days']} journée(s) archivée(s), "
+              f"{len(summary['failed'])} plage(s) en échec")
+
+    checkpoint = journal.finish(start_date, end_date)
+    if checkpoint is not None:
+        print(f"📍 Point de reprise : {checkpoint}")
 
     tmp_folders = [Path(FOLDER_1H), Path(FOLDER_30MIN)]
     cleanup_folders(tmp_folders)
@@ -80,11 +173,18 @@ def fetch_all_missing_data(
 
 if __name__ == "__main__":
     args = parse_args()
-    start_date = format_str_to_date(args.start_date) if args.start_date else START_DATE
+    if args.rebuild_hourly:
+        rebuild_hourly_series()
+        sys.exit(0)
+    start_date = format_str_to_date(args.start_date) if args.start_date else None
     end_date = format_str_to_date(args.end_date) if args.end_date else None
     fetch_all_missing_data(
         start_date=start_date,
         end_date=end_date,
         chunk_days=args.chunk_days,
         interval=args.interval,
+        dry_run=args.dry_run,
+        concurrency=args.concurrency,
+        separate_intervals=args.separate_intervals,
+        resume=not args.no_resume,
     )
@@ -9,6 +9,8 @@ from typing import Any
 import pandas as pd
 import requests
 
+from common.data_tools import PRICE_VALIDITY_COLUMNS
+
 
 DEFAULT_PRICE_OUTPUT_PATH = Path("data/conso/consumption_prices.csv")
 
@@ -19,7 +21,7 @@ def _normalize_price_dataframe(price_df: pd.DataFrame) -> pd.DataFrame:
         return pd.DataFrame(columns=["datetime", "price_eur_per_kwh"])
 
     datetime_col = None
-    for candidate in ["datetime", "date", "timestamp", "time"]:
+    for candidate in ["datetime", "valid_from", "date", "timestamp", "time"]:
         if candidate in price_df.columns:
             datetime_col = candidate
             break
@@ -36,6 +38,10 @@ def _normalize_price_dataframe(price_df: pd.DataFrame) -> pd.DataFrame:
     normalized = price_df[[datetime_col, price_col]].copy()
     normalized.columns = ["datetime", "price_eur_per_kwh"]
     normalized["datetime"] = pd.to_datetime(normalized["datetime"], errors="coerce")
+    # Fin de validité optionnelle, conservée pour la jointure as-of (common.data_tools.price_at)
+    validity_col = next((c for c in PRICE_VALIDITY_COLUMNS if c in price_df.columns), None)
+    if validity_col is not None:
+        normalized["valid_until"] = pd.to_datetime(price_df[validity_col], errors="coerce")
     normalized = normalized.dropna(subset=["datetime", "price_eur_per_kwh"]).sort_values("datetime")
     return normalized.reset_index(drop=True)
 
@@ -5,7 +5,8 @@ api_client.py
 Outils bas-niveau pour interagir avec l’API Hoymiles.
 
 Fonctionnalités :
-- Télécharge les fichiers ZIP bruts pour une date donnée
+- Télécharge les fichiers ZIP bruts pour une date ou une plage de dates
+- Découpe un export multi-jours en CSV journaliers (prod_YYYY-MM-DD.csv)
 - Rafraîchit le token automatiquement si nécessaire
 - Ajoute les nouveaux CSV dans le jeu de données principal et dans l’archive
 """
@@ -17,10 +18,10 @@ import zipfile
 import shutil
 from datetime import datetime
 from typing import Optional
-import requests
 from dotenv import load_dotenv, set_key
 from time import sleep
 import json
+import pandas as pd
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
@@ -32,8 +33,9 @@ from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options
 
 from common.config import ROOT_PATH
-from common.utils import format_date_to_str, add_file_to_zip, extract_csv_from_zip, clean_csv_columns, append_csvs_to_clean_csv, append_csvs_with_resampling, resampled_data_exists_for_date, read_csv_from_zip
-from prod_api_tools.config import LOGIN_PAGE, USERNAME, PASSWORD, TIMEOUT, DATA_FOLDER, API_BASE_URL, CSV_30MIN, CSV_1H
+from common.http_client import DEFAULT_POOL_SIZE, HttpClient, lazy_client
+from common.utils import format_date_to_str, ZipArchiveWriter, extract_csv_from_zip, clean_csv_columns, append_csvs_to_clean_csv, append_csvs_with_resampling, resampled_data_exists_for_date, read_csv_from_zip
+from prod_api_tools.config import LOGIN_PAGE, USERNAME, PASSWORD, TIMEOUT, DATA_FOLDER, API_BASE_URL, CSV_30MIN, CSV_1H, BACKFILL_WORKERS
 
 
 # Charger .env si présent (utile en local)
@@ -256,23 +258,27 @@ def refresh_token(mode: str = "local") -> Optional[str]:
 # ---------------------------------------------------------------------
 # Fonctions HTTP (preview / export / download)
 # ---------------------------------------------------------------------
-def _get_headers(token: Optional[str] = None) -> dict:
+def _get_headers(token: Optional[str] = None, authorization: bool = True) -> dict:
     """
     Construit les en-têtes pour les requêtes Hoymiles.
     Le site attend le cookie/clé smc_prod_token → donc 'authorization' brut.
+    Avec authorization=False, seuls les en-têtes communs sont renvoyés (session HTTP).
     """
-    tok = token or _current_token()
-    if not tok:
-        raise RuntimeError("⚠️ Aucun token disponible (HOYMILES_TOKEN non défini).")
-    return {
+    headers = {
         "Accept": "application/json",
         "Content-Type": "application/json; charset=UTF-8",
         "Origin": "https://global.hoymiles.com",
         "Referer": "https://global.hoymiles.com/",
         "User-Agent": "Mozilla/5.0 (X11; Linux x86_64)",
-        # Le cookie smc_prod_token se reflète côté API comme 'authorization'
-        "authorization": tok,
     }
+    if not authorization:
+        return headers
+    tok = token or _current_token()
+    if not tok:
+        raise RuntimeError("⚠️ Aucun token disponible (HOYMILES_TOKEN non défini).")
+    # Le cookie smc_prod_token se reflète côté API comme 'authorization'
+    headers["authorization"] = tok
+    return headers
 
 
 def _get_cookies() -> dict:
@@ -285,7 +291,29 @@ def _get_cookies() -> dict:
     }
 
 
-def build_payload(site_id: int, date_str: str, quota: str|None="STATION_POWER") -> dict:
+def _build_http_client() -> HttpClient:
+    """
+    Crée le client HTTP Hoymiles : en-têtes et cookies communs,
+    pool dimensionné pour le backfill parallèle.
+    Le token (en-tête 'authorization') reste fourni à chaque appel car il peut être rafraîchi.
+
+    Les appels Hoymiles sont des POST : ils ne sont jamais rejoués par la session
+    (ni sur statut HTTP, ni après une erreur de lecture), les nouvelles tentatives
+    restant à download_with_retry (backoff, rafraîchissement du token, quota).
+    """
+    return HttpClient(
+        headers=_get_headers(authorization=False),
+        cookies=_get_cookies(),
+        pool_size=max(DEFAULT_POOL_SIZE, 2 * BACKFILL_WORKERS),
+        status_forcelist=(),
+        allowed_methods=("GET",))
+
+
+# Client HTTP partagé (keep-alive) pour tous les appels Hoymiles
+get_http_client = lazy_client(_build_http_client)
+
+
+def build_payload(site_id: int, date_str: str, quota: str|None="STATION_POWER", end_date_str: str|None=None) -> dict:
     """
     Construit et retourne un dictionnaire (payload) utilisé pour interroger une API.
 
@@ -294,10 +322,11 @@ def build_payload(site_id: int, date_str: str, quota: str|None="STATION_POWER")
     site_id : int
         Identifiant unique du site pour lequel la requête doit être effectuée.
     date_str : str
-        Date au format texte (par exemple '2025-01-15') utilisée à la fois comme
-        date de début et date de fin dans la requête.
+        Date de début au format texte (par exemple '2025-01-15').
     quota : str
         Quota ("STATION_POWER" par défaut)
+    end_date_str : str | None
+        Date de fin incluse (export multi-jours) ; par défaut identique à date_str.
 
     Retour
     ------
@@ -323,7 +352,7 @@ def build_payload(site_id: int, date_str: str, quota: str|None="STATION_POWER")
         "sid_list": [site_id],  # La liste doit contenir l'identifiant du site
         "sid": site_id,  # Identifiant direct du site
         "start_date": date_str,  # Date de début de la période
-        "end_date": date_str,  # Date de fin de la période (identique ici)
+        "end_date": end_date_str or date_str,  # Date de fin de la période (incluse)
         "page": 1,  # Première page par défaut
         "page_size": 20  # Taille de page par défaut
     }
@@ -334,33 +363,33 @@ def build_payload(site_id: int, date_str: str, quota: str|None="STATION_POWER")
     return payload
 
 
-def request_production_preview(site_id: int, target_date: datetime) -> dict:
+def request_production_preview(site_id: int, target_date: datetime, end_date: Optional[datetime] = None) -> dict:
     """
-    Appelle l'endpoint de prévisualisation (select_power_by_station).
+    Appelle l'endpoint de prévisualisation (select_power_by_station),
+    pour une journée ou la plage [target_date, end_date].
     Retourne le JSON de la réponse.
     """
     # 1️⃣ Datetime format to String
     date_str = format_date_to_str(target_date)
+    end_date_str = format_date_to_str(end_date) if end_date is not None else None
 
-    resp = requests.post(
+    resp = get_http_client().post(
         API_BASE_URL + "select_power_by_station",
         headers=_get_headers(),
-        cookies=_get_cookies(),
-        json=build_payload(site_id=site_id, date_str=date_str, quota=None)
+        json=build_payload(site_id=site_id, date_str=date_str, quota=None, end_date_str=end_date_str)
     )
     resp.raise_for_status()
     return resp.json()
 
 
-def request_production_export(site_id: int, date_str: str) -> dict:
-    """Effectue une requête d'export de production Hoymiles pour une journée donnée."""
+def request_production_export(site_id: int, date_str: str, end_date_str: str|None=None) -> dict:
+    """Effectue une requête d'export de production Hoymiles pour une journée ou une plage de jours."""
     url = API_BASE_URL + "export_station_data"
 
-    response = requests.post(
+    response = get_http_client().post(
         url=url,
         headers=_get_headers(_current_token()),
-        cookies=_get_cookies(),
-        json=build_payload(site_id=site_id, date_str=date_str, quota="STATION_POWER"),
+        json=build_payload(site_id=site_id, date_str=date_str, quota="STATION_POWER", end_date_str=end_date_str),
         timeout=30)
 
     data = response.json().get("data")
@@ -377,34 +406,48 @@ def request_production_export(site_id: int, date_str: str) -> dict:
         if "operation error" in msg:
             raise RuntimeError(f"operation_error: {resp}")
 
-        raise RuntimeError(f"Erreur Hoymiles pour {date_str}: {resp}")
+        raise RuntimeError(f"Erreur Hoymiles pour {date_str}{' → ' + end_date_str if end_date_str else ''}: {resp}")
 
     return data
 
 
 def download_raw_production_zip_file(site_id: int,
                                      target_date: datetime,
-                                     dest_dir: Path) -> Path:
+                                     dest_dir: Path,
+                                     rate_limiter=None,
+                                     end_date: Optional[datetime] = None) -> Path:
     """
-    Télécharge l'archive ZIP produite par export_station_data pour une date donnée.
+    Télécharge l'archive ZIP produite par export_station_data pour une date donnée,
+    ou pour la plage [target_date, end_date] si end_date est fourni (un seul export).
     - Gère le polling tant que Hoymiles n'a pas encore généré le fichier.
     - Retente automatiquement en cas de "Operation error" ou data=None.
+
+    Si un limiteur de débit est fourni (objet exposant acquire()), un jeton
+    est consommé avant chacun des trois appels HTTP (preview, export, ZIP).
     """
     # 1️⃣ Datetime format to String
     date_str = format_date_to_str(target_date)
+    end_date_str = format_date_to_str(end_date) if end_date is not None else None
+    label = f"{date_str}_{end_date_str}" if end_date_str else date_str
 
-    # 1️⃣ Vérification de l'existence de données pour ce jour-là
-    preview = request_production_preview(site_id, target_date)
+    # 1️⃣ Vérification de l'existence de données pour ce jour-là (ou cette plage)
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    preview = request_production_preview(site_id, target_date, end_date)
     if preview.get('message') != 'success':
-        raise RuntimeError(f"Échec : aucune donnée pour {date_str} (réponse preview: {preview.get('message')})")
+        raise RuntimeError(f"Échec : aucune donnée pour {label} (réponse preview: {preview.get('message')})")
 
     # 2️⃣ Lancement de l'export
-    export_resp = request_production_export(site_id, date_str)
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    export_resp = request_production_export(site_id, date_str, end_date_str)
     # 3️⃣ Téléchargement du ZIP
     DATA_FOLDER.mkdir(parents=True, exist_ok=True)
-    chemin_zip = dest_dir.joinpath(f"station_power_{date_str}.zip")
+    chemin_zip = dest_dir.joinpath(f"station_power_{label}.zip")
     print(f"📦 Téléchargement de l'archive {export_resp.get('file_name')}")
-    r = requests.get(export_resp.get('url'), timeout=90)
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    r = get_http_client().get(export_resp.get('url'), timeout=90)
     r.raise_for_status()
     with open(chemin_zip, "wb") as fh:
         fh.write(r.content)
@@ -413,6 +456,191 @@ def download_raw_production_zip_file(site_id: int,
     return chemin_zip
 
 
+def is_token_error(error: Exception) -> bool:
+    """
+    Indique si une erreur de téléchargement provient d'un token Hoymiles invalide.
+
+    Une "operation error" renvoyée par export_station_data n'est PAS une erreur de token.
+    """
+    msg = str(error).lower()
+    is_token_issue = any(x in msg for x in ["token error", "401", "403", "verify"])
+    is_operation_error = "operation_error" in msg  # ce qu’on renvoie depuis request_production_export
+    return is_token_issue and not is_operation_error
+
+
+# Statuts HTTP signalant une requête (plage) refusée pour sa taille
+RANGE_REFUSAL_STATUS_CODES = (400, 413, 414)
+
+
+def is_range_refusal(error: Exception) -> bool:
+    """
+    Indique si l'échec d'un export multi-jours vient d'un refus de l'API ou de la taille
+    de la plage : un redécoupage en plages plus courtes peut alors aboutir.
+
+    Les erreurs réseau, de token ou de quota ne sont pas des refus.
+    """
+    if is_token_error(error):
+        return False
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RANGE_REFUSAL_STATUS_CODES
+    msg = str(error).lower()
+    # Messages levés par download_raw_production_zip_file / request_production_export
+    return any(x in msg for x in ["operation_error", "erreur hoymiles", "aucune donnée"])
+
+
+def integrate_production_zip(zip_path: Path,
+                             target_date: datetime,
+                             work_dir: Path,
+                             archive_path: Path,
+                             csv_path_30min: Path,
+                             csv_path_1h: Path,
+                             archive: Optional[ZipArchiveWriter] = None) -> None:
+    """
+    Intègre une archive Hoymiles téléchargée : extraction du CSV brut,
+    renommage des colonnes, ajout à l'archive et mise à jour des resamplés.
+
+    Paramètres :
+        zip_path (Path) : archive ZIP renvoyée par export_station_data
+        target_date (datetime) : date des données
+        work_dir (Path) : dossier temporaire d'extraction
+        archive_path (Path) : chemin du fichier ZIP d’archive (raw_prod_files.zip)
+        csv_path_30min (Path) : chemin du fichier CSV cumulatif moyenné sur 30min
+        csv_path_1h (Path) : chemin du fichier CSV cumulatif moyenné sur 1h
+        archive (ZipArchiveWriter | None) : archive déjà ouverte (backfill) ;
+                                            sinon archive_path est ouvert pour ce seul fichier
+    """
+    # Extraction du CSV brut
+    csv_extracted = extract_csv_from_zip(zip_path=zip_path, dest_folder=work_dir)
+
+    # Renommage des colonnes Hoymiles
+    prod_csv_map = {"Time": "datetime", "Production (W)": "production"}
+    clean_csv_columns(source_csv=csv_extracted, columns_map=prod_csv_map)
+
+    # Ajout à l’archive
+    arcname = f"prod_{format_date_to_str(target_date)}.csv"
+    if archive is None:
+        with ZipArchiveWriter(archive_path) as single_archive:
+            single_archive.write(filename=csv_extracted, arcname=arcname)
+    else:
+        archive.write(filename=csv_extracted, arcname=arcname)
+
+    # Mise à jour des fichiers resamplés
+    append_csvs_with_resampling(
+        csv_paths=[csv_extracted],
+        csv_30min=csv_path_30min,
+        csv_1h=csv_path_1h
+    )
+
+    print(f"✅ Données de production intégrées pour {target_date.date()}")
+
+
+def split_production_export(zip_path: Path, work_dir: Path) -> dict:
+    """
+    Découpe un export Hoymiles multi-jours en un CSV nettoyé par journée.
+
+    Tous les CSV de l'archive sont lus et concaténés, les colonnes renommées
+    comme pour un export journalier, puis chaque journée est écrite dans
+    work_dir sous le nom de son membre d'archive (prod_YYYY-MM-DD.csv).
+
+    Paramètres :
+        zip_path (Path) : archive ZIP renvoyée par export_station_data
+        work_dir (Path) : dossier où écrire les CSV journaliers
+
+    Retour :
+        dict : {datetime (minuit) : chemin du CSV journalier}, trié par date
+    """
+    prod_csv_map = {"Time": "datetime", "Production (W)": "production"}
+    with zipfile.ZipFile(zip_path, "r") as zipf:
+        csv_names = [f for f in zipf.namelist() if f.lower().endswith(".csv")]
+        if not csv_names:
+            raise RuntimeError(f"Aucun CSV trouvé dans {zip_path}")
+        frames = []
+        for name in csv_names:
+            with zipf.open(name) as fh:
+                frames.append(pd.read_csv(fh))
+
+    df = pd.concat(frames, ignore_index=True)
+    missing = [col for col in prod_csv_map if col not in df.columns]
+    if missing:
+        raise RuntimeError(f"Colonnes manquantes dans le fichier CSV : {missing}")
+    df = df[list(prod_csv_map)].rename(columns=prod_csv_map)
+    times = pd.to_datetime(df["datetime"])
+
+    work_dir.mkdir(parents=True, exist_ok=True)
+    day_files = {}
+    for day, part in df.groupby(times.dt.normalize(), sort=True):
+        day_csv = work_dir.joinpath(f"prod_{format_date_to_str(day)}.csv")
+        part.to_csv(day_csv, sep=";", index=False)
+        day_files[day.to_pydatetime()] = day_csv
+    return day_files
+
+
+def integrate_production_range(zip_path: Path,
+                               work_dir: Path,
+                               archive_path: Path,
+                               csv_path_30min: Path,
+                               csv_path_1h: Path,
+                               archive: Optional[ZipArchiveWriter] = None) -> list:
+    """
+    Intègre un export Hoymiles multi-jours : découpage en CSV journaliers,
+    ajout de chaque journée à l'archive, puis une seule passe de resampling
+    pour toutes les journées.
+
+    Paramètres :
+        zip_path (Path) : archive ZIP renvoyée par export_station_data
+        work_dir (Path) : dossier temporaire d'extraction
+        archive_path (Path) : chemin du fichier ZIP d’archive (raw_prod_files.zip)
+        csv_path_30min (Path) : chemin du fichier CSV cumulatif moyenné sur 30min
+        csv_path_1h (Path) : chemin du fichier CSV cumulatif moyenné sur 1h
+        archive (ZipArchiveWriter | None) : archive déjà ouverte (backfill) ;
+                                            sinon archive_path est ouvert pour ce seul export
+
+    Retour :
+        list : journées (datetime) présentes dans l'export et intégrées
+    """
+    day_files = split_production_export(zip_path=zip_path, work_dir=work_dir.joinpath("days"))
+
+    if archive is None:
+        with ZipArchiveWriter(archive_path) as single_archive:
+            for day_csv in day_files.values():
+                single_archive.write(filename=day_csv, arcname=day_csv.name)
+    else:
+        for day_csv in day_files.values():
+            archive.write(filename=day_csv, arcname=day_csv.name)
+
+    if day_files:
+        append_csvs_with_resampling(
+            csv_paths=list(day_files.values()),
+            csv_30min=csv_path_30min,
+            csv_1h=csv_path_1h
+        )
+        days = list(day_files)
+        print(f"✅ Données de production intégrées du {days[0].date()} au {days[-1].date()} ({len(days)} jours)")
+    return list(day_files)
+
+
+def rebuild_resampled_from_archive(target_date: datetime,
+                                   archive_path: Path,
+                                   csv_path_30min: Path,
+                                   csv_path_1h: Path) -> None:
+    """
+    Reconstruit les resamplés d'une journée à partir du CSV déjà archivé
+    (aucun appel à l'API Hoymiles).
+    """
+    zip_filename = "prod_" + target_date.strftime("%Y-%m-%d") + ".csv"
+    df = read_csv_from_zip(zip_path=archive_path, zip_filename=zip_filename)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_csv = Path(tmp_dir).joinpath(zip_filename)
+        df.to_csv(tmp_csv, sep=";", index=False)
+
+        append_csvs_with_resampling(
+            csv_paths=[tmp_csv],
+            csv_30min=csv_path_30min,
+            csv_1h=csv_path_1h
+        )
+
+
 def fetch_and_archive(target_date: datetime, site_id: int, archive_path: Path, csv_path_30min: Path, csv_path_1h: Path) -> bool:
     """
     Télécharge et intègre les données de production pour une date donnée.
@@ -455,14 +683,11 @@ def fetch_and_archive(target_date: datetime, site_id: int, archive_path: Path, c
         print(f"♻️ Données déjà dans le ZIP mais resamplages manquants → reconstruction…")
 
         # Dans ce cas : lire les données du ZIP
-        df = read_csv_from_zip(zip_path=archive_path, zip_filename=zip_filename)
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".csv")
-        df.to_csv(tmp.name, sep=";", index=False)
-
-        append_csvs_with_resampling(
-            csv_paths=[Path(tmp.name)],
-            csv_30min=csv_path_30min,
-            csv_1h=csv_path_1h
+        rebuild_resampled_from_archive(
+            target_date=target_date,
+            archive_path=archive_path,
+            csv_path_30min=csv_path_30min,
+            csv_path_1h=csv_path_1h
         )
 
         return True
@@ -482,12 +707,7 @@ def fetch_and_archive(target_date: datetime, site_id: int, archive_path: Path, c
                 dest_dir=temp_file
             )
         except Exception as e:
-            msg = str(e).lower()
-
-            is_token_issue = any(x in msg for x in ["token error", "401", "403", "verify"])
-            is_operation_error = "operation_error" in msg  # ce qu’on renvoie depuis request_production_export
-
-            if is_token_issue and not is_operation_error:
+            if is_token_error(e):
                 print("⚠️ Problème de token — tentative de rafraîchissement…")
                 new_token = refresh_token(mode="gha" if getenv("GITHUB_ACTIONS") else "local")
                 if not new_token:
@@ -506,29 +726,14 @@ def fetch_and_archive(target_date: datetime, site_id: int, archive_path: Path, c
             else:
                 raise
 
-        # Extraction du CSV brut
-        csv_extracted = extract_csv_from_zip(zip_path=zip_path, dest_folder=temp_file)
-
-        # Renommage des colonnes Hoymiles
-        prod_csv_map = {"Time": "datetime", "Production (W)": "production"}
-        clean_csv_columns(source_csv=csv_extracted, columns_map=prod_csv_map)
-
-        # Ajout à l’archive
-        arcname = f"prod_{format_date_to_str(target_date)}.csv"
-        add_file_to_zip(
-            tmp_file=csv_extracted,
-            zip_path=archive_path,
-            arcname=arcname
+        integrate_production_zip(
+            zip_path=zip_path,
+            target_date=target_date,
+            work_dir=temp_file,
+            archive_path=archive_path,
+            csv_path_30min=csv_path_30min,
+            csv_path_1h=csv_path_1h
         )
-
-        # Mise à jour des fichiers resamplés
-        append_csvs_with_resampling(
-            csv_paths=[csv_extracted],
-            csv_30min=csv_path_30min,
-            csv_1h=csv_path_1h
-        )
-
-        print(f"✅ Données de production intégrées pour {target_date.date()}")
         sleep(1)
         return True
 
@@ -537,4 +742,4 @@ def fetch_and_archive(target_date: datetime, site_id: int, archive_path: Path, c
         return False
 
     finally:
-        shutil.rmtree(temp_file, ignore_errors=True)
\ No newline at end of file
+        shutil.rmtree(temp_file, ignore_errors=True)
@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""
+backfill.py
+
+Backfill parallèle et limité en débit de l'historique de production Hoymiles.
+
+Fonctionnalités :
+- Regroupe les journées manquantes consécutives en exports multi-jours (un seul
+  preview / export / ZIP par plage), dont la longueur s'adapte à ce que l'API accepte
+- Télécharge plusieurs plages en parallèle (pool de workers borné)
+- Limite le débit global des appels à l'API par un seau à jetons (token bucket)
+- Retente les échecs transitoires avec un backoff exponentiel et une gigue aléatoire
+- Coordonne le rafraîchissement du token : un seul rafraîchissement à la fois,
+  les autres workers réutilisent le nouveau token
+- Intègre les résultats dans l'ordre chronologique (archive ZIP et séries resamplées),
+  l'écriture restant séquentielle ; l'archive est ouverte une seule fois par exécution
+- Consigne l'état de chaque plage dans le journal de backfill (common.job_journal) ;
+  les journées en échec récent sont différées selon leur backoff
+
+🧩 Exemple d'utilisation :
+    python prod_api_tools/fetch_history.py --workers 4 --rate 2
+"""
+
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from os import getenv
+from pathlib import Path
+from typing import Callable, Optional
+
+from common.gap_planner import plan_production
+from common.job_journal import JobJournal
+from common.utils import ZipArchiveWriter, format_date_to_str
+from prod_api_tools.api_client import (
+    _current_token,
+    download_raw_production_zip_file,
+    integrate_production_range,
+    integrate_production_zip,
+    is_range_refusal,
+    is_token_error,
+    rebuild_resampled_from_archive,
+    refresh_token,
+)
+from prod_api_tools.config import (
+    API_RATE_BURST,
+    API_RATE_PER_SECOND,
+    BACKFILL_BACKOFF_SECONDS,
+    BACKFILL_MAX_RETRIES,
+    BACKFILL_RANGE_DAYS,
+    BACKFILL_WORKERS,
+)
+
+
+# ------------------------------------------------------
+# 🪣 Limitation de débit
+# ------------------------------------------------------
+
+class TokenBucket:
+    """
+    Seau à jetons partagé entre threads.
+
+    Le seau se remplit de `rate` jetons par seconde jusqu'à `capacity` ;
+    chaque appel HTTP consomme un jeton et attend s'il n'y en a plus.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("Le débit doit être strictement positif.")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Consomme un jeton, en attendant qu'il soit disponible."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+# ------------------------------------------------------
+# 🔑 Rafraîchissement coordonné du token
+# ------------------------------------------------------
+
+class TokenRefresher:
+    """
+    Garantit qu'un seul rafraîchissement du token Hoymiles s'exécute à la fois.
+
+    Un worker signale le token qui a échoué ; si un autre worker l'a déjà
+    remplacé entre-temps, le nouveau token est réutilisé sans relancer Selenium.
+    """
+
+    def __init__(self, refresh: Callable[[], Optional[str]], current: Callable[[], Optional[str]] = _current_token):
+        self._refresh = refresh
+        self._current = current
+        self._lock = threading.Lock()
+
+    def refresh(self, failed_token: Optional[str]) -> Optional[str]:
+        """
+        Rafraîchit le token s'il est toujours celui qui a échoué.
+
+        Paramètre :
+            failed_token (str | None) : token utilisé lors de l'appel en erreur
+
+        Retour :
+            str | None : token valide, ou None si le rafraîchissement a échoué
+        """
+        with self._lock:
+            current = self._current()
+            if current and current != failed_token:
+                return current
+            print("⚠️ Problème de token — tentative de rafraîchissement…")
+            return self._refresh()
+
+
+def backoff_delay(attempt: int, base: float = BACKFILL_BACKOFF_SECONDS, cap: float = 60.0) -> float:
+    """Délai avant la tentative `attempt` + 1 : backoff exponentiel avec gigue complète."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def download_with_retry(target_date: datetime,
+                        site_id: int,
+                        dest_dir: Path,
+                        rate_limiter: TokenBucket,
+                        refresher: TokenRefresher,
+                        max_retries: int = BACKFILL_MAX_RETRIES,
+                        sleep: Callable[[float], None] = time.sleep,
+                        end_date: Optional[datetime] = None) -> Path:
+    """
+    Télécharge l'archive d'une journée (ou de la plage [target_date, end_date])
+    avec nouvelles tentatives.
+
+    - Erreur de token : rafraîchissement coordonné puis nouvel essai
+    - Autre erreur : nouvel essai après un backoff exponentiel avec gigue
+
+    Retour :
+        Path : chemin de l'archive ZIP téléchargée
+    """
+    range_kwargs = {"end_date": end_date} if end_date is not None else {}
+    for attempt in range(max_retries + 1):
+        token_used = _current_token()
+        try:
+            return download_raw_production_zip_file(
+                site_id=site_id,
+                target_date=target_date,
+                dest_dir=dest_dir,
+                rate_limiter=rate_limiter,
+                **range_kwargs
+            )
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            if is_token_error(e):
+                if not refresher.refresh(token_used):
+                    raise RuntimeError("❌ Impossible de rafraîchir le token Hoymiles.") from e
+                continue
+            delay = backoff_delay(attempt)
+            print(f"🔁 {format_date_to_str(target_date)} : {e} — nouvel essai dans {delay:.1f}s")
+            sleep(delay)
+
+
+# ------------------------------------------------------
+# 📆 Regroupement des journées en plages
+# ------------------------------------------------------
+
+def contiguous_runs(days: list) -> list:
+    """
+    Regroupe des journées triées en suites de journées consécutives.
+
+    Paramètre :
+        days (list[datetime]) : journées croissantes
+
+    Retour :
+        list[list[datetime]] : suites de journées consécutives
+    """
+    runs = []
+    for day in days:
+        if runs and day - runs[-1][-1] == timedelta(days=1):
+            runs[-1].append(day)
+        else:
+            runs.append([day])
+    return runs
+
+
+class RangePlanner:
+    """
+    Découpe les suites de journées manquantes en plages d'au plus `range_days` jours.
+
+    La longueur maximale est partagée entre les workers : lorsqu'une plage de
+    plusieurs jours échoue définitivement, elle est réduite de moitié (shrink)
+    et s'applique aux plages découpées ensuite ; elle ne remonte jamais au
+    cours d'une exécution.
+    """
+
+    def __init__(self, days: list, range_days: int = BACKFILL_RANGE_DAYS):
+        self.range_days = max(1, range_days)
+        self._runs = deque(contiguous_runs(days))
+        self._lock = threading.Lock()
+
+    def next_range(self) -> Optional[list]:
+        """Prochaine plage à télécharger (liste de journées), ou None si tout est planifié."""
+        with self._lock:
+            if not self._runs:
+                return None
+            run = self._runs.popleft()
+            if len(run) > self.range_days:
+                self._runs.appendleft(run[self.range_days:])
+                run = run[:self.range_days]
+            return run
+
+    def shrink(self, failed_range: list) -> list:
+        """
+        Réduit la longueur des plages après l'échec de `failed_range`.
+
+        Retour :
+            list[list[datetime]] : la plage en échec redécoupée à la nouvelle longueur
+        """
+        with self._lock:
+            self.range_days = max(1, min(self.range_days, len(failed_range) // 2))
+            print(f"✂️ Plage de {len(failed_range)} jours refusée — exports limités à {self.range_days} jour(s)")
+            return [failed_range[i:i + self.range_days] for i in range(0, len(failed_range), self.range_days)]
+
+
+# ------------------------------------------------------
+# 🚀 Backfill
+# ------------------------------------------------------
+
+def backfill_production(start_date: datetime,
+                        end_date: datetime,
+                        site_id: int,
+                        archive_path: Path,
+                        csv_path_30min: Path,
+                        csv_path_1h: Path,
+                        workers: int = BACKFILL_WORKERS,
+                        rate_per_second: float = API_RATE_PER_SECOND,
+                        burst: int = API_RATE_BURST,
+                        max_retries: int = BACKFILL_MAX_RETRIES,
+                        range_days: int = BACKFILL_RANGE_DAYS,
+                        journal: Optional[JobJournal] = None) -> dict:
+    """
+    Télécharge en parallèle les journées manquantes entre deux dates et les intègre dans l'ordre.
+
+    Les journées déjà resamplées sont ignorées ; celles présentes dans l'archive
+    mais absentes des séries sont reconstruites localement, sans appel à l'API.
+    Les journées manquantes consécutives sont demandées par plages d'au plus
+    `range_days` jours (un export, découpé ensuite en CSV journaliers et resamplé
+    en une passe) ; une plage refusée par l'API (voir is_range_refusal) est redécoupée
+    en plages deux fois plus courtes. Une erreur d'intégration d'un export reçu est
+    consignée en échec, sans nouveau téléchargement.
+    Les téléchargements s'exécutent dans un pool de `workers` threads, avec au plus
+    `workers` × 2 plages en avance sur l'intégration pour borner l'espace disque.
+
+    Paramètres :
+        start_date, end_date (datetime) : bornes incluses de la plage
+        site_id (int) : identifiant de la station Hoymiles
+        archive_path (Path) : chemin du fichier ZIP d’archive (raw_prod_files.zip)
+        csv_path_30min (Path) : chemin du fichier CSV cumulatif moyenné sur 30min
+        csv_path_1h (Path) : chemin du fichier CSV cumulatif moyenné sur 1h
+        workers (int) : nombre de téléchargements simultanés
+        rate_per_second (float) : débit maximal d'appels HTTP
+        burst (int) : nombre d'appels autorisés en rafale
+        max_retries (int) : nouvelles tentatives par plage
+        range_days (int) : nombre maximal de journées par export (1 = un export par jour)
+        journal (JobJournal | None) : journal où consigner l'état de chaque plage ; ses
+                                      journées en attente de nouvel essai ne sont pas téléchargées
+
+    Retour :
+        dict : {'downloaded': [...], 'rebuilt': [...], 'skipped': [...], 'failed': {date: erreur},
+                'deferred': [...], 'requests': nombre d'exports effectués}
+    """
+    summary = {"downloaded": [], "rebuilt": [], "skipped": [], "failed": {}, "deferred": [], "requests": 0}
+
+    def record(days: list, state: str, reason: Optional[str] = None, action: str = "download") -> None:
+        if journal is not None:
+            journal.record({"interval": None, "action": action, "start": days[0], "end": days[-1]}, state, reason)
+
+    # 1) Classement des journées en une passe sur l'archive et l'index de couverture (common.gap_planner)
+    deferred = journal.deferred_days() if journal is not None else []
+    summary["deferred"] = [datetime.combine(day, datetime.min.time()) for day in deferred
+                           if start_date.date() <= day <= end_date.date()]
+    plan = plan_production(
+        start=start_date,
+        end=end_date,
+        archive_path=archive_path,
+        csv_path_30min=csv_path_30min,
+        csv_path_1h=csv_path_1h,
+        max_days=range_days,
+        deferred=deferred)
+    to_download, planned = [], set(summary["deferred"])
+    for unit in plan:
+        first = datetime.combine(unit["start"], datetime.min.time())
+        unit_days = [first + timedelta(days=i) for i in range(unit["days"])]
+        planned.update(unit_days)
+        if unit["action"] == "download":
+            to_download += unit_days
+            continue
+        record(unit_days, "planned", action="rebuild")
+        for day in unit_days:
+            print(f"♻️ {format_date_to_str(day)} déjà dans le ZIP mais resamplages manquants → reconstruction…")
+            rebuild_resampled_from_archive(
+                target_date=day,
+                archive_path=archive_path,
+                csv_path_30min=csv_path_30min,
+                csv_path_1h=csv_path_1h
+            )
+            summary["rebuilt"].append(day)
+        record(unit_days, "resampled", action="rebuild")
+    to_download.sort()
+    day = start_date
+    while day <= end_date:
+        if day not in planned:
+            summary["skipped"].append(day)
+        day += timedelta(days=1)
+
+    if not to_download:
+        return summary
+
+    # 2) Téléchargements parallèles, intégration séquentielle dans l'ordre des dates
+    rate_limiter = TokenBucket(rate=rate_per_second, capacity=burst)
+    refresher = TokenRefresher(lambda: refresh_token(mode="gha" if getenv("GITHUB_ACTIONS") else "local"))
+    planner = RangePlanner(to_download, range_days=range_days)
+    work_root = Path(tempfile.mkdtemp(prefix="hoymiles_backfill_"))
+    pending = deque()
+
+    def submit(executor: ThreadPoolExecutor, days: list) -> tuple:
+        dest_dir = Path(tempfile.mkdtemp(prefix=f"{format_date_to_str(days[0])}_", dir=work_root))
+        end = days[-1] if len(days) > 1 else None
+        record(days, "planned")
+        future = executor.submit(download_with_retry, days[0], site_id, dest_dir, rate_limiter, refresher,
+                                 max_retries, time.sleep, end)
+        return days, dest_dir, future
+
+    def integrate(days: list, zip_path: Path, dest_dir: Path, archive: ZipArchiveWriter) -> None:
+        if len(days) == 1:
+            integrate_production_zip(
+                zip_path=zip_path,
+                target_date=days[0],
+                work_dir=dest_dir,
+                archive_path=archive_path,
+                csv_path_30min=csv_path_30min,
+                csv_path_1h=csv_path_1h,
+                archive=archive
+            )
+            summary["downloaded"].append(days[0])
+            record(days, "archived")
+            record(days, "resampled")
+            return
+        integrated = set(integrate_production_range(
+            zip_path=zip_path,
+            work_dir=dest_dir,
+            archive_path=archive_path,
+            csv_path_30min=csv_path_30min,
+            csv_path_1h=csv_path_1h,
+            archive=archive
+        ))
+        record(days, "archived")
+        record(days, "resampled")
+        for target in days:
+            if target in integrated:
+                summary["downloaded"].append(target)
+            else:
+                summary["failed"][target] = "absente de l'export multi-jours"
+                record([target], "failed", summary["failed"][target])
+
+    def fail(days: list, error: str) -> None:
+        label = format_date_to_str(days[0]) + (f" → {format_date_to_str(days[-1])}" if len(days) > 1 else "")
+        print(f"❌ Erreur lors du traitement de {label} : {error}")
+        for target in days:
+            summary["failed"][target] = error
+        record(days, "failed", error)
+
+    def submit_next(executor: ThreadPoolExecutor) -> None:
+        days = planner.next_range()
+        if days is not None:
+            pending.append(submit(executor, days))
+
+    try:
+        with ZipArchiveWriter(archive_path) as archive, \
+                ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for _ in range(max(1, workers) * 2):
+                submit_next(executor)
+
+            while pending:
+                days, dest_dir, future = pending.popleft()
+                try:
+                    zip_path = future.result()
+                except Exception as e:
+                    if len(days) > 1 and is_range_refusal(e):
+                        # Plage refusée : redécoupage en plages plus courtes, traitées avant la suite
+                        record(days, "failed", f"plage redécoupée : {e}")
+                        for sub_range in reversed(planner.shrink(days)):
+                            pending.appendleft(submit(executor, sub_range))
+                        continue
+                    fail(days, str(e))
+                else:
+                    summary["requests"] += 1
+                    record(days, "downloaded")
+                    try:
+                        integrate(days, zip_path, dest_dir, archive)
+                    except Exception as e:
+                        # Export reçu mais non intégré : un nouveau téléchargement n'y changerait rien
+                        fail(days, f"intégration : {e}")
+                finally:
+                    shutil.rmtree(dest_dir, ignore_errors=True)
+                submit_next(executor)
+    finally:
+        shutil.rmtree(work_root, ignore_errors=True)
+
+    return summary
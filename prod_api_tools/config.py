@@ -35,8 +35,30 @@ CSV_RAW = DATA_FOLDER.joinpath("raw_production_data.csv")
 CSV_1H = DATA_FOLDER.joinpath("production_data_1h.csv")
 CSV_30MIN = DATA_FOLDER.joinpath("production_data_30min.csv")
 
+# Journal des backfills (common.job_journal)
+JOURNAL_FILE = DATA_FOLDER.joinpath("backfill_journal.jsonl")
+
 # Paramètres par défaut
 SITE_ID = 156600
 
 # URL de base de l’API Hoymiles
-API_BASE_URL = "https://neapi.hoymiles.com/pvm-report/api/0/station/report/"
\ No newline at end of file
+API_BASE_URL = "https://neapi.hoymiles.com/pvm-report/api/0/station/report/"
+
+# -------------------------------
+# 🚀 BACKFILL PARALLÈLE
+# -------------------------------
+
+# Nombre de journées téléchargées simultanément
+BACKFILL_WORKERS = int(getenv("HOYMILES_BACKFILL_WORKERS", "4"))
+
+# Débit maximal d'appels à l'API Hoymiles (requêtes / seconde) et rafale autorisée
+API_RATE_PER_SECOND = float(getenv("HOYMILES_API_RATE", "2"))
+API_RATE_BURST = int(getenv("HOYMILES_API_BURST", "4"))
+
+# Nombre maximal de journées consécutives demandées en un seul export ; réduit
+# automatiquement (divisé par deux) lorsque l'API refuse une plage trop longue
+BACKFILL_RANGE_DAYS = int(getenv("HOYMILES_BACKFILL_RANGE_DAYS", "7"))
+
+# Nombre de nouvelles tentatives par journée et délai de base du backoff (secondes)
+BACKFILL_MAX_RETRIES = 3
+BACKFILL_BACKOFF_SECONDS = 2.0
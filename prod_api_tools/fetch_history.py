@@ -7,13 +7,21 @@ jusqu'à la veille du jour courant.
 
 Fonctionnalités :
 - Vérifie pour chaque date si les fichiers existent déjà dans l'archive
-- Télécharge uniquement les jours manquants
+- Télécharge uniquement les jours manquants, par plages de jours consécutifs
+  (un export Hoymiles par plage), en parallèle et avec un débit limité
 - Ajoute les nouvelles données au fichier production_data.csv
 - Archive les CSV dans raw_prod_files.zip
 - Supprime les dossiers temporaires
+- Consigne chaque plage dans un journal (common.job_journal) : une exécution
+  interrompue reprend au dernier point de reprise, et les jours en échec ne sont
+  retentés qu'après un délai croissant d'une exécution à l'autre
 
-🧩 Exemple d'utilisation :
+🧩 Exemples d'utilisation :
     python prod_api_tools/fetch_history.py
+    python prod_api_tools/fetch_history.py --start-date 2025-03-25 --workers 4 --rate 2
+    python prod_api_tools/fetch_history.py --range-days 1   # un export par jour
+    python prod_api_tools/fetch_history.py --dry-run        # affiche le plan sans rien télécharger
+    python prod_api_tools/fetch_history.py --no-resume      # replanifie depuis START_DATE
 """
 
 import sys
@@ -24,53 +32,123 @@ root_path = Path(__file__).resolve().parents[1]
 if str(root_path) not in sys.path:
     sys.path.insert(0, str(root_path))
 
+import argparse
 from os import getenv
-from datetime import datetime, timedelta
+from datetime import datetime
+from common.gap_planner import format_plan, plan_production
+from common.job_journal import JobJournal
 from common.utils import format_date_to_str, print_section, cleanup_folders, yesterday
-from prod_api_tools.config import SITE_ID, ARCHIVE_FILE, CSV_30MIN, CSV_1H, RAW_FOLDER
-from prod_api_tools.api_client import fetch_and_archive, _current_token, refresh_token
+from prod_api_tools.config import SITE_ID, ARCHIVE_FILE, CSV_30MIN, CSV_1H, RAW_FOLDER, BACKFILL_WORKERS, API_RATE_PER_SECOND, BACKFILL_RANGE_DAYS, JOURNAL_FILE
+from prod_api_tools.api_client import _current_token, refresh_token
+from prod_api_tools.backfill import backfill_production
 from common.config import START_DATE
 
-# Vérification du token avant de commencer les téléchargements
-if _current_token() is None:
-    print("⚠️ Problème de token détecté — tentative de rafraîchissement...")
-    new_token = refresh_token(mode="gha" if getenv("GITHUB_ACTIONS") else "local")
-    if not new_token:
-        raise RuntimeError("❌ Impossible de rafraîchir le token Hoymiles.")
 
+def ensure_token():
+    """Vérifie le token avant de commencer les téléchargements (rafraîchi si absent)."""
+    if _current_token() is None:
+        print("⚠️ Problème de token détecté — tentative de rafraîchissement...")
+        new_token = refresh_token(mode="gha" if getenv("GITHUB_ACTIONS") else "local")
+        if not new_token:
+            raise RuntimeError("❌ Impossible de rafraîchir le token Hoymiles.")
 
-def fetch_all_missing_data(start_date: datetime = START_DATE):
+
+def resolve_start_date(journal: JobJournal, start_date: datetime | None, resume: bool = True) -> datetime:
+    """Date de début explicite, sinon point de reprise du journal (ou START_DATE)."""
+    if start_date is not None:
+        return start_date
+    return journal.resume_date(START_DATE) if resume else START_DATE
+
+
+def print_plan(start_date: datetime | None = None, range_days: int = BACKFILL_RANGE_DAYS, resume: bool = True):
+    """Affiche les exports et reconstructions qu'exécuterait fetch_all_missing_data."""
+    journal = JobJournal(JOURNAL_FILE, "production")
+    start_date = resolve_start_date(journal, start_date, resume)
+    deferred = journal.deferred_days()
+    print_section(f"🗺️ Plan de l'historique Hoymiles depuis le {format_date_to_str(date_obj = start_date)}")
+    print(format_plan(plan_production(
+        start = start_date,
+        end = yesterday(),
+        archive_path = ARCHIVE_FILE,
+        csv_path_30min = CSV_30MIN,
+        csv_path_1h = CSV_1H,
+        max_days = range_days,
+        deferred = deferred)))
+    if deferred:
+        print(f"⏸️ {len(deferred)} journée(s) en échec différée(s) (nouvel essai plus tard)")
+
+
+def fetch_all_missing_data(start_date: datetime | None = None,
+                           workers: int = BACKFILL_WORKERS,
+                           rate_per_second: float = API_RATE_PER_SECOND,
+                           range_days: int = BACKFILL_RANGE_DAYS,
+                           resume: bool = True):
     """
     Télécharge toutes les données de production manquantes depuis la date donnée.
 
-    Paramètre :
-        start_date (datetime) : date de début (incluse)
+    Paramètres :
+        start_date (datetime | None) : date de début (incluse, défaut : point de reprise
+                                       du journal, ou START_DATE)
+        workers (int) : nombre de plages téléchargées simultanément
+        rate_per_second (float) : débit maximal d'appels à l'API Hoymiles
+        range_days (int) : nombre maximal de journées par export
+        resume (bool) : reprend au point de reprise du journal si start_date n'est pas fourni
 
     Retour :
         None 
     """
+    journal = JobJournal(JOURNAL_FILE, "production")
+    start_date = resolve_start_date(journal, start_date, resume)
+    end_date = yesterday()
     print_section(f"📡 Téléchargement de l'historique Hoymiles depuis le {format_date_to_str(date_obj = start_date)}")
-    date_incr = start_date
-
-    while date_incr <= yesterday() :
-        try:
-            print(f"\n📅 Traitement du {format_date_to_str(date_incr)}...")
-            fetch_and_archive(
-                target_date = date_incr, 
-                site_id = SITE_ID, 
-                archive_path = ARCHIVE_FILE, 
-                csv_path_30min = CSV_30MIN, 
-                csv_path_1h = CSV_1H)
-        except Exception as e:
-            print(f"❌ Erreur lors du traitement de {format_date_to_str(date_incr)}: {e}")
-        # Incrémentation d'une journée
-        date_incr = date_incr + timedelta(days=1)
-    
+
+    summary = backfill_production(
+        start_date = start_date,
+        end_date = end_date,
+        site_id = SITE_ID,
+        archive_path = ARCHIVE_FILE,
+        csv_path_30min = CSV_30MIN,
+        csv_path_1h = CSV_1H,
+        workers = workers,
+        rate_per_second = rate_per_second,
+        range_days = range_days,
+        journal = journal)
+
+    print(f"📊 {len(summary['downloaded'])} jour(s) téléchargé(s), {len(summary['rebuilt'])} reconstruit(s), "
+          f"{len(summary['skipped'])} déjà intégré(s), {len(summary['failed'])} en erreur, "
+          f"{len(summary['deferred'])} différé(s) ({summary['requests']} export(s) Hoymiles)")
+    for day, error in summary["failed"].items():
+        print(f"   - {format_date_to_str(day)} : {error}")
+
+    checkpoint = journal.finish(start_date, end_date)
+    if checkpoint is not None:
+        print(f"📍 Point de reprise : {checkpoint}")
+
     # Suppression des dossiers temporaires
     cleanup_folders([RAW_FOLDER])
     print("📦 Historique de production mis à jour.")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill de l'historique de production Hoymiles")
+    parser.add_argument("--start-date", type=str, default=None,
+                        help="Date de début YYYY-MM-DD (défaut : point de reprise du journal, ou START_DATE)")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="Nombre de téléchargements simultanés")
+    parser.add_argument("--rate", type=float, default=API_RATE_PER_SECOND, help="Débit maximal d'appels API par seconde")
+    parser.add_argument("--range-days", type=int, default=BACKFILL_RANGE_DAYS, help="Nombre maximal de jours par export")
+    parser.add_argument("--dry-run", action="store_true", help="Affiche le plan des requêtes sans rien télécharger")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Ignore le point de reprise du journal et replanifie depuis START_DATE")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    # Téléchargement des données depuis START_DATE jusqu'à hier
-    fetch_all_missing_data(start_date = START_DATE)
+    # Téléchargement des données depuis le point de reprise (ou --start-date) jusqu'à hier
+    args = parse_args()
+    start = datetime.strptime(args.start_date, "%Y-%m-%d") if args.start_date else None
+    if args.dry_run:
+        print_plan(start_date = start, range_days = args.range_days, resume = not args.no_resume)
+        sys.exit(0)
+    ensure_token()
+    fetch_all_missing_data(start_date = start, workers = args.workers, rate_per_second = args.rate,
+                           range_days = args.range_days, resume = not args.no_resume)
@@ -1,6 +1,21 @@
+import json
+import tempfile
 import unittest
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
 
-from conso_api_tools.api_client import group_interval_readings_by_day
+import pandas as pd
+
+from common.utils import ZipArchiveWriter
+from conso_api_tools import api_client, config
+from conso_api_tools.api_client import (
+    derive_hourly_payload,
+    fetch_and_archive_day,
+    group_interval_readings_by_day,
+    rebuild_from_archive,
+)
 
 
 class ApiClientTests(unittest.TestCase):
@@ -19,6 +34,95 @@ class ApiClientTests(unittest.TestCase):
         self.assertEqual([item["value"] for item in grouped["2026-05-10"]], [1.0, 2.0])
         self.assertEqual([item["value"] for item in grouped["2026-05-11"]], [3.0])
 
+    def test_derive_hourly_payload_uses_end_of_interval_timestamps(self):
+        # Convention Enedis : 00:30 clôt la demi-heure 00:00 → 00:30
+        data = {
+            "meter": "prm",
+            "interval_reading": [
+                {"date": "2026-05-10T00:00:00+02:00", "value": "900", "interval_length": "PT30M"},
+                {"date": "2026-05-10T00:30:00+02:00", "value": "100", "interval_length": "PT30M"},
+                {"date": "2026-05-10T01:00:00+02:00", "value": "300", "interval_length": "PT30M"},
+                {"date": "2026-05-10T01:30:00+02:00", "value": "400", "interval_length": "PT30M"},
+                {"date": "2026-05-10T01:45:00+02:00", "value": "200", "interval_length": "PT15M"},
+                {"date": "2026-05-10T02:00:00+02:00", "value": "600", "interval_length": "PT15M"},
+                {"date": "2026-05-10T02:30:00+02:00", "value": "500", "interval_length": "PT30M"},
+            ],
+        }
+
+        hourly = derive_hourly_payload(data)
+
+        self.assertEqual(hourly["meter"], "prm")
+        self.assertEqual(hourly["interval_reading"], [
+            {"value": 200.0, "date": "2026-05-10 01:00:00+02:00", "interval_length": "PT60M"},
+            {"value": 400.0, "date": "2026-05-10 02:00:00+02:00", "interval_length": "PT60M"},
+        ])
+        # La lecture de 00:00 clôt la dernière demi-heure de la veille
+        self.assertEqual({day: len(items) for day, items in group_interval_readings_by_day(data).items()},
+                         {"2026-05-09": 1, "2026-05-10": 6})
+
+    def test_single_download_populates_both_archives(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        root = Path(tmp_dir.name)
+        slots = pd.date_range("2026-05-10 00:30", periods=48, freq="30min")
+        payload = {"interval_reading": [{"date": t.strftime("%Y-%m-%d %H:%M:%S"), "value": "100",
+                                         "interval_length": "PT30M"} for t in slots]}
+
+        with mock.patch.object(config, "ZIP_FILE", root / "raw_conso_files.zip"), \
+                mock.patch.object(config, "CSV_1H", root / "consumption_data_1h.csv"), \
+                mock.patch.object(config, "CSV_30MIN", root / "consumption_data_30min.csv"), \
+                mock.patch.object(api_client, "download_interval_data", return_value=payload) as download:
+            self.assertTrue(fetch_and_archive_day(datetime(2026, 5, 10)))
+            self.assertFalse(fetch_and_archive_day(datetime(2026, 5, 10)))
+
+        download.assert_called_once_with("2026-05-10", "30min")
+        with zipfile.ZipFile(root / "raw_conso_files.zip") as z:
+            self.assertEqual(sorted(z.namelist()), ["conso_1h/conso_2026-05-10.json",
+                                                    "conso_30min/conso_2026-05-10.json"])
+        hourly = pd.read_csv(root / "consumption_data_1h.csv", sep=";")
+        self.assertEqual(len(hourly), 24)
+        self.assertEqual(hourly["datetime"].iloc[-1], "2026-05-11 00:00:00")
+
+    def test_days_share_the_archive_opened_for_the_run(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        root = Path(tmp_dir.name)
+
+        def payload(date_str, interval):
+            slots = pd.date_range(pd.Timestamp(date_str) + pd.Timedelta(30, unit="min"), periods=48, freq="30min")
+            return {"interval_reading": [{"date": t.strftime("%Y-%m-%d %H:%M:%S"), "value": "100",
+                                          "interval_length": "PT30M"} for t in slots]}
+
+        with mock.patch.object(config, "ZIP_FILE", root / "raw_conso_files.zip"), \
+                mock.patch.object(config, "CSV_1H", root / "consumption_data_1h.csv"), \
+                mock.patch.object(config, "CSV_30MIN", root / "consumption_data_30min.csv"), \
+                mock.patch.object(api_client, "download_interval_data", side_effect=payload):
+            with ZipArchiveWriter(config.ZIP_FILE) as archive, \
+                    mock.patch.object(api_client, "ZipArchiveWriter", side_effect=AssertionError("archive rouverte")):
+                for day in (10, 11):
+                    self.assertTrue(fetch_and_archive_day(datetime(2026, 5, day), archive))
+
+        with zipfile.ZipFile(root / "raw_conso_files.zip") as z:
+            self.assertEqual(len(z.namelist()), 4)
+
+    def test_hourly_series_is_derived_from_archives_split_at_midnight(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        root = Path(tmp_dir.name)
+        # Ancienne répartition : la lecture de 00:00 est archivée avec le lendemain
+        with zipfile.ZipFile(root / "raw_conso_files.zip", "w") as z:
+            for day in ("2026-05-10", "2026-05-11"):
+                slots = pd.date_range(day, periods=48, freq="30min")
+                readings = [{"date": t.strftime("%Y-%m-%d %H:%M:%S"), "value": "100"} for t in slots]
+                z.writestr(f"conso_30min/conso_{day}.json", json.dumps({"interval_reading": readings}))
+
+        with mock.patch.object(config, "ZIP_FILE", root / "raw_conso_files.zip"), \
+                mock.patch.object(config, "CSV_1H", root / "consumption_data_1h.csv"):
+            rebuild_from_archive(datetime(2026, 5, 10), datetime(2026, 5, 10), "1h")
+
+        hourly = pd.read_csv(root / "consumption_data_1h.csv", sep=";")
+        self.assertEqual(len(hourly), 24)
+        self.assertEqual(hourly["datetime"].iloc[[0, -1]].tolist(), ["2026-05-10 01:00:00", "2026-05-11 00:00:00"])
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,136 @@
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from conso_api_tools import async_client, config
+from common.job_journal import JobJournal, deferred_days, retry_delay
+from conso_api_tools.async_client import download_interval_data_async, fetch_units_async, retry_after_seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def _payload(url):
+    # Convention Enedis : horodatage de fin d'intervalle, de start 00:30 à end 00:00
+    query = parse_qs(urlparse(url).query)
+    slots = pd.date_range(query["start"][0], query["end"][0], freq="30min", inclusive="right")
+    return {"interval_reading": [{"date": t.strftime("%Y-%m-%d %H:%M:%S"), "value": "100", "interval_length": "PT30M"}
+                                 for t in slots]}
+
+
+class FakeClient:
+    def __init__(self, responses=None, delay=0.0):
+        self.responses = list(responses or [])
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        if self.responses:
+            return self.responses.pop(0)
+        return FakeResponse(200, _payload(url))
+
+
+class AsyncClientTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(async_client, "_get_headers", return_value={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_429_waits_for_retry_after_instead_of_fixed_delay(self):
+        client = FakeClient([FakeResponse(429, headers={"Retry-After": "7"}), FakeResponse(200, {"interval_reading": []})])
+        waits = []
+
+        async def fake_sleep(seconds):
+            waits.append(seconds)
+
+        with mock.patch.object(async_client, "get_http_client", return_value=client):
+            data = asyncio.run(download_interval_data_async("2025-04-01", end_date_str="2025-04-02", sleep=fake_sleep))
+
+        self.assertEqual(data, {"interval_reading": []})
+        self.assertEqual(waits, [7.0])
+        self.assertEqual(retry_after_seconds(FakeResponse(503), default=12), 12)
+
+    def test_intervals_download_concurrently_within_the_limit_and_archive_in_order(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        root = Path(tmp_dir.name)
+        client = FakeClient(delay=0.05)
+        units = [{"interval": interval, "start": date(2025, 4, d), "end": date(2025, 4, d + 1)}
+                 for interval in ("1h", "30min") for d in (1, 3, 5)]
+
+        with mock.patch.object(async_client, "get_http_client", return_value=client), \
+                mock.patch.object(config, "ZIP_FILE", root / "raw_conso_files.zip"), \
+                mock.patch.object(config, "CSV_1H", root / "consumption_data_1h.csv"), \
+                mock.patch.object(config, "CSV_30MIN", root / "consumption_data_30min.csv"):
+            summary = asyncio.run(fetch_units_async(units, concurrency=2))
+
+        self.assertEqual(client.max_in_flight, 2)
+        self.assertEqual(summary, {"requests": 6, "archived_days": 12, "failed": []})
+        with zipfile.ZipFile(root / "raw_conso_files.zip") as z:
+            names = z.namelist()
+        for folder in ("conso_1h", "conso_30min"):
+            members = [n for n in names if n.startswith(folder)]
+            self.assertEqual(members, [f"{folder}/conso_2025-04-0{d}.json" for d in range(1, 7)])
+        self.assertEqual(len(pd.read_csv(root / "consumption_data_30min.csv", sep=";")), 6 * 48)
+
+    def test_missing_and_partial_days_are_failed_and_not_checkpointed(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        root = Path(tmp_dir.name)
+        # Réponse sur 4 jours : le 2025-04-02 est absent, le 2025-04-03 s'arrête à midi
+        payload = _payload("https://api?start=2025-04-01&end=2025-04-05")
+        payload["interval_reading"] = [
+            r for r in payload["interval_reading"]
+            if not "2025-04-02 00:30:00" <= r["date"] <= "2025-04-03 00:00:00"
+            and not "2025-04-03 12:30:00" <= r["date"] <= "2025-04-04 00:00:00"
+        ]
+        journal = JobJournal(root / "backfill_journal.jsonl", source="conso")
+        units = [{"interval": "30min", "start": date(2025, 4, 1), "end": date(2025, 4, 4)}]
+
+        with mock.patch.object(async_client, "get_http_client",
+                               return_value=FakeClient([FakeResponse(200, payload)] * 2)), \
+                mock.patch.object(config, "ZIP_FILE", root / "raw_conso_files.zip"), \
+                mock.patch.object(config, "CSV_30MIN", root / "consumption_data_30min.csv"):
+            summary = asyncio.run(fetch_units_async(units, concurrency=1, journal=journal))
+            asyncio.run(fetch_units_async(units, concurrency=1, journal=journal))
+
+        self.assertEqual(summary["archived_days"], 3)
+        self.assertEqual(summary["failed"], [("30min", date(2025, 4, 2), date(2025, 4, 2)),
+                                             ("30min", date(2025, 4, 3), date(2025, 4, 3))])
+        downloaded = [r for r in journal.records if r["state"] == "downloaded"]
+        self.assertNotIn("2025-04-02", [r["start"] for r in downloaded])
+        self.assertEqual(journal.finish(date(2025, 3, 25), date(2025, 4, 4)), date(2025, 4, 1))
+        # Toujours absente : le délai avant nouvel essai s'allonge d'une exécution à l'autre
+        retry_at = deferred_days(journal.records, datetime(2025, 4, 5))
+        last_failure = datetime.fromisoformat(journal.records[-2]["ts"])
+        self.assertEqual(retry_at[date(2025, 4, 2)] - last_failure, timedelta(seconds=retry_delay(2)))
+
+if __name__ == "__main__":
+    unittest.main()
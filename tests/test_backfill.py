@@ -0,0 +1,215 @@
+import tempfile
+
+import pandas as pd
+import threading
+import time
+import unittest
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from common.job_journal import JobJournal
+from prod_api_tools import backfill
+from prod_api_tools.backfill import TokenBucket, TokenRefresher, backfill_production
+
+
+class BackfillTests(unittest.TestCase):
+    def test_token_bucket_waits_once_burst_is_consumed(self):
+        now = [0.0]
+        waits = []
+
+        def fake_sleep(seconds):
+            waits.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=fake_sleep)
+        for _ in range(4):
+            bucket.acquire()
+
+        self.assertEqual(waits, [0.5, 0.5])
+
+    def test_token_refresher_runs_a_single_refresh_for_concurrent_failures(self):
+        token = ["old"]
+        calls = []
+
+        def refresh():
+            calls.append(1)
+            time.sleep(0.05)
+            token[0] = "new"
+            return "new"
+
+        refresher = TokenRefresher(refresh, current=lambda: token[0])
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(refresher.refresh("old"))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["new"] * 5)
+
+    def test_backfill_integrates_days_in_date_order_and_keeps_going_on_failure(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        root = Path(tmp_dir.name)
+
+        def download(site_id, target_date, dest_dir, rate_limiter):
+            # Les premières journées finissent en dernier
+            time.sleep(0.02 * (5 - target_date.day))
+            if target_date.day == 3:
+                raise RuntimeError("no data")
+            path = Path(dest_dir) / "export.zip"
+            path.write_bytes(b"zip")
+            return path
+
+        integrated = []
+        with mock.patch.object(backfill, "download_raw_production_zip_file", side_effect=download), \
+                mock.patch.object(backfill, "integrate_production_zip",
+                                  side_effect=lambda **kw: integrated.append(kw["target_date"].day)), \
+                mock.patch.object(backfill, "backoff_delay", return_value=0):
+            summary = backfill_production(
+                start_date=datetime(2025, 4, 1),
+                end_date=datetime(2025, 4, 4),
+                site_id=1,
+                archive_path=root / "raw.zip",
+                csv_path_30min=root / "p_30min.csv",
+                csv_path_1h=root / "p_1h.csv",
+                workers=4,
+                rate_per_second=1000,
+                max_retries=1,
+                range_days=1,
+            )
+
+        self.assertEqual(integrated, [1, 2, 4])
+        self.assertEqual([d.day for d in summary["failed"]], [3])
+
+    def test_consecutive_days_are_exported_as_ranges_that_shrink_when_refused(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        root = Path(tmp_dir.name)
+        requested = []
+
+        def download(site_id, target_date, dest_dir, rate_limiter, end_date=None):
+            end_date = end_date or target_date
+            requested.append((target_date.day, end_date.day))
+            if (end_date - target_date).days >= 2:
+                raise RuntimeError("Erreur Hoymiles : plage trop longue")
+            times = pd.date_range(target_date, end_date.replace(hour=23, minute=45), freq="15min")
+            raw = pd.DataFrame({"Time": times.strftime("%Y-%m-%d %H:%M:%S"), "Production (W)": 100.0})
+            path = Path(dest_dir) / "export.zip"
+            with zipfile.ZipFile(path, "w") as z:
+                z.writestr("station_power.csv", raw.to_csv(index=False))
+            return path
+
+        with mock.patch.object(backfill, "download_raw_production_zip_file", side_effect=download), \
+                mock.patch.object(backfill, "backoff_delay", return_value=0):
+            summary = backfill_production(
+                start_date=datetime(2025, 4, 1),
+                end_date=datetime(2025, 4, 6),
+                site_id=1,
+                archive_path=root / "raw.zip",
+                csv_path_30min=root / "p_30min.csv",
+                csv_path_1h=root / "p_1h.csv",
+                workers=1,
+                rate_per_second=1000,
+                max_retries=0,
+                range_days=4,
+            )
+
+        self.assertEqual(requested[0], (1, 4))
+        self.assertEqual(sorted(requested[1:]), [(1, 2), (3, 4), (5, 6)])
+        self.assertEqual(summary["requests"], 3)
+        self.assertEqual([d.day for d in summary["downloaded"]], [1, 2, 3, 4, 5, 6])
+        with zipfile.ZipFile(root / "raw.zip") as z:
+            self.assertEqual(sorted(z.namelist()), [f"prod_2025-04-0{d}.csv" for d in range(1, 7)])
+        resampled = pd.read_csv(root / "p_30min.csv", sep=";")
+        self.assertEqual(len(resampled), 6 * 48)
+
+    def test_only_refused_ranges_shrink_and_integration_errors_are_not_downloaded_again(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        root = Path(tmp_dir.name)
+        requested = []
+
+        def download(site_id, target_date, dest_dir, rate_limiter, end_date=None):
+            requested.append((target_date.day, (end_date or target_date).day))
+            if target_date.day == 1:
+                raise ConnectionError("connexion interrompue")
+            path = Path(dest_dir) / "export.zip"
+            path.write_bytes(b"not a zip")
+            return path
+
+        journal = JobJournal(root / "backfill_journal.jsonl", "production")
+        with mock.patch.object(backfill, "download_raw_production_zip_file", side_effect=download), \
+                mock.patch.object(backfill, "backoff_delay", return_value=0):
+            summary = backfill_production(
+                start_date=datetime(2025, 4, 1),
+                end_date=datetime(2025, 4, 4),
+                site_id=1,
+                archive_path=root / "raw.zip",
+                csv_path_30min=root / "p_30min.csv",
+                csv_path_1h=root / "p_1h.csv",
+                workers=1,
+                rate_per_second=1000,
+                max_retries=0,
+                range_days=2,
+                journal=journal,
+            )
+
+        self.assertEqual(requested, [(1, 2), (3, 4)])
+        self.assertEqual(summary["requests"], 1)
+        self.assertEqual(summary["failed"][datetime(2025, 4, 1)], "connexion interrompue")
+        self.assertTrue(summary["failed"][datetime(2025, 4, 3)].startswith("intégration : "))
+        self.assertEqual(sorted(d.day for d in summary["failed"]), [1, 2, 3, 4])
+        self.assertFalse(any("redécoupée" in r.get("reason", "") for r in journal.records))
+
+    def test_journal_defers_failed_days_on_next_run_and_checkpoints_before_them(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        root = Path(tmp_dir.name)
+        requested = []
+
+        def download(site_id, target_date, dest_dir, rate_limiter):
+            requested.append(target_date.day)
+            if target_date.day == 3:
+                raise RuntimeError("no data")
+            path = Path(dest_dir) / "export.zip"
+            path.write_bytes(b"zip")
+            return path
+
+        def run():
+            journal = JobJournal(root / "backfill_journal.jsonl", "production")
+            summary = backfill_production(
+                start_date=datetime(2025, 4, 1),
+                end_date=datetime(2025, 4, 4),
+                site_id=1,
+                archive_path=root / "raw.zip",
+                csv_path_30min=root / "p_30min.csv",
+                csv_path_1h=root / "p_1h.csv",
+                workers=1,
+                rate_per_second=1000,
+                max_retries=0,
+                range_days=1,
+                journal=journal,
+            )
+            return summary, journal
+
+        with mock.patch.object(backfill, "download_raw_production_zip_file", side_effect=download), \
+                mock.patch.object(backfill, "integrate_production_zip", side_effect=lambda **kw: None), \
+                mock.patch.object(backfill, "backoff_delay", return_value=0):
+            first, journal = run()
+            self.assertEqual(journal.finish(datetime(2025, 3, 25), datetime(2025, 4, 4)).day, 2)
+            requested.clear()
+            second, journal = run()
+
+        self.assertEqual([d.day for d in first["failed"]], [3])
+        self.assertEqual([d.day for d in second["deferred"]], [3])
+        self.assertNotIn(3, requested)
+        states = [(r["start"], r["state"]) for r in journal.records if r["start"] == "2025-04-03"]
+        self.assertEqual(states, [("2025-04-03", "planned"), ("2025-04-03", "failed")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from common import coverage
+from common.coverage import compute_day_bitmaps, coverage_path, get_series_coverage, incomplete_days, is_day_complete
+from common.storage import append_series, get_backend, write_series
+from common.utils import resampled_data_exists_for_date
+
+
+class CoverageTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.csv_30min = Path(self.tmp_dir.name) / "production_data_30min.csv"
+        self.csv_1h = Path(self.tmp_dir.name) / "production_data_1h.csv"
+
+    def test_compute_day_bitmaps_sets_one_bit_per_half_hour_slot(self):
+        index = pd.DatetimeIndex(["2025-03-25 00:00", "2025-03-25 00:45", "2025-03-25 23:30", "2025-03-26 01:00"])
+
+        bitmaps = compute_day_bitmaps(index)
+
+        self.assertEqual(bitmaps["2025-03-25"], (1 << 0) | (1 << 1) | (1 << 47))
+        self.assertEqual(bitmaps["2025-03-26"], 1 << 2)
+
+    def test_day_completeness_rules_per_interval(self):
+        hourly = compute_day_bitmaps(pd.date_range("2025-03-25", periods=24, freq="1h"))["2025-03-25"]
+        half_hours_only = compute_day_bitmaps(pd.date_range("2025-03-25 00:30", periods=24, freq="1h"))["2025-03-25"]
+
+        self.assertTrue(is_day_complete(hourly, "1h"))
+        self.assertTrue(is_day_complete(half_hours_only, "30min"))
+        self.assertFalse(is_day_complete(half_hours_only, "1h"))
+        self.assertFalse(is_day_complete(hourly & ~(1 << 46), "30min"))
+
+    def test_index_follows_store_writes(self):
+        backend = get_backend("parquet")
+        day = pd.date_range("2025-03-25", periods=24, freq="1h")
+        write_series(pd.DataFrame({"production": 1.0}, index=day.rename("datetime")), self.csv_1h, backend)
+        write_series(pd.DataFrame({"production": 1.0}, index=day[:12].rename("datetime")), self.csv_30min, backend)
+
+        self.assertFalse(resampled_data_exists_for_date(datetime(2025, 3, 25), self.csv_30min, self.csv_1h))
+
+        append_series(pd.DataFrame({"production": 1.0}, index=day[12:].rename("datetime")), self.csv_30min, backend)
+
+        self.assertTrue(resampled_data_exists_for_date(datetime(2025, 3, 25), self.csv_30min, self.csv_1h))
+        self.assertEqual(
+            incomplete_days(self.csv_30min, date(2025, 3, 24), date(2025, 3, 26), "30min"),
+            [date(2025, 3, 24), date(2025, 3, 26)],
+        )
+
+    def test_versioned_index_is_reused_after_checkout_and_stale_index_is_rebuilt(self):
+        backend = get_backend("parquet")
+        days = pd.date_range("2025-03-25", periods=3 * 48, freq="30min").rename("datetime")
+        write_series(pd.DataFrame({"production": 1.0}, index=days[:48]), self.csv_30min, backend)
+        stale_index = Path(self.tmp_dir.name) / "stale_index.json"
+        shutil.copy(coverage_path(self.csv_30min), stale_index)
+        append_series(pd.DataFrame({"production": 1.0}, index=days[48:96]), self.csv_30min, backend)
+
+        # Checkout : même contenu, nouveaux mtimes → pas de relecture du CSV
+        os.utime(self.csv_30min, ns=(0, 0))
+        with mock.patch.object(coverage.pd, "read_csv", side_effect=AssertionError("CSV relu")):
+            self.assertEqual(len(get_series_coverage(self.csv_30min)), 2)
+
+        # Index périmé (non versionné avec le CSV) : reconstruit avant d'être complété
+        shutil.copy(stale_index, coverage_path(self.csv_30min))
+        coverage._INDEX_CACHE.clear()
+        append_series(pd.DataFrame({"production": 1.0}, index=days[96:]), self.csv_30min, backend)
+        self.assertEqual(incomplete_days(self.csv_30min, date(2025, 3, 25), date(2025, 3, 27), "30min"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from app.core import data_manager, merged_store
+from common.storage import write_series
+
+
+class DataManagerCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.conso_csv = Path(self.tmp_dir.name) / "conso.csv"
+        self.prod_csv = Path(self.tmp_dir.name) / "prod.csv"
+        self.conso_csv.write_text("datetime;consommation\n2024-01-01 00:30:00;1\n")
+        self.prod_csv.write_text("datetime;production\n2024-01-01 00:00:00;2\n")
+
+        for patcher in (
+            mock.patch.object(data_manager, "conso_csv", self.conso_csv),
+            mock.patch.object(data_manager, "prod_csv", self.prod_csv),
+            mock.patch.object(data_manager, "DEFAULT_PRICE_DATA_PATH", Path(self.tmp_dir.name) / "prices.csv"),
+            mock.patch.object(data_manager, "DEFAULT_TARIFF_PATH", Path(self.tmp_dir.name) / "tariff.json"),
+            mock.patch.object(data_manager, "MERGED_STORE", Path(self.tmp_dir.name) / "merged" / "merged_data"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        data_manager.clear_merged_cache()
+        self.addCleanup(data_manager.clear_merged_cache)
+
+    def test_load_merged_data_reuses_cache_until_a_source_changes(self):
+        build = mock.Mock(side_effect=lambda **kwargs: (pd.DataFrame({"datetime": [pd.Timestamp("2024-01-01")]}),
+                                                        {"since": None, "full": False}))
+        with mock.patch.object(data_manager, "update_merged_store", build):
+            first = data_manager.load_merged_data()
+            second = data_manager.load_merged_data()
+            self.assertIs(first, second)
+            self.assertEqual(build.call_count, 1)
+
+            stat = self.prod_csv.stat()
+            self.prod_csv.write_text("datetime;production\n2024-01-01 00:00:00;2\n2024-01-01 00:30:00;3\n")
+            os.utime(self.prod_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+            third = data_manager.load_merged_data()
+            self.assertIsNot(first, third)
+            self.assertEqual(build.call_count, 2)
+
+    def test_merged_data_is_materialized_and_reread_until_a_source_changes(self):
+        merged = data_manager.load_merged_data()
+        self.assertEqual(list(merged["total"]), [3])
+        self.assertTrue((Path(self.tmp_dir.name) / "merged" / "merged_data" / "2024-01.parquet").exists())
+
+        # Nouveau processus : relecture du jeu matérialisé, sans nouvelle fusion
+        data_manager.clear_merged_cache()
+        with mock.patch.object(merged_store, "merge_conso_prod_data") as build:
+            reread = data_manager.load_merged_data()
+        build.assert_not_called()
+        pd.testing.assert_frame_equal(reread, merged, check_dtype=False)
+
+        data_manager.clear_merged_cache()
+        self.conso_csv.write_text("datetime;consommation\n2024-01-01 00:30:00;5\n")
+        later = time.time_ns() + 1_000_000_000
+        os.utime(self.conso_csv, ns=(later, later))
+        self.assertEqual(list(data_manager.load_merged_data()["total"]), [7])
+
+        export = data_manager.export_merged_csv(Path(self.tmp_dir.name) / "global.csv")
+        self.assertEqual(pd.read_csv(export, sep=";")["total"].tolist(), [7])
+
+    def test_tariff_contract_is_read_once_per_merge(self):
+        (Path(self.tmp_dir.name) / "tariff.json").write_text(json.dumps({
+            "name": "Base", "default_period": "Base", "prices": {"Base": 0.20}}))
+        with mock.patch.object(data_manager, "load_tariff_contract",
+                               wraps=data_manager.load_tariff_contract) as load, \
+                mock.patch.object(merged_store, "load_tariff_contract",
+                                  wraps=merged_store.load_tariff_contract) as reload:
+            merged = data_manager.load_merged_data()
+
+        self.assertEqual(load.call_count, 1)
+        reload.assert_not_called()
+        self.assertEqual(data_manager.load_tariff()["name"], "Base")
+        self.assertAlmostEqual(merged["price_eur_per_kwh"].iloc[0], 0.20)
+
+    def test_hourly_window_pairs_each_hour_of_both_series(self):
+        conso_1h = Path(self.tmp_dir.name) / "conso_1h.csv"
+        prod_1h = Path(self.tmp_dir.name) / "prod_1h.csv"
+        hours = pd.date_range("2024-01-01", periods=4, freq="1h")
+        # Consommation horodatée en fin d'heure, production en début d'heure
+        write_series(pd.DataFrame({"datetime": hours + np.timedelta64(1, "h"),
+                                   "consommation": [10.0, 20.0, 30.0, 40.0]}), conso_1h)
+        write_series(pd.DataFrame({"datetime": hours, "production": [1.0, 2.0, 3.0, 4.0]}), prod_1h)
+
+        with mock.patch.object(data_manager, "conso_csv_1h", conso_1h), \
+                mock.patch.object(data_manager, "prod_csv_1h", prod_1h):
+            window = data_manager.load_window("2024-01-01 01:00", "2024-01-01 02:00", "1h")
+        self.assertEqual(list(window["datetime"]), list(hours[1:3]))
+        self.assertEqual(list(window["consommation"]), [20.0, 30.0])
+        self.assertEqual(list(window["total"]), [22.0, 33.0])
+
+    def test_period_options_are_computed_once_per_dataset_version(self):
+        df = pd.DataFrame({"datetime": pd.date_range("2024-12-28", "2025-02-03", freq="30min")})
+        build = mock.Mock(return_value=(df, {"since": None, "full": False}))
+        with mock.patch.object(data_manager, "update_merged_store", build), \
+                mock.patch.object(data_manager, "compute_period_options",
+                                  wraps=data_manager.compute_period_options) as compute:
+            options = data_manager.load_period_options(data_manager.load_merged_data())
+            self.assertIs(data_manager.load_period_options(), options)
+            self.assertEqual(compute.call_count, 1)
+
+        self.assertEqual(options["min"], pd.Timestamp("2024-12-28"))
+        self.assertEqual([str(m) for m in options["M"]], ["2024-12", "2025-01", "2025-02"])
+        expected = df["datetime"].dt.to_period("W").drop_duplicates().sort_values()
+        self.assertEqual(options["W"], list(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
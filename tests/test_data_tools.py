@@ -1,14 +1,18 @@
+import numpy as np
 import pandas as pd
+import tempfile
 import unittest
+from pathlib import Path
 
-from common.data_tools import merge_conso_prod_data
+from app.core.statistics import compute_summary
+from common.data_tools import load_price_data, merge_conso_prod_data, price_at
 
 
 class DataToolsTests(unittest.TestCase):
     def test_merge_conso_prod_data_adds_cost_columns_from_price_series(self):
         conso_df = pd.DataFrame(
             {
-                "datetime": ["2024-01-01T00:00:00", "2024-01-01T00:30:00"],
+                "datetime": ["2024-01-01T00:30:00", "2024-01-01T01:00:00"],
                 "consumption": [1000, 2000],
             }
         )
@@ -32,6 +36,72 @@ class DataToolsTests(unittest.TestCase):
         self.assertAlmostEqual(merged_df.loc[0, "consumption_cost_eur"], 0.25)
         self.assertAlmostEqual(merged_df.loc[0, "production_savings_eur"], 0.125)
 
+    def test_price_at_applies_sparse_change_points_at_any_resolution(self):
+        price_df = pd.DataFrame({
+            "datetime": pd.to_datetime(["2024-01-01 06:00", "2024-03-01 00:00"]),
+            "price_eur_per_kwh": [0.20, 0.25],
+        })
+        hourly = pd.date_range("2024-01-01", "2024-06-01", freq="1h")
+        expected = np.where(hourly < "2024-01-01 06:00", np.nan, np.where(hourly < "2024-03-01", 0.20, 0.25))
+        np.testing.assert_array_equal(price_at(hourly, price_df), expected)
+
+        # Échantillons bruts irréguliers, non triés
+        raw = pd.to_datetime(["2024-03-01 00:00:07", "2024-02-29 23:59:59", "2023-12-31 12:00:00"])
+        np.testing.assert_array_equal(price_at(raw, price_df), [0.25, 0.20, np.nan])
+
+    def test_validity_intervals_bound_each_price(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            price_path = Path(tmp_dir) / "prices.csv"
+            price_path.write_text(
+                "valid_from;valid_to;price\n"
+                "2024-01-01 00:00;2024-01-01 01:00;0.10\n"
+                "2024-01-01 02:00;;0.30\n")
+            price_df = load_price_data(price_path)
+
+        datetimes = pd.date_range("2024-01-01", periods=6, freq="30min")
+        conso_df = pd.DataFrame({"datetime": datetimes + np.timedelta64(30, "m"), "consommation": [1000.0] * 6})
+        prod_df = pd.DataFrame({"datetime": datetimes, "production": [1000.0] * 6})
+        merged_df = merge_conso_prod_data(conso_df, prod_df, price_df=price_df)
+        self.assertEqual(list(merged_df["consumption_cost_eur"]), [0.10, 0.10, 0.0, 0.0, 0.30, 0.30])
+
+    def test_energy_balance_is_computed_per_slot(self):
+        datetimes = pd.date_range("2024-06-01 10:00", periods=4, freq="30min")
+        conso_df = pd.DataFrame({"datetime": datetimes + np.timedelta64(30, "m"),
+                                 "consommation": [400.0, 400.0, 800.0, 0.0]})
+        prod_df = pd.DataFrame({"datetime": datetimes, "production": [1000.0, 0.0, 400.0, 200.0]})
+        price_df = pd.DataFrame({"datetime": ["2024-01-01"], "price_eur_per_kwh": [0.25]})
+
+        merged_df = merge_conso_prod_data(conso_df, prod_df, price_df=price_df)
+        self.assertEqual(list(merged_df["autoconsommation"]), [400.0, 0.0, 400.0, 0.0])
+        self.assertEqual(list(merged_df["injection"]), [600.0, 0.0, 0.0, 200.0])
+        self.assertEqual(list(merged_df["soutirage"]), [0.0, 400.0, 400.0, 0.0])
+        # Seule l'énergie autoconsommée évite un achat
+        self.assertAlmostEqual(merged_df["production_savings_eur"].sum(), 0.2)
+
+        # Totaux égaux (1600 Wh) : l'ancien ratio production / consommation affichait 100 %
+        summary = compute_summary(merged_df)
+        self.assertEqual(summary["autoconsommation_%"], 50.0)
+        self.assertEqual(summary["autoproduction_%"], 50.0)
+        self.assertEqual(summary["surplus_%"], 50.0)
+        self.assertEqual(summary["soutirage_kWh"], 0.8)
+
+    def test_end_labelled_consumption_is_paired_with_the_same_production_slot(self):
+        # Pas 10:00-10:30 : consommation horodatée 10:30 (Enedis), production 10:00
+        conso_df = pd.DataFrame({"datetime": pd.to_datetime(["2024-06-01 10:30", "2024-06-01 11:00"]),
+                                 "consommation": [300.0, 900.0]})
+        prod_df = pd.DataFrame({"datetime": pd.to_datetime(["2024-06-01 10:00", "2024-06-01 10:30"]),
+                                "production": [1000.0, 0.0]})
+        price_df = pd.DataFrame({"datetime": ["2024-01-01"], "price_eur_per_kwh": [0.25]})
+
+        merged_df = merge_conso_prod_data(conso_df, prod_df, price_df=price_df)
+        self.assertEqual(list(merged_df["datetime"]), list(prod_df["datetime"]))
+        self.assertEqual(list(merged_df["autoconsommation"]), [300.0, 0.0])
+        self.assertEqual(list(merged_df["soutirage"]), [0.0, 900.0])
+
+        merged_start = merge_conso_prod_data(conso_df.assign(datetime=prod_df["datetime"]), prod_df,
+                                             price_df=price_df, conso_label="start")
+        pd.testing.assert_frame_equal(merged_start, merged_df)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.core.downsampling import downsample_frame, lttb_indices, minmax_indices
+from app.core.visualization import plot_production_vs_consumption, select_resolution
+
+
+class DownsamplingTests(unittest.TestCase):
+    def setUp(self):
+        datetimes = pd.date_range("2025-03-25", periods=48 * 365 * 3, freq="30min")
+        hours = datetimes.hour.to_numpy() + datetimes.minute.to_numpy() / 60
+        production = np.clip(np.sin((hours - 6) / 12 * np.pi), 0, None) * 1000
+        production[30_000] = 5000.0  # pic isolé
+        self.df = pd.DataFrame({
+            "datetime": datetimes,
+            "consommation": 300 + 50 * np.cos(hours / 24 * 2 * np.pi),
+            "production": production,
+        })
+        self.df["total"] = self.df["consommation"] + self.df["production"]
+
+    def test_indices_are_bounded_sorted_and_keep_endpoints_and_peaks(self):
+        y = self.df["production"].to_numpy()
+        x = np.arange(len(y), dtype="float64")
+        for idx in (lttb_indices(x, y, 1000), minmax_indices(y, 1000)):
+            self.assertLessEqual(len(idx), 1002)
+            self.assertEqual(idx[0], 0)
+            self.assertEqual(idx[-1], len(y) - 1)
+            self.assertTrue((np.diff(idx) > 0).all())
+            self.assertIn(30_000, idx)
+
+    def test_chart_payload_is_bounded_and_ratio_recorded(self):
+        fig = plot_production_vs_consumption(self.df, max_points=1500)
+        meta = fig.layout.meta["downsampling"]
+
+        self.assertEqual(meta["points_in"], len(self.df))
+        self.assertLessEqual(meta["points_out"], 3 * 1500)
+        self.assertAlmostEqual(meta["ratio"], meta["points_out"] / len(self.df), places=4)
+        for trace in fig.data:
+            self.assertEqual(len(trace.x), meta["points_out"])
+        self.assertEqual(max(fig.data[1].y), 5000.0)
+
+    def test_small_frames_are_left_untouched(self):
+        small = self.df.iloc[:100]
+        kept, stats = downsample_frame(small, ["production"], max_points=500, method="minmax")
+        self.assertEqual(len(kept), 100)
+        self.assertEqual(stats["ratio"], 1.0)
+
+    def test_zoom_window_is_reloaded_at_finest_fitting_resolution(self):
+        self.assertEqual(select_resolution("2025-04-01", "2025-04-08", max_points=2000), "30min")
+        self.assertEqual(select_resolution("2025-04-01", "2025-06-01", max_points=2000), "1h")
+
+        calls = []
+
+        def loader(start, end, resolution):
+            calls.append((start, end, resolution))
+            mask = (self.df["datetime"] >= start) & (self.df["datetime"] <= end)
+            return self.df.loc[mask]
+
+        fig = plot_production_vs_consumption(
+            self.df, max_points=2000,
+            x_range=("2025-04-02 00:00", "2025-04-05 00:00"),
+            window_loader=loader)
+        self.assertEqual(calls, [(pd.Timestamp("2025-04-02"), pd.Timestamp("2025-04-05"), "30min")])
+        self.assertEqual(fig.layout.meta["window"]["resolution"], "30min")
+        self.assertEqual(fig.layout.meta["downsampling"]["points_in"], 3 * 48 + 1)
+        self.assertEqual(len(fig.data[0].x), 3 * 48 + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
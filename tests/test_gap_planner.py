@@ -0,0 +1,117 @@
+import tempfile
+import unittest
+import zipfile
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from common.coverage import day_range
+from common.data_tools import interval_step
+from common.gap_planner import COMBINED_INTERVAL, coalesce_days, format_plan, plan_consumption, plan_production
+from common.storage import write_series
+
+
+class GapPlannerTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.root = Path(self.tmp_dir.name)
+
+    def _series(self, csv_path, column, days, freq, end_labelled=False):
+        # Consommation Enedis : horodatage de fin d'intervalle (00:30 / 01:00 … 24:00)
+        offset = interval_step(freq) if end_labelled else np.timedelta64(0, "ns")
+        index = pd.DatetimeIndex(np.concatenate([
+            pd.date_range(pd.Timestamp(day) + offset, periods=48 if freq == "30min" else 24, freq=freq)
+            for day in days
+        ]), name="datetime")
+        write_series(pd.DataFrame({column: 1.0}, index=index), csv_path)
+
+    def test_coalesce_splits_runs_at_provider_limit(self):
+        days = day_range(date(2025, 4, 1), date(2025, 4, 12))
+        needed = np.zeros(len(days), dtype=bool)
+        needed[[0, 1, 2, 3, 4, 7, 11]] = True
+
+        self.assertEqual(coalesce_days(days, needed, 3), [
+            (date(2025, 4, 1), date(2025, 4, 3)),
+            (date(2025, 4, 4), date(2025, 4, 5)),
+            (date(2025, 4, 8), date(2025, 4, 8)),
+            (date(2025, 4, 12), date(2025, 4, 12)),
+        ])
+
+    def test_production_plan_downloads_missing_days_and_rebuilds_archived_ones(self):
+        archive = self.root / "raw_prod_files.zip"
+        with zipfile.ZipFile(archive, "w") as z:
+            for day in ["2025-04-01", "2025-04-02", "2025-04-05"]:
+                z.writestr(f"prod_{day}.csv", "datetime;production\n")
+        csv_30min, csv_1h = self.root / "production_data_30min.csv", self.root / "production_data_1h.csv"
+        self._series(csv_30min, "production", ["2025-04-01", "2025-04-02"], "30min")
+        self._series(csv_1h, "production", ["2025-04-01"], "1h")
+
+        plan = plan_production(date(2025, 4, 1), date(2025, 4, 8), archive, csv_30min, csv_1h, max_days=2)
+
+        self.assertEqual([(u["action"], u["start"].day, u["end"].day) for u in plan], [
+            ("rebuild", 2, 2),
+            ("download", 3, 4),
+            ("rebuild", 5, 5),
+            ("download", 6, 7),
+            ("download", 8, 8),
+        ])
+        self.assertIn("3 requête(s) API", format_plan(plan))
+
+    def test_consumption_plan_is_computed_per_interval(self):
+        archive = self.root / "raw_conso_files.zip"
+        with zipfile.ZipFile(archive, "w") as z:
+            for day in ["2025-04-01", "2025-04-02", "2025-04-03"]:
+                z.writestr(f"conso_30min/conso_{day}.json", "{}")
+            z.writestr("conso_1h/conso_2025-04-01.json", "{}")
+        csv_30min, csv_1h = self.root / "consumption_data_30min.csv", self.root / "consumption_data_1h.csv"
+        self._series(csv_30min, "consommation", ["2025-04-01", "2025-04-02", "2025-04-03"], "30min", True)
+        self._series(csv_1h, "consommation", ["2025-04-01"], "1h", True)
+
+        plan = plan_consumption(date(2025, 4, 1), date(2025, 4, 3), archive,
+                                {"1h": csv_1h, "30min": csv_30min}, max_days=7)
+
+        self.assertEqual([(u["interval"], u["action"], u["start"].day, u["days"]) for u in plan],
+                         [("1h", "download", 2, 2)])
+
+    def test_combined_consumption_plan_downloads_30min_once_and_derives_1h(self):
+        archive = self.root / "raw_conso_files.zip"
+        with zipfile.ZipFile(archive, "w") as z:
+            for day in ["2025-04-01", "2025-04-02"]:
+                z.writestr(f"conso_30min/conso_{day}.json", "{}")
+            z.writestr("conso_1h/conso_2025-04-01.json", "{}")
+        csv_30min, csv_1h = self.root / "consumption_data_30min.csv", self.root / "consumption_data_1h.csv"
+        self._series(csv_30min, "consommation", ["2025-04-01", "2025-04-02"], "30min", True)
+        self._series(csv_1h, "consommation", ["2025-04-01"], "1h", True)
+
+        plan = plan_consumption(date(2025, 4, 1), date(2025, 4, 5), archive,
+                                {"1h": csv_1h, "30min": csv_30min}, max_days=7, combined=True)
+
+        self.assertEqual([(u["interval"], u["action"], u["start"].day, u["days"]) for u in plan],
+                         [(COMBINED_INTERVAL, "download", 3, 3), ("1h", "rebuild", 2, 1)])
+
+    def test_end_labelled_day_is_complete_without_the_previous_day(self):
+        archive = self.root / "raw_conso_files.zip"
+        with zipfile.ZipFile(archive, "w") as z:
+            z.writestr("conso_30min/conso_2025-04-02.json", "{}")
+            z.writestr("conso_1h/conso_2025-04-02.json", "{}")
+        csv_30min, csv_1h = self.root / "consumption_data_30min.csv", self.root / "consumption_data_1h.csv"
+        # 2025-04-02 01:00 … 2025-04-03 00:00 : aucune valeur le 1er avril
+        self._series(csv_30min, "consommation", ["2025-04-02"], "30min", True)
+        self._series(csv_1h, "consommation", ["2025-04-02"], "1h", True)
+
+        plan = plan_consumption(date(2025, 4, 2), date(2025, 4, 2), archive,
+                                {"1h": csv_1h, "30min": csv_30min}, max_days=7, combined=True)
+        self.assertEqual(plan, [])
+
+        # Sans la lecture de 24:00 (portée par le lendemain), la journée n'est pas complète
+        write_series(pd.read_csv(csv_1h, sep=";").iloc[:-1], csv_1h)
+        plan = plan_consumption(date(2025, 4, 2), date(2025, 4, 2), archive,
+                                {"1h": csv_1h, "30min": csv_30min}, max_days=7, combined=True)
+        self.assertEqual([(u["interval"], u["action"]) for u in plan], [("1h", "rebuild")])
+
+
+if __name__ == "__main__":
+    unittest.main()
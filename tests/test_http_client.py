@@ -0,0 +1,73 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common.http_client import HttpClient, lazy_client
+from prod_api_tools import api_client as prod_api_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    statuses = []
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_GET(self):
+        status = self.statuses.pop(0) if self.statuses else 200
+        body = b"ok"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpClientTests(unittest.TestCase):
+    def setUp(self):
+        _Handler.connections = 0
+        _Handler.statuses = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def test_session_reuses_connection_and_retries_transient_status(self):
+        _Handler.statuses = [503]
+        with HttpClient(backoff_factor=0) as client:
+            responses = [client.get(self.url) for _ in range(3)]
+
+        self.assertEqual([r.status_code for r in responses], [200, 200, 200])
+        self.assertEqual(_Handler.connections, 1)
+
+    def test_status_retries_can_be_disabled(self):
+        _Handler.statuses = [503]
+        with HttpClient(status_forcelist=()) as client:
+            self.assertEqual(client.get(self.url).status_code, 503)
+
+    def test_hoymiles_client_leaves_retries_to_download_with_retry(self):
+        client = prod_api_client._build_http_client()
+        self.addCleanup(client.close)
+        retry = client.session.get_adapter(self.url).max_retries
+
+        self.assertEqual(tuple(retry.status_forcelist), ())
+        self.assertEqual(retry.allowed_methods, frozenset({"GET"}))
+        self.assertFalse(retry.is_retry("POST", 503))
+        self.assertNotIn("authorization", client.session.headers)
+        self.assertEqual(client.session.headers["Origin"], "https://global.hoymiles.com")
+
+    def test_lazy_client_is_shared_until_reset(self):
+        get_client = lazy_client(HttpClient)
+        first = get_client()
+        self.assertIs(first, get_client())
+        get_client.reset()
+        self.assertIsNot(first, get_client())
+
+
+if __name__ == "__main__":
+    unittest.main()
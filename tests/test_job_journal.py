@@ -0,0 +1,89 @@
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from common.job_journal import JobJournal, format_status, journal_status, read_journal, retry_delay
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class JobJournalTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = Path(self.tmp_dir.name) / "backfill_journal.jsonl"
+        self.clock = FakeClock(datetime(2025, 5, 1, 8, 0))
+
+    def _unit(self, start_day, end_day, interval="30min+1h"):
+        return {"interval": interval, "action": "download",
+                "start": date(2025, 4, start_day), "end": date(2025, 4, end_day)}
+
+    def test_failed_days_are_deferred_with_exponential_backoff_across_runs(self):
+        for _ in range(2):
+            JobJournal(self.path, "consommation", clock=self.clock).record(self._unit(3, 4), "failed", "HTTP 500")
+        self.clock.now += timedelta(seconds=retry_delay(2) - 60)
+
+        journal = JobJournal(self.path, "consommation", clock=self.clock)
+        self.assertEqual(journal.deferred_days(), [date(2025, 4, 3), date(2025, 4, 4)])
+
+        self.clock.now += timedelta(seconds=120)
+        self.assertEqual(JobJournal(self.path, "consommation", clock=self.clock).deferred_days(), [])
+        self.assertEqual(retry_delay(2), 2 * retry_delay(1))
+
+        journal.record(self._unit(3, 4), "downloaded")
+        journal.record(self._unit(3, 4), "failed", "archivage")
+        self.assertEqual(JobJournal(self.path, "consommation", clock=self.clock).deferred_days(),
+                         [date(2025, 4, 3), date(2025, 4, 4)])
+        self.assertEqual(JobJournal(self.path, "production", clock=self.clock).deferred_days(), [])
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        start = datetime(2025, 3, 25)
+        journal = JobJournal(self.path, "consommation", clock=self.clock)
+        self.assertEqual(journal.resume_date(start), start)
+        for unit in [self._unit(1, 2), self._unit(3, 4), self._unit(5, 6)]:
+            journal.record(unit, "planned")
+        journal.record(self._unit(1, 2), "resampled")
+        journal.record(self._unit(5, 6), "resampled")
+        # Arrêt brutal pendant l'écriture d'une ligne
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"ts": "2025-05-01T08')
+
+        self.assertEqual(journal.finish(start, datetime(2025, 4, 6)), date(2025, 4, 2))
+        resumed = JobJournal(self.path, "consommation", clock=self.clock)
+        self.assertEqual(resumed.resume_date(start), datetime(2025, 4, 3))
+        self.assertEqual(len(read_journal(self.path)), 6)
+
+        # Une exécution partielle, postérieure au point de reprise, ne le déplace pas
+        partial = JobJournal(self.path, "consommation", clock=self.clock)
+        partial.record(self._unit(10, 10), "resampled")
+        self.assertIsNone(partial.finish(datetime(2025, 4, 10), datetime(2025, 4, 10)))
+
+    def test_status_reports_throughput_and_error_rate_per_provider(self):
+        conso = JobJournal(self.path, "consommation", clock=self.clock)
+        conso.record(self._unit(1, 7), "downloaded")
+        self.clock.now += timedelta(minutes=30)
+        conso.record(self._unit(1, 7), "resampled")
+        conso.record(self._unit(8, 8), "planned")
+        prod = JobJournal(self.path, "production", clock=self.clock)
+        for state in ("downloaded", "failed", "failed", "failed"):
+            prod.record(self._unit(1, 1, interval=None), state, "HTTP 503" if state == "failed" else None)
+
+        status = journal_status(read_journal(self.path), now=self.clock.now)
+
+        self.assertEqual(status.loc["consommation", "requêtes"], 1)
+        self.assertEqual(status.loc["consommation", "jours / heure"], 14.0)
+        self.assertEqual(status.loc["consommation", "interrompues"], 1)
+        self.assertEqual(status.loc["production", "taux d'erreur"], 0.75)
+        self.assertEqual(status.loc["production", "jours différés"], 1)
+        self.assertIn("taux d'erreur 75.0%", format_status(status))
+
+
+if __name__ == "__main__":
+    unittest.main()
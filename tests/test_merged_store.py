@@ -0,0 +1,88 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from app.core import merged_store
+from app.core.merged_store import update_merged_store
+from common.data_tools import load_price_data, merge_conso_prod_data
+from common.storage import append_series, read_series, write_series
+
+
+def _series(column, start, periods, seed):
+    rng = np.random.default_rng(seed)
+    datetimes = pd.date_range(start, periods=periods, freq="30min")
+    if column == "consommation":
+        # Consommation Enedis horodatée en fin de pas
+        datetimes = datetimes + np.timedelta64(30, "m")
+    return pd.DataFrame({
+        "datetime": datetimes,
+        column: rng.uniform(0, 1000, periods).round(),
+    })
+
+
+class MergedStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        root = Path(self.tmp_dir.name)
+        self.conso_csv = root / "conso" / "consumption_data_30min.csv"
+        self.prod_csv = root / "prod" / "production_data_30min.csv"
+        self.price_csv = root / "conso" / "prices.csv"
+        self.store = root / "merged" / "merged_data"
+
+        write_series(_series("consommation", "2025-01-20", 48 * 20, 0), self.conso_csv)
+        write_series(_series("production", "2025-01-20", 48 * 20, 1), self.prod_csv)
+        pd.DataFrame({"datetime": ["2025-01-01", "2025-02-01"],
+                      "price_eur_per_kwh": [0.20, 0.25]}).to_csv(self.price_csv, sep=";", index=False)
+
+    def _update(self):
+        return update_merged_store(self.conso_csv, self.prod_csv, self.price_csv, self.store)
+
+    def _full_merge(self):
+        return merge_conso_prod_data(read_series(self.conso_csv).reset_index(),
+                                     read_series(self.prod_csv).reset_index(),
+                                     price_df=load_price_data(self.price_csv))
+
+    def test_daily_ingest_only_merges_the_new_day(self):
+        _, first = self._update()
+        self.assertTrue(first["full"])
+
+        append_series(_series("consommation", "2025-02-09", 48, 2), self.conso_csv)
+        append_series(_series("production", "2025-02-09", 48, 3), self.prod_csv)
+        with mock.patch.object(merged_store, "merge_conso_prod_data",
+                               wraps=merged_store.merge_conso_prod_data) as merge:
+            merged, change = self._update()
+
+        self.assertEqual(change, {"since": "2025-02-09T00:00:00", "full": False})
+        self.assertEqual(len(merge.call_args.args[0]), 48)
+        pd.testing.assert_frame_equal(merged, self._full_merge(), check_dtype=False)
+
+        # Relecture sans modification : rien n'est refusionné
+        with mock.patch.object(merged_store, "merge_conso_prod_data") as merge:
+            reread, change = self._update()
+        merge.assert_not_called()
+        self.assertIsNone(change["since"])
+        pd.testing.assert_frame_equal(reread, merged, check_dtype=False)
+
+    def test_corrections_and_new_prices_restart_from_first_changed_instant(self):
+        self._update()
+
+        corrected = _series("production", "2025-01-25 12:00", 4, 4)
+        append_series(corrected, self.prod_csv)
+        merged, change = self._update()
+        self.assertEqual(change["since"], "2025-01-25T12:00:00")
+        pd.testing.assert_frame_equal(merged, self._full_merge(), check_dtype=False)
+
+        with open(self.price_csv, "a") as f:
+            f.write("2025-02-05;0.30\n")
+        merged, change = self._update()
+        self.assertEqual(change, {"since": "2025-02-01T00:00:00", "full": False})
+        pd.testing.assert_frame_equal(merged, self._full_merge(), check_dtype=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
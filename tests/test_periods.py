@@ -0,0 +1,44 @@
+import unittest
+
+import pandas as pd
+
+from app.core.periods import extract_periods, floor_periods, period_bounds, period_label
+
+
+class PeriodTests(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            "datetime": pd.date_range("2024-12-20", "2025-04-10 23:30", freq="30min"),
+        })
+        self.df["production"] = range(len(self.df))
+
+    def test_floor_matches_to_period_start_times(self):
+        for freq in ("W", "M"):
+            expected = self.df["datetime"].dt.to_period(freq).dt.start_time.to_numpy()
+            self.assertTrue((floor_periods(self.df["datetime"], freq) == expected).all())
+        with self.assertRaises(ValueError):
+            floor_periods(self.df["datetime"], "D")
+
+    def test_extract_periods_does_not_mutate_and_labels_are_cached(self):
+        columns = list(self.df.columns)
+        period_list, labels = extract_periods(self.df, "W")
+
+        self.assertEqual(list(self.df.columns), columns)
+        self.assertEqual(period_list.iloc[0], pd.Timestamp("2024-12-16"))
+        self.assertEqual(labels[1], "Semaine du 23 décembre au 29 décembre 2024")
+        self.assertEqual(extract_periods(self.df, "M")[1][0], "Mois de décembre 2024")
+
+        period_label.cache_clear()
+        extract_periods(self.df, "W")
+        extract_periods(self.df, "W")
+        self.assertEqual(period_label.cache_info().misses, len(period_list))
+
+    def test_bounds_slice_each_period(self):
+        starts, lo, hi = period_bounds(self.df, "M")
+        months = self.df["datetime"].dt.to_period("M").dt.start_time
+        for start, a, b in zip(starts, lo, hi):
+            pd.testing.assert_frame_equal(self.df.iloc[a:b], self.df[months == start])
+
+
+if __name__ == "__main__":
+    unittest.main()
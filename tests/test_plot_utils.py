@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from common.plot_utils import aggregate_for_bars, create_time_series_bar_plot, create_time_series_plot
+
+
+def _series(n):
+    datetimes = pd.date_range("2025-03-25", periods=n, freq="30min")
+    df = pd.DataFrame({
+        "datetime": datetimes,
+        "consommation": np.full(n, 400.0),
+        "production": np.arange(n, dtype="float64"),
+    })
+    df["total"] = df["consommation"] + df["production"]
+    return df
+
+
+class PlotUtilsTests(unittest.TestCase):
+    def test_large_series_switch_to_webgl_with_same_styling(self):
+        df = _series(500)
+        svg = create_time_series_plot(df, webgl_threshold=1000)
+        webgl = create_time_series_plot(df, webgl_threshold=100)
+
+        self.assertTrue(all(isinstance(t, go.Scatter) for t in svg.data))
+        self.assertTrue(all(isinstance(t, go.Scattergl) for t in webgl.data))
+        for a, b in zip(svg.data, webgl.data):
+            self.assertEqual(a.name, b.name)
+            self.assertEqual(a.hovertemplate, b.hovertemplate)
+            self.assertEqual(a.line.color, b.line.color)
+            self.assertEqual(a.line.dash, b.line.dash)
+
+    def test_large_bar_plots_are_aggregated(self):
+        df = _series(48 * 30)
+        fig = create_time_series_bar_plot(df, max_bars=100)
+        self.assertEqual(len(fig.data[0].x), 30)
+        self.assertIn("jour", fig.layout.title.text)
+        self.assertAlmostEqual(fig.data[1].y[0], df["production"].iloc[:48].mean())
+
+        agg, step = aggregate_for_bars(df, max_bars=len(df))
+        self.assertIsNone(step)
+        self.assertIs(agg, df)
+
+
+if __name__ == "__main__":
+    unittest.main()
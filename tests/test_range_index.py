@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.core.range_index import RangeSumIndex
+from app.core.statistics import compute_basic_stats
+
+
+class RangeSumIndexTests(unittest.TestCase):
+    def setUp(self):
+        datetimes = pd.date_range("2025-03-25", periods=48 * 10, freq="30min")
+        rng = np.random.default_rng(1)
+        self.df = pd.DataFrame({
+            "datetime": datetimes,
+            "consommation": rng.uniform(100, 900, len(datetimes)),
+            "production": rng.uniform(0, 1500, len(datetimes)),
+            "consumption_cost_eur": rng.uniform(0, 0.2, len(datetimes)),
+            "production_savings_eur": rng.uniform(0, 0.3, len(datetimes)),
+        })
+        self.df["total"] = self.df["consommation"] + self.df["production"]
+
+    def test_totals_match_masked_sums_for_any_range(self):
+        index = RangeSumIndex(self.df.sample(frac=1, random_state=0))
+        for start, end in [("2025-03-26 08:15", "2025-03-26 17:00"),
+                           ("2025-03-25", "2025-04-03 23:59"),
+                           ("2025-01-01", "2025-03-25 00:00"),
+                           ("2025-05-01", "2025-06-01")]:
+            mask = (self.df["datetime"] >= start) & (self.df["datetime"] <= end)
+            totals = index.totals(start, end)
+            self.assertEqual(totals["rows"], int(mask.sum()))
+            for col in ["consommation", "production", "consumption_cost_eur"]:
+                self.assertAlmostEqual(totals[col], self.df.loc[mask, col].sum(), places=6)
+            pd.testing.assert_frame_equal(index.slice(start, end).reset_index(drop=True),
+                                          self.df.loc[mask].reset_index(drop=True))
+
+    def test_basic_stats_from_index_match_row_sums(self):
+        index = RangeSumIndex(self.df)
+        start, end = pd.Timestamp("2025-03-27 06:00"), pd.Timestamp("2025-03-30 21:30")
+        selected = index.slice(start, end)
+        pd.testing.assert_frame_equal(
+            compute_basic_stats(selected, start=start, end=end, range_index=index),
+            compute_basic_stats(selected))
+
+
+if __name__ == "__main__":
+    unittest.main()
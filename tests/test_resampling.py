@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from common.resampling import load_bucket_state, state_dir, update_resampled_series
+from common.storage import read_series
+
+
+def _raw(times, values):
+    return pd.DataFrame({"production": values}, index=pd.DatetimeIndex(pd.to_datetime(times), name="datetime"))
+
+
+class ResamplingTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.csv_1h = Path(self.tmp_dir.name) / "production_data_1h.csv"
+
+    def test_partially_filled_bucket_keeps_an_exact_mean(self):
+        update_resampled_series(_raw(["2025-04-01 10:00", "2025-04-01 10:15"], [100.0, 200.0]), self.csv_1h, "1h")
+        self.assertEqual(read_series(self.csv_1h)["production"].iloc[0], 150.0)
+
+        # Seconde moitié de l'heure livrée plus tard : moyenne sur les 4 échantillons
+        update_resampled_series(_raw(["2025-04-01 10:30", "2025-04-01 10:45"], [300.0, 400.0]), self.csv_1h, "1h")
+        self.assertEqual(read_series(self.csv_1h)["production"].iloc[0], 250.0)
+
+        state = load_bucket_state(self.csv_1h)
+        self.assertEqual(state.loc["2025-04-01 10:00", "production_count"], 4)
+        self.assertEqual(state.loc["2025-04-01 10:00", "production_min"], 100.0)
+        self.assertEqual(state.loc["2025-04-01 10:00", "production_max"], 400.0)
+
+    def test_redelivered_samples_replace_the_bucket_and_other_months_are_untouched(self):
+        update_resampled_series(_raw(["2025-03-31 23:00", "2025-04-01 10:00"], [1.0, 100.0]), self.csv_1h, "1h")
+        march_file = next(state_dir(self.csv_1h).glob("2025-03.*"))
+        march_mtime = march_file.stat().st_mtime_ns
+
+        # Correction de la même période : pas de double comptage
+        update_resampled_series(_raw(["2025-04-01 10:00", "2025-04-01 10:30"], [120.0, 140.0]), self.csv_1h, "1h")
+
+        series = read_series(self.csv_1h)["production"]
+        self.assertEqual(list(series), [1.0, 130.0])
+        self.assertEqual(march_file.stat().st_mtime_ns, march_mtime)
+
+
+if __name__ == "__main__":
+    unittest.main()
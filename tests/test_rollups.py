@@ -0,0 +1,92 @@
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from app.core import rollups
+from app.core.rollups import refresh_rollups, rollup_totals, rollup_view
+from app.core.statistics import compute_basic_stats
+
+
+def _merged(start, periods):
+    datetimes = pd.date_range(start, periods=periods, freq="30min")
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "datetime": datetimes,
+        "consommation": rng.uniform(100, 900, periods),
+        "production": rng.uniform(0, 1500, periods),
+        "consumption_cost_eur": rng.uniform(0, 0.2, periods),
+        "production_savings_eur": rng.uniform(0, 0.3, periods),
+    })
+    df["total"] = df["consommation"] + df["production"]
+    return df
+
+
+class RollupTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.rollup_dir = Path(self.tmp_dir.name) / "rollups"
+
+    def test_cube_matches_resampling_of_raw_data(self):
+        df = _merged("2025-03-25", 48 * 45)
+        cube = refresh_rollups(df, self.rollup_dir)
+
+        weekly = rollup_view(cube, "week")
+        expected = df.set_index("datetime")["production"].resample("W").sum()
+        np.testing.assert_allclose(weekly["production"].to_numpy(), expected.to_numpy())
+        self.assertEqual(weekly["datetime"].iloc[0], pd.Timestamp("2025-03-24"))
+
+        monthly = rollup_view(cube, "month")
+        self.assertEqual(list(monthly["rows"]), [7 * 48, 30 * 48, 8 * 48])
+        self.assertTrue((monthly["autoconsommation"] <= monthly["production"]).all())
+        np.testing.assert_allclose((monthly["autoconsommation"] + monthly["injection"]).to_numpy(),
+                                   monthly["production"].to_numpy())
+        np.testing.assert_allclose((monthly["autoconsommation"] + monthly["soutirage"]).to_numpy(),
+                                   monthly["consommation"].to_numpy())
+
+        start, end = pd.Timestamp("2025-04-01"), pd.Timestamp("2025-04-10 23:59")
+        selected = df[(df["datetime"] >= start) & (df["datetime"] <= end)]
+        from_cube = compute_basic_stats(selected, cube, start, end)
+        from_rows = compute_basic_stats(selected)
+        pd.testing.assert_frame_equal(from_cube, from_rows)
+        self.assertIsNone(rollup_totals(cube, "2025-04-01 08:00", end))
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            self.assertEqual(rollup_totals(cube, start, "2025-04-10 23:30")["last_day"], pd.Timestamp("2025-04-10"))
+
+    def test_refresh_recomputes_only_new_and_changed_days(self):
+        df = _merged("2025-03-25", 48 * 20)
+        refresh_rollups(df, self.rollup_dir)
+
+        extended = pd.concat([df, _merged("2025-04-14", 48 * 2)], ignore_index=True)
+        with mock.patch.object(rollups, "compute_day_rollup", wraps=rollups.compute_day_rollup) as compute:
+            cube = refresh_rollups(extended, self.rollup_dir)
+
+        # Seuls les deux nouveaux jours sont recalculés
+        self.assertEqual(len(compute.call_args.args[0]), 48 * 2)
+        self.assertEqual(len(cube["day"]), 22)
+        expected = extended.set_index("datetime")["consommation"].resample("MS").sum()
+        np.testing.assert_allclose(rollup_view(cube, "month")["consommation"].to_numpy(), expected.to_numpy())
+
+    def test_refresh_detects_changed_values_with_unchanged_row_counts(self):
+        df = _merged("2025-04-01", 48 * 10)
+        df["consumption_cost_eur"] = 1.0
+        refresh_rollups(df, self.rollup_dir)
+
+        repriced = df.copy()
+        repriced.loc[repriced["datetime"] >= "2025-04-06", "consumption_cost_eur"] = 2.0
+        with mock.patch.object(rollups, "compute_day_rollup", wraps=rollups.compute_day_rollup) as compute:
+            cube = refresh_rollups(repriced, self.rollup_dir)
+
+        self.assertEqual(len(compute.call_args.args[0]), 48 * 5)
+        self.assertEqual(rollup_view(cube, "month")["consumption_cost_eur"].tolist(), [720.0])
+        reloaded = refresh_rollups(repriced, self.rollup_dir)
+        self.assertEqual(rollup_view(reloaded, "month")["consumption_cost_eur"].tolist(), [720.0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from common import storage
+from common.storage import append_series, get_backend, load_manifest, partition_dir, read_series, write_series
+
+
+class StorageTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.csv_path = Path(self.tmp_dir.name) / "production_data_30min.csv"
+
+    def test_write_and_read_series_keeps_typed_columns_and_csv_export(self):
+        for backend_name in ["parquet", "feather", "csv"]:
+            backend = get_backend(backend_name)
+            df = pd.DataFrame(
+                {
+                    "datetime": ["2025-03-25 00:30:00", "2025-03-25 00:00:00"],
+                    "production": ["12.5", 10],
+                }
+            )
+
+            write_series(df, self.csv_path, backend)
+            loaded = read_series(self.csv_path, backend)
+
+            self.assertTrue(self.csv_path.exists())
+            self.assertTrue((partition_dir(self.csv_path) / f"2025-03{backend.suffix}").exists())
+            self.assertEqual(loaded.index.name, "datetime")
+            self.assertEqual(str(loaded.index.dtype), "datetime64[ns]")
+            self.assertEqual(str(loaded["production"].dtype), "float32")
+            self.assertEqual(list(loaded["production"]), [10.0, 12.5])
+
+    def test_append_series_rewrites_only_touched_partition_and_appends_csv(self):
+        backend = get_backend("parquet")
+        write_series(
+            pd.DataFrame(
+                {
+                    "datetime": ["2025-03-31 23:30:00", "2025-04-01 00:00:00"],
+                    "production": [1.0, 2.0],
+                }
+            ),
+            self.csv_path,
+            backend,
+        )
+
+        with mock.patch.object(storage.CsvBackend, "write", side_effect=AssertionError("CSV réécrit")):
+            written = []
+            original_write = backend.write
+            backend.write = lambda df, path: (written.append(Path(path).name), original_write(df, path))
+            append_series(
+                pd.DataFrame({"datetime": ["2025-04-01 00:30:00"], "production": [3.0]}),
+                self.csv_path,
+                backend,
+            )
+
+        self.assertEqual(written, ["2025-04.parquet"])
+        self.assertEqual(load_manifest(self.csv_path)["partitions"]["2025-04"]["rows"], 2)
+        self.assertEqual(self.csv_path.read_text().strip().splitlines()[-1], "2025-04-01 00:30:00;3.0")
+        self.assertEqual(list(read_series(self.csv_path, backend)["production"]), [1.0, 2.0, 3.0])
+
+        # Lecture par plage : seule la partition de mars est concernée
+        march = read_series(self.csv_path, backend, start="2025-03-01", end="2025-04-01")
+        self.assertEqual(list(march["production"]), [1.0])
+
+    def test_correction_of_past_data_and_external_csv_edits(self):
+        backend = get_backend("parquet")
+        write_series(
+            pd.DataFrame({"datetime": ["2025-03-25 00:00:00", "2025-03-26 00:00:00"], "production": [1.0, 2.0]}),
+            self.csv_path,
+            backend,
+        )
+        append_series(
+            pd.DataFrame({"datetime": ["2025-03-25 00:00:00"], "production": [5.0]}),
+            self.csv_path,
+            backend,
+        )
+        self.assertEqual(list(read_series(self.csv_path, backend)["production"]), [5.0, 2.0])
+        self.assertIn("2025-03-25 00:00:00;5.0", self.csv_path.read_text())
+
+        # Un CSV modifié après le manifeste fait foi et les partitions sont reconstruites
+        self.csv_path.write_text("datetime;production\n2025-05-01 00:00:00;7\n")
+        manifest_stat = (partition_dir(self.csv_path) / "manifest.json").stat()
+        os.utime(self.csv_path, ns=(manifest_stat.st_atime_ns, manifest_stat.st_mtime_ns + 1_000_000))
+        self.assertEqual(list(read_series(self.csv_path, backend)["production"]), [7.0])
+        self.assertEqual(list(load_manifest(self.csv_path)["partitions"]), ["2025-05"])
+
+    def test_stale_partitions_with_newer_mtimes_never_overwrite_the_csv(self):
+        backend = get_backend("parquet")
+        slots = pd.date_range("2025-03-25", periods=144, freq="30min")
+        write_series(pd.DataFrame({"production": 1.0}, index=slots[:96].rename("datetime")), self.csv_path, backend)
+        stale_copy = Path(self.tmp_dir.name) / "stale_partitions"
+        shutil.copytree(partition_dir(self.csv_path), stale_copy)
+        append_series(pd.DataFrame({"production": 1.0}, index=slots[96:].rename("datetime")), self.csv_path, backend)
+
+        # CSV versionné sans ses partitions : partitions périmées, mais plus récentes que le CSV
+        shutil.rmtree(partition_dir(self.csv_path))
+        shutil.copytree(stale_copy, partition_dir(self.csv_path))
+        for path in partition_dir(self.csv_path).iterdir():
+            os.utime(path, ns=(path.stat().st_atime_ns, self.csv_path.stat().st_mtime_ns + 1_000_000_000))
+
+        self.assertEqual(len(read_series(self.csv_path, backend)), 144)
+        append_series(pd.DataFrame({"datetime": [slots[10]], "production": [5.0]}), self.csv_path, backend)
+        self.assertEqual(len(pd.read_csv(self.csv_path, sep=";")), 144)
+        self.assertEqual(read_series(self.csv_path, backend)["production"].sum(), 143 + 5.0)
+
+    def test_copied_store_is_reused_without_parsing_the_csv(self):
+        backend = get_backend("parquet")
+        write_series(pd.DataFrame({"datetime": ["2025-03-25 00:00:00"], "production": [1.0]}), self.csv_path, backend)
+        os.utime(self.csv_path, ns=(0, 0))
+
+        with mock.patch.object(storage, "_read_csv_series", side_effect=AssertionError("CSV relu")):
+            self.assertEqual(list(read_series(self.csv_path, backend)["production"]), [1.0])
+        self.assertEqual(load_manifest(self.csv_path)["csv"]["mtime_ns"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.core.statistics import compute_summary
+from common.data_tools import merge_conso_prod_data
+from common.tariffs import normalize_contract, subscription_cost, tariff_prices
+
+
+TEMPO = {
+    "name": "Tempo",
+    "subscription_eur_per_month": 15.0,
+    "periods": [{"name": "HC", "hours": [["22:00", "06:00"]]}],
+    "default_period": "HP",
+    "day_start": "06:00",
+    "default_color": "bleu",
+    "colors": {"2025-01-08": "rouge"},
+    "prices": {
+        "bleu": {"HP": 0.16, "HC": 0.13},
+        "rouge": {"HP": 0.75, "HC": 0.15},
+    },
+}
+
+
+class TariffTests(unittest.TestCase):
+    def test_hour_windows_weekday_rules_and_day_colors(self):
+        tariff = normalize_contract(TEMPO)
+        times = pd.to_datetime([
+            "2025-01-08 05:30",  # avant 06:00 : journée tarifaire du 7 (bleu), HC
+            "2025-01-08 06:00",  # rouge HP
+            "2025-01-08 23:00",  # rouge HC
+            "2025-01-09 05:30",  # toujours le jour rouge, HC
+            "2025-01-09 06:00",  # bleu HP
+        ])
+        prices, labels = tariff_prices(times, tariff)
+        np.testing.assert_allclose(prices, [0.13, 0.75, 0.15, 0.15, 0.16])
+        self.assertEqual(list(labels), ["bleu HC", "rouge HP", "rouge HC", "rouge HC", "bleu HP"])
+
+        weekend = normalize_contract({
+            "periods": [{"name": "HC", "weekdays": [5, 6]}, {"name": "HC", "hours": [["12:00", "14:00"]]}],
+            "prices": {"HP": 0.2, "HC": 0.1},
+        })
+        prices, labels = tariff_prices(pd.to_datetime(["2025-01-11 09:00", "2025-01-13 09:00", "2025-01-13 12:30"]),
+                                       weekend)
+        np.testing.assert_allclose(prices, [0.1, 0.2, 0.1])
+        self.assertEqual(list(labels), ["HC", "HP", "HC"])
+
+    def test_end_of_interval_stamps_are_priced_on_the_slot_start(self):
+        tariff = normalize_contract(TEMPO)
+        times = pd.to_datetime([
+            "2025-01-08 06:00",  # 05:30 → 06:00 : jour tarifaire du 7 (bleu), HC
+            "2025-01-08 06:30",  # rouge HP
+            "2025-01-08 22:00",  # 21:30 → 22:00 : rouge HP
+            "2025-01-08 22:30",  # rouge HC
+            "2025-01-09 06:00",  # 05:30 → 06:00 : toujours le jour rouge, HC
+        ])
+        prices, labels = tariff_prices(times, tariff, label="end")
+        np.testing.assert_allclose(prices, [0.13, 0.75, 0.75, 0.15, 0.15])
+        self.assertEqual(list(labels), ["bleu HC", "rouge HP", "rouge HP", "rouge HC", "rouge HC"])
+
+        hourly, _ = tariff_prices(pd.to_datetime(["2025-01-08 22:00", "2025-01-08 23:00"]), tariff,
+                                  label="end", interval="1h")
+        np.testing.assert_allclose(hourly, [0.75, 0.15])
+
+    def test_merge_and_summary_use_the_contract(self):
+        tariff = normalize_contract(TEMPO)
+        datetimes = pd.date_range("2025-01-06", periods=48 * 7, freq="30min")
+        conso_df = pd.DataFrame({"datetime": datetimes + np.timedelta64(30, "m"), "consommation": 1000.0})
+        prod_df = pd.DataFrame({"datetime": datetimes, "production": 500.0})
+        merged_df = merge_conso_prod_data(conso_df, prod_df, tariff=tariff)
+
+        summary = compute_summary(merged_df, tariff=tariff)
+        self.assertAlmostEqual(summary["subscription_eur"], round(15.0 * 12 * 7 / 365.25, 2))
+        by_period = summary["cost_by_period_eur"]
+        self.assertAlmostEqual(by_period["rouge HP"], 32 * 0.75)
+        self.assertAlmostEqual(sum(by_period.values()), summary["estimated_cost_eur"], places=1)
+        self.assertEqual(subscription_cost(30, None), 0.0)
+
+    def test_years_of_slots_are_all_priced(self):
+        # Durée mesurée dans benchmarks/bench_tariffs.py
+        red_days = pd.date_range("2020-01-06", periods=22 * 5, freq="W")
+        tariff = normalize_contract({**TEMPO, "colors": {str(d.date()): "rouge" for d in red_days}})
+        datetimes = pd.date_range("2020-01-01", "2025-12-31 23:30", freq="30min")
+        prices, labels = tariff_prices(datetimes, tariff)
+        self.assertEqual(len(prices), len(datetimes))
+        self.assertFalse(np.isnan(prices).any())
+        # Journée tarifaire rouge de 06:00 à 22:00 : 32 demi-heures HP par jour rouge
+        self.assertEqual(int((np.asarray(labels) == "rouge HP").sum()), 32 * len(red_days))
+        self.assertEqual(set(np.unique(prices)), {0.13, 0.15, 0.16, 0.75})
+
+if __name__ == "__main__":
+    unittest.main()
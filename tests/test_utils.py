@@ -0,0 +1,44 @@
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+from common import utils
+from common.utils import ZipArchiveWriter
+
+
+class ZipArchiveWriterTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.zip_path = Path(self.tmp_dir.name) / "raw_conso_files.zip"
+        with zipfile.ZipFile(self.zip_path, "w") as z:
+            z.writestr("conso_1h/conso_2025-03-25.json", "{}")
+
+    def test_writer_reads_members_once_and_replaces_archive_on_close(self):
+        with mock.patch.object(utils, "extract_zip_file_list", wraps=utils.extract_zip_file_list) as listing:
+            with ZipArchiveWriter(self.zip_path) as archive:
+                self.assertIn("conso_1h/conso_2025-03-25.json", archive)
+                self.assertFalse(archive.writestr("conso_1h/conso_2025-03-25.json", "{}"))
+                for day in range(26, 31):
+                    self.assertTrue(archive.writestr(f"conso_1h/conso_2025-03-{day}.json", '{"v": 1}'))
+                # L'original n'est pas modifié avant la fermeture
+                with zipfile.ZipFile(self.zip_path) as z:
+                    self.assertEqual(len(z.namelist()), 1)
+
+        self.assertEqual(listing.call_count, 1)
+        with zipfile.ZipFile(self.zip_path) as z:
+            self.assertEqual(len(z.namelist()), 6)
+            self.assertEqual(z.read("conso_1h/conso_2025-03-30.json"), b'{"v": 1}')
+        self.assertFalse(self.zip_path.with_name(self.zip_path.name + ".tmp").exists())
+
+    def test_writer_without_additions_leaves_archive_untouched(self):
+        mtime = self.zip_path.stat().st_mtime_ns
+        with ZipArchiveWriter(self.zip_path):
+            pass
+        self.assertEqual(self.zip_path.stat().st_mtime_ns, mtime)
+
+
+if __name__ == "__main__":
+    unittest.main()